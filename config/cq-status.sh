@@ -1,10 +1,13 @@
 #!/usr/bin/env bash
 # CQ Status Bar Script for tmux
 # Shows active AI panes (tmux) and legacy daemon status.
+# Normally prints a segment precomputed by bin/cq-status-snapshot; the shell probes below are
+# the fallback while that snapshot is missing or stale (CQ_STATUS_SNAPSHOT=0 disables it).
 
 CQ_DIR="${CQ_DIR:-$HOME/.local/share/code-quorum}"
 CQ_CACHE_DIR="${CQ_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/cq}"
 TMP_DIR="${TMPDIR:-/tmp}"
+STATUS_DIR="$CQ_CACHE_DIR/status"
 
 # Color codes for tmux status bar (Tokyo Night palette)
 C_GREEN="#[fg=#9ece6a,bold]"
@@ -84,9 +87,53 @@ format_ai_status() {
     fi
 }
 
+# Print the precomputed segment for a mode (written by cq-status-snapshot) if it is fresh, or if
+# the producer exited idle (no CQ pane) and the session registry has not changed since.
+# Uses only shell builtins so a status tick costs no extra processes.
+read_snapshot() {
+    local mode="$1"
+    local snap="$STATUS_DIR/${mode}.txt"
+    local stale_s="${CQ_STATUS_STALE_S:-15}"
+    local ts="" line="" now="${EPOCHSECONDS:-}"
+    local idle="$STATUS_DIR/idle" registry="$HOME/.cq/run"
+
+    [[ -f "$snap" ]] || return 1
+    { IFS= read -r ts && IFS= read -r line; } < "$snap" 2>/dev/null || return 1
+    [[ "$ts" =~ ^[0-9]+$ ]] || return 1
+    [[ -n "$now" ]] || now="$(date +%s 2>/dev/null || echo 0)"
+    if (( now - ts > stale_s )); then
+        [[ -f "$idle" ]] || return 1
+        [[ -d "$registry" && "$registry" -nt "$idle" ]] && return 1
+    fi
+    if [[ -n "$line" ]]; then
+        echo "$line"
+    fi
+    return 0
+}
+
+# Start the snapshot producer in the background (it exits at once if one is already running).
+start_snapshot_producer() {
+    local producer="$CQ_DIR/bin/cq-status-snapshot"
+    [[ -x "$producer" ]] || return 0
+    ( "$producer" --daemon >/dev/null 2>&1 & ) 2>/dev/null || true
+}
+
 # Main status output
 main() {
     local mode="${1:-full}"
+
+    case "$mode" in
+        full|daemons|compact|modern)
+            if [[ "${CQ_STATUS_SNAPSHOT:-1}" != "0" ]]; then
+                if read_snapshot "$mode"; then
+                    return 0
+                fi
+                # Missing/stale snapshot (and not idle): (re)start the producer, compute this tick in shell.
+                start_snapshot_producer
+            fi
+            ;;
+    esac
+
     local cache_s="${CQ_STATUS_CACHE_S:-1}"
     local cache_key=""
     local cache_suffix="${cache_key:-default}"
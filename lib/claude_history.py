@@ -0,0 +1,214 @@
+"""
+claude_history.py - Find the latest resumable Claude transcript for a project.
+
+Claude Code keeps one `<uuid>.jsonl` transcript per session under `~/.claude/projects/<key>/`,
+and `~/.claude/session-env/<uuid>` exists for sessions that can be resumed.
+
+Each project directory is listed once with `os.scandir` (one stat per transcript) and the
+session-env directory is listed once for membership checks. Per-directory summaries are cached
+in `~/.cache/cq/claude-history.json`, keyed by the directory mtimes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from cli_output import atomic_write_text
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_TTL_S = 300.0
+
+
+def _session_env_root() -> Path:
+    return Path.home() / ".claude" / "session-env"
+
+
+def _cache_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "claude-history.json"
+
+
+def _cache_ttl_s() -> float:
+    raw = (os.environ.get("CQ_CLAUDE_HISTORY_CACHE_S") or "").strip()
+    if not raw:
+        return DEFAULT_CACHE_TTL_S
+    try:
+        return max(0.0, float(raw))
+    except Exception:
+        return DEFAULT_CACHE_TTL_S
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return int(path.stat().st_mtime_ns)
+    except OSError:
+        return -1
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except Exception:
+        return False
+    return True
+
+
+def _list_session_env(root: Path) -> Set[str]:
+    try:
+        return set(os.listdir(root))
+    except OSError:
+        return set()
+
+
+def summarize_project_dir(project_dir: Path, session_env: Set[str]) -> Optional[dict]:
+    """
+    Summarize one project directory in a single scandir pass.
+
+    Returns None when the directory has no transcripts, otherwise a dict with `best_any` (newest
+    transcript) and `best_uuid` (newest non-empty, resumable transcript or None) as
+    `[stem, mtime_ns]` pairs.
+    """
+    best_any: Optional[Tuple[str, int]] = None
+    best_uuid: Optional[Tuple[str, int]] = None
+    try:
+        with os.scandir(project_dir) as it:
+            for entry in it:
+                name = entry.name
+                if not name.endswith(".jsonl"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                stem = name[: -len(".jsonl")]
+                mtime = int(st.st_mtime_ns)
+                if best_any is None or mtime > best_any[1]:
+                    best_any = (stem, mtime)
+                if st.st_size <= 0 or stem not in session_env or not _is_uuid(stem):
+                    continue
+                if best_uuid is None or mtime > best_uuid[1]:
+                    best_uuid = (stem, mtime)
+    except OSError:
+        return None
+    if best_any is None:
+        return None
+    return {"best_any": list(best_any), "best_uuid": list(best_uuid) if best_uuid else None}
+
+
+class _SummaryCache:
+    def __init__(self, path: Path, ttl_s: float):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        if ttl_s <= 0:
+            return
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION and isinstance(data.get("dirs"), dict):
+            self.entries = {k: v for k, v in data["dirs"].items() if isinstance(v, dict)}
+
+    def get(self, key: str, dir_mtime: int, env_mtime: int, now: float) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if not entry or self.ttl_s <= 0:
+            return None
+        if entry.get("dir_mtime_ns") != dir_mtime or entry.get("env_mtime_ns") != env_mtime:
+            return None
+        try:
+            if now - float(entry.get("checked_at") or 0) > self.ttl_s:
+                return None
+        except Exception:
+            return None
+        return entry
+
+    def put(self, key: str, dir_mtime: int, env_mtime: int, now: float, summary: Optional[dict]) -> None:
+        if self.ttl_s <= 0:
+            return
+        self.entries[key] = {
+            "dir_mtime_ns": dir_mtime,
+            "env_mtime_ns": env_mtime,
+            "checked_at": now,
+            "summary": summary,
+        }
+        self.dirty = True
+
+    def save(self, now: float) -> None:
+        if not self.dirty:
+            return
+        fresh = {k: v for k, v in self.entries.items() if now - float(v.get("checked_at") or 0) <= self.ttl_s}
+        try:
+            atomic_write_text(self.path, json.dumps({"version": CACHE_VERSION, "dirs": fresh}))
+        except Exception:
+            pass
+
+
+def find_latest_claude_session(
+    candidates: Iterable[Tuple[Path, Path]],
+) -> Tuple[Optional[str], bool, Optional[Path]]:
+    """
+    Pick the session to resume from `(work_dir, project_dir)` candidates (checked in order).
+
+    Returns `(session_id, has_any_history, work_dir)`:
+    - session_id: newest resumable transcript UUID (for `claude --resume <id>`), if any.
+    - has_any_history: whether any candidate directory has transcripts.
+    - work_dir: the candidate that owns the chosen (or newest) transcript.
+
+    A cached directory summary is trusted until the directory or session-env mtime changes or the
+    TTL (`CQ_CLAUDE_HISTORY_CACHE_S`, default 300s; 0 disables) expires. Appends to an existing
+    transcript do not change the directory mtime, so they are only noticed once the TTL lapses.
+    """
+    env_root = _session_env_root()
+    env_mtime = _mtime_ns(env_root)
+    session_env: Optional[Set[str]] = None
+    now = time.time()
+    cache = _SummaryCache(_cache_path(), _cache_ttl_s())
+
+    best_any: Optional[Tuple[str, int]] = None
+    best_uuid: Optional[Tuple[str, int]] = None
+    best_cwd: Optional[Path] = None
+    has_any_history = False
+
+    for work_dir, project_dir in candidates:
+        dir_mtime = _mtime_ns(project_dir)
+        if dir_mtime < 0:
+            continue
+        key = str(project_dir)
+        cached = cache.get(key, dir_mtime, env_mtime, now)
+        if cached is not None:
+            summary = cached.get("summary")
+        else:
+            if session_env is None:
+                session_env = _list_session_env(env_root)
+            summary = summarize_project_dir(project_dir, session_env)
+            cache.put(key, dir_mtime, env_mtime, now, summary)
+        if not isinstance(summary, dict) or not summary.get("best_any"):
+            continue
+        has_any_history = True
+
+        stem, mtime = summary["best_any"]
+        if best_any is None or mtime > best_any[1]:
+            best_any = (stem, mtime)
+            best_cwd = work_dir
+        dir_uuid = summary.get("best_uuid")
+        if dir_uuid:
+            stem, mtime = dir_uuid
+            if best_uuid is None or mtime > best_uuid[1]:
+                best_uuid = (stem, mtime)
+                best_cwd = work_dir
+
+    cache.save(now)
+
+    if best_uuid is not None:
+        return best_uuid[0], True, best_cwd
+    if has_any_history:
+        return None, True, best_cwd
+    return None, False, None
@@ -8,7 +8,7 @@ from typing import Mapping, Optional, Tuple
 
 from cq_config import apply_backend_env
 from claude_session_resolver import resolve_claude_session
-from project_id import compute_cq_project_id
+from project_keys import project_keys
 from session_scope import project_session_dir, resolve_session_name
 from session_utils import safe_write_session
 from terminal import get_backend_for_session
@@ -115,10 +115,7 @@ def load_project_session(
         return None
     data.setdefault("work_dir", str(work_dir))
     if not data.get("cq_project_id"):
-        try:
-            data["cq_project_id"] = compute_cq_project_id(Path(data.get("work_dir") or work_dir))
-        except Exception:
-            pass
+        data["cq_project_id"] = project_keys(data.get("work_dir") or work_dir).cq_project_id
     session_file = resolution.session_file
     if not session_file:
         try:
@@ -134,8 +131,5 @@ def load_project_session(
 def compute_session_key(session: ClaudeProjectSession) -> str:
     pid = str(session.data.get("cq_project_id") or "").strip()
     if not pid:
-        try:
-            pid = compute_cq_project_id(Path(session.work_dir))
-        except Exception:
-            pid = ""
+        pid = project_keys(session.work_dir).cq_project_id
     return f"claude:{pid}" if pid else "claude:unknown"
@@ -2,18 +2,21 @@ from __future__ import annotations
 
 import json
 import os
-import re
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Mapping, Optional
 
 from session_registry import (
-    load_registry_by_claude_pane,
-    load_registry_by_project_id,
-    load_registry_by_project_id_unfiltered,
-    load_registry_by_session_id,
+    RegistryRecord,
+    _get_providers_map,
+    _provider_pane_alive,
+    load_registry_records,
+    persist_inferred_project_id,
+    record_project_id,
 )
-from project_id import compute_cq_project_id
+import cq_trace
+from project_keys import claude_project_key, project_keys
 from session_scope import project_session_dir, resolve_session_name
 from session_utils import find_project_session_file
 
@@ -129,32 +132,11 @@ def _candidate_session_file(work_dir: Path, session_name: str) -> Optional[Path]
 
 
 def _project_key_for_path(path: Path) -> str:
-    return re.sub(r"[^A-Za-z0-9]", "-", str(path))
+    return claude_project_key(path)
 
 
 def _candidate_project_dirs(root: Path, work_dir: Path) -> list[Path]:
-    candidates: list[Path] = []
-    env_pwd = os.environ.get("PWD")
-    if env_pwd:
-        try:
-            candidates.append(Path(env_pwd))
-        except Exception:
-            pass
-    candidates.append(work_dir)
-    try:
-        candidates.append(work_dir.resolve())
-    except Exception:
-        pass
-
-    out: list[Path] = []
-    seen: set[str] = set()
-    for candidate in candidates:
-        key = _project_key_for_path(candidate)
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(root / key)
-    return out
+    return [root / key for key in project_keys(work_dir).claude_keys]
 
 
 def _session_path_from_id(session_id: str, work_dir: Path) -> Optional[Path]:
@@ -195,35 +177,88 @@ def _normalize_session_binding(data: dict, work_dir: Path) -> None:
             data["claude_session_path"] = str(candidate)
 
 
+def _debug(message: str) -> None:
+    if os.environ.get("CQ_DEBUG") in ("1", "true", "yes"):
+        print(f"[DEBUG] {message}", file=sys.stderr)
+
+
+def _record_claude_pane(data: dict) -> str:
+    claude = _get_providers_map(data).get("claude")
+    pane = claude.get("pane_id") if isinstance(claude, dict) else None
+    return str(pane or data.get("claude_pane_id") or "")
+
+
 def resolve_claude_session(
     work_dir: Path, *, session: str | None = None, env: Mapping[str, str] | None = None
+) -> Optional[ClaudeSessionResolution]:
+    """
+    Resolve the Claude session for `work_dir`.
+
+    Rules, in priority order (the first candidate with a pane id wins; otherwise the first
+    candidate seen is returned as a fallback):
+      1) registry record named by a session-id env var (CQ_SESSION_ID, ...)
+      2) newest project record whose Claude pane is alive
+      3) newest project record with a Claude entry (liveness not verified)
+      4) `.claude-session` file
+      5) registry record bound to the current pane (WEZTERM_PANE / TMUX_PANE)
+
+    The registry directory is read once; pane liveness is only probed when rule 2 is reached,
+    via one pane listing per terminal backend.
+    """
+    with cq_trace.stage("resolve_claude_session"):
+        resolution = _resolve_claude_session(work_dir, session=session, env=env)
+        cq_trace.set_winner(resolution.source if resolution else "none")
+        return resolution
+
+
+def _resolve_claude_session(
+    work_dir: Path, *, session: str | None = None, env: Mapping[str, str] | None = None
 ) -> Optional[ClaudeSessionResolution]:
     env_map = os.environ if env is None else env
     effective_session = resolve_session_name(session, env=env_map)
 
-    best_fallback: Optional[ClaudeSessionResolution] = None
-    try:
-        current_pid = compute_cq_project_id(work_dir)
-    except Exception:
-        current_pid = ""
     strict_project = (Path(work_dir) / ".cq_config").is_dir()
     allow_cross = env_map.get("CQ_ALLOW_CROSS_PROJECT_SESSION") in ("1", "true", "yes")
     if not strict_project and not allow_cross:
         return None
+    current_pid = project_keys(work_dir).cq_project_id
 
-    def _record_project_id(record: dict) -> str:
-        if not isinstance(record, dict):
-            return ""
-        pid = str(record.get("cq_project_id") or "").strip()
-        if pid:
-            return pid
-        wd = str(record.get("work_dir") or "").strip()
-        if not wd:
-            return ""
-        try:
-            return compute_cq_project_id(Path(wd))
-        except Exception:
-            return ""
+    # Single registry pass: bucket records by the rules that can select them.
+    records = load_registry_records(effective_session)
+    cq_trace.count("registry_records", len(records))
+    by_session_id: dict[str, RegistryRecord] = {}
+    project_records: list[tuple[RegistryRecord, bool]] = []
+    pane_id = (env_map.get("WEZTERM_PANE") or env_map.get("TMUX_PANE") or "").strip()
+    pane_record: Optional[RegistryRecord] = None
+    record_pids: dict[str, str] = {}
+    for rec in records:
+        rec_pid, inferred = record_project_id(rec.data)
+        record_pids[rec.session_id] = rec_pid
+        by_session_id[rec.session_id] = rec
+        if current_pid and rec_pid == current_pid:
+            project_records.append((rec, inferred))
+        if pane_id and _record_claude_pane(rec.data) == pane_id:
+            if pane_record is None or rec.updated_at > pane_record.updated_at:
+                pane_record = rec
+    # Newest first; the stable sort keeps path order between equal timestamps.
+    project_records.sort(key=lambda item: -item[0].updated_at)
+
+    def _project_ok(rec: RegistryRecord) -> bool:
+        if allow_cross or not strict_project:
+            return True
+        rec_pid = record_pids.get(rec.session_id, "")
+        return bool(rec_pid) and not (current_pid and rec_pid != current_pid)
+
+    session_file_cache: list[Optional[Path]] = []
+
+    def _project_session_file() -> Optional[Path]:
+        if not session_file_cache:
+            session_file_cache.append(
+                find_project_session_file(work_dir, ".claude-session", session=session, env=env_map)
+            )
+        return session_file_cache[0]
+
+    best_fallback: Optional[ClaudeSessionResolution] = None
 
     def consider(candidate: Optional[ClaudeSessionResolution]) -> Optional[ClaudeSessionResolution]:
         nonlocal best_fallback
@@ -231,96 +266,74 @@ def resolve_claude_session(
             return None
         _normalize_session_binding(candidate.data, work_dir)
         if _pane_from_data(candidate.data):
+            _debug(f"Claude session resolved via {candidate.source}")
             return candidate
         if best_fallback is None:
             best_fallback = candidate
         return None
 
+    def from_record(rec: RegistryRecord, source: str) -> Optional[ClaudeSessionResolution]:
+        data = _data_from_registry(rec.data, work_dir)
+        session_file = _session_file_from_record(rec.data) or _project_session_file()
+        return consider(_select_resolution(data, session_file, rec.data, source))
+
     # 1) Registry via session id envs
     for key in SESSION_ENV_KEYS:
         session_id = (env_map.get(key) or "").strip()
         if not session_id:
             continue
-        record = load_registry_by_session_id(session_id, session_name=effective_session)
-        if not isinstance(record, dict):
+        rec = by_session_id.get(session_id)
+        if rec is None or not _project_ok(rec):
             continue
-        if not allow_cross and strict_project:
-            record_pid = _record_project_id(record)
-            if not record_pid or (current_pid and record_pid != current_pid):
-                continue
-        data = _data_from_registry(record, work_dir)
-        session_file = _session_file_from_record(record) or find_project_session_file(
-            work_dir, ".claude-session", session=session, env=env_map
-        )
-        candidate = _select_resolution(data, session_file, record, f"registry:{key}")
-        resolved = consider(candidate)
+        resolved = from_record(rec, f"registry:{key}")
         if resolved:
             return resolved
         break
 
-    # 2) Registry via cq_project_id
-    try:
-        pid = compute_cq_project_id(work_dir)
-    except Exception:
-        pid = ""
-    if pid:
-        record = load_registry_by_project_id(pid, "claude", session_name=effective_session)
-        if isinstance(record, dict):
-            data = _data_from_registry(record, work_dir)
-            session_file = _session_file_from_record(record) or find_project_session_file(
-                work_dir, ".claude-session", session=session, env=env_map
-            )
-            candidate = _select_resolution(data, session_file, record, "registry:project")
-            resolved = consider(candidate)
+    if current_pid:
+        # 2) Registry via cq_project_id (newest record with a live pane)
+        snapshots: dict = {}
+        for rec, inferred in project_records:
+            cq_trace.count("liveness_checks")
+            if not _provider_pane_alive(rec.data, "claude", snapshots):
+                continue
+            if inferred:
+                persist_inferred_project_id(rec.data)
+            resolved = from_record(rec, "registry:project")
             if resolved:
                 return resolved
+            break
 
-        # Fallback: accept latest registry record even if pane liveness can't be verified.
-        unfiltered = load_registry_by_project_id_unfiltered(pid, "claude", session_name=effective_session)
-        if isinstance(unfiltered, dict):
-            data = _data_from_registry(unfiltered, work_dir)
-            session_file = _session_file_from_record(unfiltered) or find_project_session_file(
-                work_dir, ".claude-session", session=session, env=env_map
-            )
-            candidate = _select_resolution(data, session_file, unfiltered, "registry:project_unfiltered")
-            resolved = consider(candidate)
+        # 3) Fallback: accept latest registry record even if pane liveness can't be verified.
+        for rec, _ in project_records:
+            if "claude" not in _get_providers_map(rec.data):
+                continue
+            resolved = from_record(rec, "registry:project_unfiltered")
             if resolved:
                 return resolved
+            break
 
-    # 3) .claude-session file
-    session_file = find_project_session_file(work_dir, ".claude-session", session=session, env=env_map)
+    # 4) .claude-session file
+    session_file = _project_session_file()
     if session_file:
         data = _read_json(session_file)
         if data:
             data.setdefault("work_dir", str(work_dir))
             _normalize_session_binding(data, work_dir)
-            candidate = _select_resolution(data, session_file, None, "session_file")
-            resolved = consider(candidate)
+            resolved = consider(_select_resolution(data, session_file, None, "session_file"))
             if resolved:
                 return resolved
 
-    # 4) Registry via current pane id
-    pane_id = (env_map.get("WEZTERM_PANE") or env_map.get("TMUX_PANE") or "").strip()
-    if pane_id:
-        record = load_registry_by_claude_pane(pane_id, session_name=effective_session)
-        if isinstance(record, dict):
-            if not allow_cross and strict_project:
-                record_pid = _record_project_id(record)
-                if not record_pid or (current_pid and record_pid != current_pid):
-                    record = None
-            if record:
-                data = _data_from_registry(record, work_dir)
-                session_file = _session_file_from_record(record) or find_project_session_file(
-                    work_dir, ".claude-session", session=session, env=env_map
-                )
-                candidate = _select_resolution(data, session_file, record, "registry:pane")
-                resolved = consider(candidate)
-                if resolved:
-                    return resolved
+    # 5) Registry via current pane id
+    if pane_record is not None and _project_ok(pane_record):
+        resolved = from_record(pane_record, "registry:pane")
+        if resolved:
+            return resolved
 
     if best_fallback:
         if not best_fallback.session_file:
             best_fallback.session_file = _candidate_session_file(work_dir, effective_session)
+        _debug(f"Claude session resolved via {best_fallback.source} (no pane id)")
         return best_fallback
 
     return None
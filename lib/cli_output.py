@@ -37,6 +37,34 @@ def atomic_write_text(path: Path, content: str, *, encoding: str = "utf-8") -> N
                 pass
 
 
+def append_capped_lines(path: Path, text: str, *, max_bytes: int, keep_lines: int) -> None:
+    """
+    Append `text` (whole lines) to a log file; once it grows past `max_bytes`, rewrite it with
+    its last `keep_lines` lines.
+
+    Both steps run under an flock on `<path>.lock`, so a trim never drops another writer's append.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_fd = os.open(str(path) + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        if os.name != "nt":
+            import fcntl
+
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, text.encode("utf-8"))
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > max_bytes:
+            kept = path.read_text(encoding="utf-8").splitlines()[-keep_lines:]
+            atomic_write_text(path, "\n".join(kept) + "\n")
+    finally:
+        os.close(lock_fd)
+
+
 def normalize_message_parts(parts: list[str]) -> str:
     return " ".join(parts).strip()
 
@@ -0,0 +1,268 @@
+"""
+codex_auto_approval.py - Keep `~/.codex/config.toml` trusting the project for `cq -a`.
+
+`cq -a` needs a `[projects."<cwd>"]` table with the CQ-managed approval keys. The config is
+parsed once into a section index (one pass over its lines) that serves de-duplication, lookup
+of the project table and the key check.
+
+The last verified state is fingerprinted per project (config path, size, mtime and SHA-256),
+so an unchanged config is recognized with a single stat and never read or parsed again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from cli_output import atomic_write_text
+
+CQ_BEGIN = "# --- BEGIN CQ: codex auto-approval ---"
+CQ_END = "# --- END CQ: codex auto-approval ---"
+DESIRED = [
+    'trust_level = "trusted"',
+    'approval_policy = "never"',
+    'sandbox_mode = "danger-full-access"',
+]
+FINGERPRINT_VERSION = 1
+
+_MANAGED_KEY_RE = re.compile(r"^\s*(trust_level|approval_policy|sandbox_mode)\s*=")
+
+
+def codex_config_path() -> Path:
+    return Path.home() / ".codex" / "config.toml"
+
+
+def _toml_unescape_basic_string(value: str) -> str:
+    # Minimal TOML basic-string unescape for our use-case (paths).
+    # https://toml.io/en/v1.0.0#string
+    try:
+        return (
+            (value or "")
+            .replace("\\\\", "\\")
+            .replace('\\"', '"')
+            .replace("\\t", "\t")
+            .replace("\\n", "\n")
+            .replace("\\r", "\r")
+        )
+    except Exception:
+        return value or ""
+
+
+def _toml_escape_basic_string(value: str) -> str:
+    return (value or "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+def project_header(cwd: str) -> str:
+    return f'[projects."{_toml_escape_basic_string(cwd)}"]'
+
+
+def migrate_legacy_full_auto(text: str) -> Tuple[str, bool]:
+    """
+    Older CQ versions wrote `sandbox_mode = "full-auto"` into `~/.codex/config.toml`.
+    Codex rejects this value (valid variants: read-only/workspace-write/danger-full-access),
+    so we migrate it to `danger-full-access` to match CQ's `-a/--auto` intent.
+    """
+    lines = (text or "").splitlines(keepends=True)
+    if not lines:
+        return text, False
+    out: list[str] = []
+    changed = False
+    for line in lines:
+        stripped = line.strip()
+        if "sandbox_mode" in stripped and ("\"full-auto\"" in stripped or "'full-auto'" in stripped):
+            out.append(line.replace('"full-auto"', '"danger-full-access"').replace("'full-auto'", '"danger-full-access"'))
+            changed = True
+            continue
+        out.append(line)
+    return "".join(out), changed
+
+
+@dataclass
+class TomlSection:
+    header: str
+    body: List[str] = field(default_factory=list)
+    project_key: Optional[str] = None
+
+    def lines(self) -> List[str]:
+        return ([self.header] if self.header else []) + self.body
+
+
+def _project_key(header: str) -> Optional[str]:
+    h = header.strip()
+    if not (h.startswith("[projects.") and h.endswith("]")):
+        return None
+    inner = h[len("[projects.") : -1].strip()
+    if len(inner) >= 2 and inner[0] == inner[-1] and inner[0] in {'"', "'"}:
+        raw = inner[1:-1]
+        return _toml_unescape_basic_string(raw) if inner[0] == '"' else raw
+    return None
+
+
+def index_sections(text: str) -> List[TomlSection]:
+    """Split the config into top-level tables (the preamble has an empty header) in one pass."""
+    sections: List[TomlSection] = []
+    current: Optional[TomlSection] = None
+    for ln in (text or "").splitlines(keepends=True):
+        # Start of a TOML table/array-of-table header (top-level only).
+        if ln.startswith("["):
+            current = TomlSection(header=ln, project_key=_project_key(ln))
+            sections.append(current)
+            continue
+        if current is None:
+            current = TomlSection(header="")
+            sections.append(current)
+        current.body.append(ln)
+    return sections
+
+
+def _dedupe(sections: List[TomlSection]) -> Tuple[List[TomlSection], bool]:
+    """
+    Codex TOML rejects duplicate `[projects."<path>"]` tables.
+    Keep the last occurrence for each key and drop earlier duplicates.
+    """
+    last = {s.project_key: i for i, s in enumerate(sections) if s.project_key is not None}
+    kept = [s for i, s in enumerate(sections) if s.project_key is None or last[s.project_key] == i]
+    return kept, len(kept) != len(sections)
+
+
+def _assigned_keys(lines: List[str]) -> Set[str]:
+    keys: Set[str] = set()
+    for ln in lines:
+        if "=" in ln:
+            keys.add(ln.split("=", 1)[0].strip())
+    return keys
+
+
+def _ensure_block(lines: List[str]) -> Tuple[List[str], bool]:
+    lines = list(lines)
+    begin_idx = None
+    end_idx = None
+    for i, ln in enumerate(lines):
+        if ln.strip() == CQ_BEGIN:
+            begin_idx = i
+        if ln.strip() == CQ_END:
+            end_idx = i
+            break
+
+    present = _assigned_keys(lines[1:])
+    missing = [ln for ln in DESIRED if ln.split("=", 1)[0].strip() not in present]
+    if not missing and begin_idx is None and end_idx is None:
+        # If the keys already exist (likely added previously), wrap them with markers (best-effort)
+        # so future diffs stay localized. Keep it conservative: only wrap if span is small.
+        key_lines = [i for i, ln in enumerate(lines) if _MANAGED_KEY_RE.search(ln)]
+        if key_lines and max(key_lines) - min(key_lines) <= 12:
+            insert_before = min(key_lines)
+            insert_after = max(key_lines) + 1
+            lines.insert(insert_before, CQ_BEGIN + "\n")
+            lines.insert(insert_after + 1, CQ_END + "\n")
+            return lines, True
+        return lines, False
+
+    if not missing:
+        return lines, False
+
+    if begin_idx is not None and end_idx is not None and begin_idx < end_idx:
+        # Insert missing keys right before end marker.
+        lines[end_idx:end_idx] = [m + "\n" for m in missing]
+        return lines, True
+
+    # No existing block: append a new CQ-managed block at end of this section.
+    block_lines = [CQ_BEGIN + "\n", *[m + "\n" for m in missing], CQ_END + "\n"]
+    insert_at = len(lines)
+    while insert_at > 0 and lines[insert_at - 1].strip() == "":
+        insert_at -= 1
+    if insert_at > 0 and lines[insert_at - 1].strip() != "":
+        block_lines.insert(0, "\n")
+    lines[insert_at:insert_at] = block_lines
+    return lines, True
+
+
+def apply_auto_approval(text: str, cwd: str) -> Tuple[str, bool]:
+    """Return `(new_text, changed)` with the project table for `cwd` carrying the desired keys."""
+    text, migrated = migrate_legacy_full_auto(text)
+    sections, deduped = _dedupe(index_sections(text))
+    header = project_header(cwd)
+
+    target = next((s for s in sections if s.header.rstrip() == header), None)
+    if target is not None:
+        new_lines, changed = _ensure_block(target.lines())
+        if changed:
+            target.header, target.body = new_lines[0], new_lines[1:]
+        content = "".join("".join(s.lines()) for s in sections)
+        return content, changed or deduped or migrated
+
+    # No existing section: append a new CQ-managed project section at end of file. A table for the
+    # same path spelled differently (e.g. single-quoted) would become a duplicate, so it is dropped.
+    sections = [s for s in sections if s.project_key != cwd]
+    content = "".join("".join(s.lines()) for s in sections)
+    entry = "\n".join([header, CQ_BEGIN, *DESIRED, CQ_END]) + "\n"
+    prefix = content.rstrip() + "\n\n" if content.strip() else ""
+    return prefix + entry, True
+
+
+def _fingerprint(path: Path, st: os.stat_result, data: bytes, cwd: str) -> dict:
+    return {
+        "version": FINGERPRINT_VERSION,
+        "config": str(path),
+        "cwd": cwd,
+        "size": int(st.st_size),
+        "mtime_ns": int(st.st_mtime_ns),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def _load_fingerprint(state_path: Path) -> dict:
+    try:
+        data = json.loads(Path(state_path).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) and data.get("version") == FINGERPRINT_VERSION else {}
+
+
+def _save_fingerprint(state_path: Path, record: dict) -> None:
+    try:
+        atomic_write_text(Path(state_path), json.dumps(record))
+    except Exception:
+        pass
+
+
+def ensure_auto_approval(cwd: str, *, state_path: Path, config_path: Optional[Path] = None) -> str:
+    """
+    Make sure the Codex config trusts `cwd`.
+
+    Returns "missing" (no config), "skipped" (matches the last verified fingerprint),
+    "ok" (verified, nothing to change) or "updated" (config rewritten).
+    """
+    path = codex_config_path() if config_path is None else Path(config_path)
+    try:
+        st = path.stat()
+    except OSError:
+        return "missing"
+
+    saved = _load_fingerprint(state_path)
+    same_target = saved.get("config") == str(path) and saved.get("cwd") == cwd
+    if same_target and saved.get("size") == st.st_size and saved.get("mtime_ns") == st.st_mtime_ns:
+        return "skipped"
+
+    data = path.read_bytes()
+    if same_target and saved.get("sha256") == hashlib.sha256(data).hexdigest():
+        # Touched but identical: refresh stat fields so the next start is stat-only again.
+        _save_fingerprint(state_path, _fingerprint(path, st, data, cwd))
+        return "skipped"
+
+    # Same newline translation as Path.read_text().
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    content, changed = apply_auto_approval(text, cwd)
+    if not changed:
+        _save_fingerprint(state_path, _fingerprint(path, st, data, cwd))
+        return "ok"
+
+    path.write_text(content, encoding="utf-8")
+    data = path.read_bytes()
+    _save_fingerprint(state_path, _fingerprint(path, path.stat(), data, cwd))
+    return "updated"
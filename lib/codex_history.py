@@ -0,0 +1,313 @@
+"""
+codex_history.py - Locate the latest Codex session log for a project.
+
+Codex writes one JSONL log per session under `~/.codex/sessions` (or `$CODEX_SESSION_ROOT`);
+the log's `session_meta` record carries the session id and the cwd it was started from.
+
+Parsed `session_meta` results are kept in a small on-disk index (`~/.cache/cq/`) keyed by
+log path, so repeated lookups only read the heads of new or changed logs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from cli_output import atomic_write_text
+from project_id import normalize_work_dir
+
+INDEX_VERSION = 1
+INDEX_MAX_ENTRIES = 5000
+HEAD_LINES = 30
+HEAD_BYTES = 64 * 1024
+READ_BATCH = 8
+READ_WORKERS = 4
+
+
+def codex_sessions_root() -> Path:
+    return Path(os.environ.get("CODEX_SESSION_ROOT") or (Path.home() / ".codex" / "sessions")).expanduser()
+
+
+def _index_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "codex-session-index.json"
+
+
+@dataclass
+class SessionMeta:
+    path: str
+    session_id: str
+    cwd_norm: str
+
+
+_DECODER = json.JSONDecoder()
+_WS = " \t\n\r"
+
+
+def _skip_ws(s: str, idx: int) -> int:
+    n = len(s)
+    while idx < n and s[idx] in _WS:
+        idx += 1
+    return idx
+
+
+def _partial_object(s: str, idx: int) -> Tuple[dict, int, bool]:
+    """
+    Scan a JSON object starting at `s[idx]`, keeping every member decoded before the text ends.
+
+    Returns `(members, end_index, complete)`. Nested objects are scanned the same way, so fields
+    that precede a truncated value (e.g. a huge `instructions` string) are still recovered.
+    """
+    out: dict = {}
+    idx = _skip_ws(s, idx)
+    if idx >= len(s) or s[idx] != "{":
+        return out, idx, False
+    idx += 1
+    while True:
+        idx = _skip_ws(s, idx)
+        if idx >= len(s):
+            return out, idx, False
+        ch = s[idx]
+        if ch == "}":
+            return out, idx + 1, True
+        if ch == ",":
+            idx += 1
+            continue
+        if ch != '"':
+            return out, idx, False
+        try:
+            key, idx = json.decoder.scanstring(s, idx + 1)
+        except ValueError:
+            return out, idx, False
+        idx = _skip_ws(s, idx)
+        if idx >= len(s) or s[idx] != ":":
+            return out, idx, False
+        idx = _skip_ws(s, idx + 1)
+        if idx < len(s) and s[idx] == "{":
+            value, idx, complete = _partial_object(s, idx)
+            out[key] = value
+            if not complete:
+                return out, idx, False
+            continue
+        try:
+            value, idx = _DECODER.raw_decode(s, idx)
+        except ValueError:
+            return out, idx, False
+        out[key] = value
+
+
+def _session_meta_from_text(text: str) -> Tuple[str, str]:
+    for line in text.split("\n", HEAD_LINES)[:HEAD_LINES]:
+        if '"session_meta"' not in line:
+            continue
+        entry, _, _ = _partial_object(line, 0)
+        if entry.get("type") != "session_meta":
+            continue
+        payload = entry.get("payload") if isinstance(entry.get("payload"), dict) else {}
+        cwd = payload.get("cwd")
+        if not isinstance(cwd, str) or not cwd.strip():
+            continue
+        sid = payload.get("id")
+        return (sid if isinstance(sid, str) else ""), normalize_work_dir(cwd)
+    return "", ""
+
+
+def read_session_meta(path: Path, max_bytes: int = HEAD_BYTES) -> Optional[Tuple[str, str]]:
+    """
+    Return `(session_id, cwd_norm)` from the log's `session_meta` record.
+
+    Only the first `max_bytes` of the file are read; a `session_meta` line longer than that is
+    scanned incrementally up to the cut. Returns `("", "")` when the head has no usable
+    `session_meta`, and None when unreadable.
+    """
+    try:
+        with Path(path).open("rb") as handle:
+            raw = handle.read(max_bytes)
+    except OSError:
+        return None
+    return _session_meta_from_text(raw.decode("utf-8", errors="ignore"))
+
+
+class CodexSessionIndex:
+    """
+    Persistent `log path -> (mtime_ns, size, session_id, cwd_norm)` cache.
+
+    Codex logs are append-only and `session_meta` is written first, so an entry with a session id
+    stays valid while the file only grows. Entries without one are re-read whenever the file changes.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else _index_path()
+        self.root = ""
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+
+    def load(self, root: Path) -> "CodexSessionIndex":
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            data = None
+        if (
+            isinstance(data, dict)
+            and data.get("version") == INDEX_VERSION
+            and data.get("root") == str(root)
+            and isinstance(data.get("files"), dict)
+        ):
+            self.entries = {k: v for k, v in data["files"].items() if isinstance(v, dict)}
+        self.root = str(root)
+        return self
+
+    def get(self, path: str, st: os.stat_result) -> Optional[dict]:
+        entry = self.entries.get(path)
+        if not entry:
+            return None
+        try:
+            cached_size = int(entry.get("size", -1))
+            cached_mtime = int(entry.get("mtime_ns", -1))
+        except Exception:
+            return None
+        if entry.get("session_id") and st.st_size >= cached_size:
+            return entry
+        if cached_size == st.st_size and cached_mtime == st.st_mtime_ns:
+            return entry
+        return None
+
+    def put(self, path: str, st: os.stat_result, session_id: str, cwd_norm: str) -> dict:
+        entry = {
+            "mtime_ns": int(st.st_mtime_ns),
+            "size": int(st.st_size),
+            "session_id": session_id,
+            "cwd_norm": cwd_norm,
+        }
+        self.entries[path] = entry
+        self.dirty = True
+        return entry
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        entries = self.entries
+        if len(entries) > INDEX_MAX_ENTRIES:
+            keep = sorted(entries.items(), key=lambda kv: int(kv[1].get("mtime_ns") or 0), reverse=True)
+            entries = dict(keep[:INDEX_MAX_ENTRIES])
+        payload = {"version": INDEX_VERSION, "root": self.root, "files": entries}
+        try:
+            atomic_write_text(self.path, json.dumps(payload, ensure_ascii=False))
+            self.dirty = False
+        except Exception:
+            pass
+
+
+def _scan_dir(path: str) -> Tuple[list[str], list[Tuple[Path, os.stat_result]]]:
+    dirs: list[str] = []
+    files: list[Tuple[Path, os.stat_result]] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.name.endswith(".jsonl"):
+                        st = entry.stat()
+                        if stat.S_ISREG(st.st_mode):
+                            files.append((Path(entry.path), st))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return dirs, files
+
+
+def iter_logs_newest_first(root: Path) -> Iterator[Tuple[Path, os.stat_result]]:
+    """
+    Yield `(path, stat)` for Codex logs, newest first, without listing the whole tree up front.
+
+    Codex partitions logs as `YYYY/MM/DD/*.jsonl`, so date directories are visited in descending
+    name order and only listed when reached; logs within a directory come newest mtime first, and
+    come before that directory's subdirectories. Non-date directories are visited after date ones.
+    """
+    dirs, files = _scan_dir(str(root))
+    files.sort(key=lambda item: item[1].st_mtime_ns, reverse=True)
+    yield from files
+    dated = sorted((d for d in dirs if d.isdigit()), reverse=True)
+    other = sorted((d for d in dirs if not d.isdigit()), reverse=True)
+    for name in dated + other:
+        yield from iter_logs_newest_first(Path(root) / name)
+
+
+def find_latest_session(
+    match: Callable[[str], bool],
+    *,
+    root: Optional[Path] = None,
+    scan_limit: int = 400,
+    index: Optional[CodexSessionIndex] = None,
+) -> Optional[SessionMeta]:
+    """
+    Return the newest log whose `session_meta` cwd satisfies `match(cwd_norm)`.
+
+    Logs are walked newest-first and the walk stops at the first match, so resuming a recent
+    session touches a handful of files. At most `scan_limit` logs are considered; heads are only
+    read for logs the index has not seen, a batch at a time on a small thread pool.
+    """
+    root = codex_sessions_root() if root is None else Path(root)
+    if not root.exists():
+        return None
+    idx = (index or CodexSessionIndex()).load(root)
+    found: Optional[SessionMeta] = None
+    pool: Optional[ThreadPoolExecutor] = None
+
+    def _evaluate(batch: list[Tuple[Path, os.stat_result, Optional[dict]]]) -> Optional[SessionMeta]:
+        nonlocal pool
+        # Read the heads of unindexed logs concurrently, then judge them in newest-first order.
+        pending = [(i, item[0]) for i, item in enumerate(batch) if item[2] is None]
+        metas: Dict[int, Optional[Tuple[str, str]]] = {}
+        if len(pending) > 1:
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=READ_WORKERS)
+            for (i, _), meta in zip(pending, pool.map(read_session_meta, [p for _, p in pending])):
+                metas[i] = meta
+        else:
+            for i, p in pending:
+                metas[i] = read_session_meta(p)
+        for i, (log_path, st, entry) in enumerate(batch):
+            key = str(log_path)
+            if entry is None:
+                meta = metas.get(i)
+                if meta is None:
+                    continue
+                entry = idx.put(key, st, *meta)
+            sid = str(entry.get("session_id") or "")
+            cwd_norm = str(entry.get("cwd_norm") or "")
+            if sid and cwd_norm and match(cwd_norm):
+                return SessionMeta(path=key, session_id=sid, cwd_norm=cwd_norm)
+        return None
+
+    try:
+        batch: list[Tuple[Path, os.stat_result, Optional[dict]]] = []
+        for scanned, (log_path, st) in enumerate(iter_logs_newest_first(root)):
+            if scanned >= scan_limit:
+                break
+            entry = idx.get(str(log_path), st)
+            if entry is not None and not batch:
+                # Indexed logs at the head of the walk need no I/O; judge them right away.
+                found = _evaluate([(log_path, st, entry)])
+                if found:
+                    break
+                continue
+            batch.append((log_path, st, entry))
+            if len(batch) >= READ_BATCH:
+                found = _evaluate(batch)
+                batch = []
+                if found:
+                    break
+        if not found and batch:
+            found = _evaluate(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        idx.save()
+    return found
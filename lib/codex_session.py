@@ -7,8 +7,9 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Mapping, Optional, Tuple
 
+import cq_trace
 from cq_config import apply_backend_env
-from project_id import compute_cq_project_id
+from project_keys import project_keys
 from session_utils import find_project_session_file as _find_project_session_file, safe_write_session
 from terminal import get_backend_for_session
 
@@ -156,19 +157,26 @@ class CodexProjectSession:
 
 def load_project_session(
     work_dir: Path, *, session: str | None = None, env: Mapping[str, str] | None = None
+) -> Optional[CodexProjectSession]:
+    with cq_trace.stage("load_codex_session"):
+        loaded = _load_project_session(work_dir, session=session, env=env)
+        cq_trace.set_winner("session_file" if loaded else "none")
+        return loaded
+
+
+def _load_project_session(
+    work_dir: Path, *, session: str | None = None, env: Mapping[str, str] | None = None
 ) -> Optional[CodexProjectSession]:
     session_file = find_project_session_file(work_dir, session=session, env=env)
     if not session_file:
         return None
+    cq_trace.note("session_file", str(session_file))
     data = _read_json(session_file)
     if not data:
         return None
     data.setdefault("work_dir", str(work_dir))
     if not data.get("cq_project_id"):
-        try:
-            data["cq_project_id"] = compute_cq_project_id(Path(data.get("work_dir") or work_dir))
-        except Exception:
-            pass
+        data["cq_project_id"] = project_keys(data.get("work_dir") or work_dir).cq_project_id
     return CodexProjectSession(session_file=session_file, data=data)
 
 
@@ -180,8 +188,5 @@ def compute_session_key(session: CodexProjectSession) -> str:
     """
     pid = str(session.data.get("cq_project_id") or "").strip()
     if not pid:
-        try:
-            pid = compute_cq_project_id(Path(session.work_dir))
-        except Exception:
-            pid = ""
+        pid = project_keys(session.work_dir).cq_project_id
     return f"codex:{pid}" if pid else "codex:unknown"
@@ -0,0 +1,462 @@
+"""
+cq_gc.py - Incremental garbage collection for CQ's on-disk state (`cq gc`).
+
+Stores:
+  - registry:   expired `~/.cq/run/cq-session-*.json` records (past `REGISTRY_TTL_SECONDS`)
+  - locks:      unheld `~/.cq/run/*.lock` files untouched for `CQ_GC_LOCK_MIN_AGE_S` (default: 1 day)
+  - runtime:    `$TMP/claude-ai-<user>/ai-*` dirs older than `CQ_RUNTIME_GC_MIN_AGE_S` (default: 1 day)
+                with no live recorded pid; in live dirs, `pane-crash-*.log` files older than
+                `CQ_GC_CRASH_LOG_MAX_AGE_S` (default: 7 days)
+  - sessions:   `<project>/.cq_config/sessions/<name>/` dirs untouched for `CQ_GC_SESSION_MAX_AGE_S`
+                (default: 30 days) whose session lock is not held
+
+Each store is walked in name order from a persisted cursor (`~/.cache/cq/gc-state.json`) until
+the shared budget runs out, so a run does bounded work and the next run picks up where it
+stopped. Dry runs report what would be removed without deleting or moving cursors.
+"""
+
+from __future__ import annotations
+
+import getpass
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from cli_output import atomic_write_text
+from housekeeping import Budget
+from process_lock import ProviderLock, _is_pid_alive
+from session_registry import REGISTRY_PREFIX, REGISTRY_SUFFIX, registry_record_expired
+from session_scope import normalize_session_name
+
+STATE_VERSION = 1
+STORES = ("registry", "locks", "runtime", "sessions")
+
+DEFAULT_LOCK_MIN_AGE_S = 24 * 3600.0
+DEFAULT_RUNTIME_MIN_AGE_S = 24 * 3600.0
+DEFAULT_CRASH_LOG_MAX_AGE_S = 7 * 24 * 3600.0
+DEFAULT_SESSION_MAX_AGE_S = 30 * 24 * 3600.0
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(0.0, float(raw))
+    except Exception:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = (os.environ.get(name) or "").strip().lower()
+    if not raw:
+        return default
+    return raw not in ("0", "false", "no", "off")
+
+
+def run_dir() -> Path:
+    return Path.home() / ".cq" / "run"
+
+
+def runtime_base_dir() -> Path:
+    try:
+        base = Path(tempfile.gettempdir())
+    except Exception:
+        base = Path("/tmp")
+    return base / f"claude-ai-{getpass.getuser()}"
+
+
+def _state_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "gc-state.json"
+
+
+@dataclass
+class GcAction:
+    store: str
+    path: str
+    reason: str
+    bytes: int = 0
+
+
+@dataclass
+class GcReport:
+    dry_run: bool
+    actions: List[GcAction] = field(default_factory=list)
+    scanned: Dict[str, int] = field(default_factory=dict)
+    complete: Dict[str, bool] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "actions": [asdict(a) for a in self.actions],
+            "scanned": dict(self.scanned),
+            "complete": dict(self.complete),
+            "elapsed_s": round(self.elapsed_s, 3),
+        }
+
+    def format(self) -> str:
+        verb = "Would remove" if self.dry_run else "Removed"
+        lines = []
+        for store in self.scanned:
+            removed = [a for a in self.actions if a.store == store]
+            size = sum(a.bytes for a in removed)
+            status = "" if self.complete.get(store) else " (budget reached, will resume)"
+            lines.append(
+                f"{store}: scanned {self.scanned[store]}, {verb.lower()} {len(removed)} ({size} bytes){status}"
+            )
+            for action in removed:
+                lines.append(f"   {verb}: {action.path} ({action.reason})")
+        lines.append(f"Elapsed: {self.elapsed_s:.2f}s")
+        return "\n".join(lines)
+
+
+class GcState:
+    """Per-store resume cursors (the last name handled by a budget-limited walk)."""
+
+    def __init__(self, path: Optional[Path] = None, *, load: bool = True):
+        self.path = _state_path() if path is None else Path(path)
+        self.cursors: Dict[str, str] = {}
+        if not load:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == STATE_VERSION and isinstance(data.get("cursors"), dict):
+            self.cursors = {str(k): str(v) for k, v in data["cursors"].items()}
+
+    def save(self) -> None:
+        payload = {"version": STATE_VERSION, "cursors": self.cursors, "updated_at": int(time.time())}
+        try:
+            atomic_write_text(self.path, json.dumps(payload))
+        except Exception:
+            pass
+
+
+def _tree_size(path: Path) -> int:
+    if not path.is_dir():
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _lock_is_held(path: Path) -> bool:
+    """Whether another process holds `path` (a ProviderLock file). Unknown counts as held."""
+    if os.name == "nt":
+        return True
+    try:
+        import fcntl
+
+        fd = os.open(str(path), os.O_RDWR)
+    except Exception:
+        return path.exists()
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return False
+    finally:
+        os.close(fd)
+
+
+def _remove_unheld_lock(path: Path, *, dry_run: bool) -> bool:
+    """
+    Unlink ProviderLock file `path` unless someone holds it; True if it was (or would be) removed.
+
+    The unlink happens while we hold the flock ourselves, so nobody can lock the file in between;
+    a process that opened it earlier finds its inode gone after flocking and reopens the path.
+    """
+    if os.name == "nt":
+        return False
+    import fcntl
+
+    try:
+        fd = os.open(str(path), os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                return False  # Replaced while we were opening it: somebody is using it.
+        except OSError:
+            return False
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        return True
+    finally:
+        os.close(fd)
+
+
+def _remove_idle_queue(queue: Path) -> None:
+    """Remove a lock's waiter queue that only holds its ticket counter, under the counter's lock."""
+    import fcntl
+
+    seq = queue / "seq"
+    try:
+        fd = os.open(str(seq), os.O_RDWR)
+    except OSError:
+        return
+    try:
+        # `_TicketQueue.enter` holds this lock until its ticket exists, and rechecks the inode.
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if os.fstat(fd).st_ino != os.stat(seq).st_ino:
+            return
+        if any(p.name != "seq" for p in queue.iterdir()):
+            return
+        seq.unlink()
+        queue.rmdir()
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _list_names(base: Path, accept: Callable[[str], bool]) -> List[str]:
+    try:
+        return sorted(name for name in os.listdir(base) if accept(name))
+    except OSError:
+        return []
+
+
+Handler = Callable[[str], List[GcAction]]
+
+
+def _walk(
+    store: str,
+    names: Sequence[str],
+    handle: Handler,
+    *,
+    state: GcState,
+    budget: Budget,
+    report: GcReport,
+) -> None:
+    """Visit `names` starting after the store's cursor (wrapping around) until the budget runs out."""
+    cursor = state.cursors.get(store, "")
+    start = 0
+    if cursor:
+        start = next((i for i, name in enumerate(names) if name > cursor), len(names))
+    ordered = list(names[start:]) + list(names[:start])
+    scanned = 0
+    for name in ordered:
+        if budget.exhausted():
+            break
+        budget.spend()
+        scanned += 1
+        try:
+            report.actions.extend(handle(name))
+        except Exception:
+            pass
+        cursor = name
+    report.scanned[store] = scanned
+    report.complete[store] = scanned == len(ordered)
+    state.cursors[store] = "" if report.complete[store] else cursor
+
+
+def _older_than(path: Path, age_s: float, now: float) -> bool:
+    try:
+        return (now - path.stat().st_mtime) >= age_s
+    except OSError:
+        return False
+
+
+def _registry_handler(base: Path, dry_run: bool, now: float) -> Handler:
+    def handle(name: str) -> List[GcAction]:
+        path = base / name
+        if not registry_record_expired(path, int(now)):
+            return []
+        action = GcAction("registry", str(path), "expired", _tree_size(path))
+        if not dry_run:
+            _remove(path)
+        return [action]
+
+    return handle
+
+
+def _lock_handler(base: Path, dry_run: bool, now: float) -> Handler:
+    min_age_s = _env_float("CQ_GC_LOCK_MIN_AGE_S", DEFAULT_LOCK_MIN_AGE_S)
+
+    def handle(name: str) -> List[GcAction]:
+        path = base / name
+        # ProviderLock rewrites its pid on every acquire, so the mtime tracks the last use.
+        if not _older_than(path, min_age_s, now):
+            return []
+        size = _tree_size(path)
+        if not _remove_unheld_lock(path, dry_run=dry_run):
+            return []
+        if not dry_run:
+            # The waiter queue next to it only holds the ticket counter once nobody waits.
+            _remove_idle_queue(base / f"{name}.queue")
+        return [GcAction("locks", str(path), "not held", size)]
+
+    return handle
+
+
+def _runtime_dir_alive(session_dir: Path) -> bool:
+    for pid_file in session_dir.glob("**/*.pid"):
+        try:
+            raw = pid_file.read_text(encoding="utf-8", errors="ignore").strip()
+        except Exception:
+            continue
+        if raw.isdigit() and _is_pid_alive(int(raw)):
+            return True
+    return False
+
+
+def _runtime_handler(base: Path, dry_run: bool, now: float, exclude: Optional[Path]) -> Handler:
+    min_age_s = _env_float("CQ_RUNTIME_GC_MIN_AGE_S", DEFAULT_RUNTIME_MIN_AGE_S)
+    crash_max_age_s = _env_float("CQ_GC_CRASH_LOG_MAX_AGE_S", DEFAULT_CRASH_LOG_MAX_AGE_S)
+    exclude_s = ""
+    if exclude is not None:
+        try:
+            exclude_s = str(Path(exclude).resolve())
+        except Exception:
+            exclude_s = str(exclude)
+
+    def _prune_crash_logs(session_dir: Path) -> List[GcAction]:
+        out: List[GcAction] = []
+        for log in session_dir.glob("*/pane-crash-*.log"):
+            if not _older_than(log, crash_max_age_s, now):
+                continue
+            out.append(GcAction("runtime", str(log), "old crash log", _tree_size(log)))
+            if not dry_run:
+                _remove(log)
+        return out
+
+    def handle(name: str) -> List[GcAction]:
+        session_dir = base / name
+        if not session_dir.is_dir():
+            return []
+        try:
+            if exclude_s and str(session_dir.resolve()) == exclude_s:
+                return []
+        except Exception:
+            pass
+        if not _older_than(session_dir, min_age_s, now) or _runtime_dir_alive(session_dir):
+            return _prune_crash_logs(session_dir)
+        action = GcAction("runtime", str(session_dir), "stale runtime dir", _tree_size(session_dir))
+        if not dry_run:
+            _remove(session_dir)
+        return [action]
+
+    return handle
+
+
+def _newest_mtime(path: Path) -> float:
+    newest = 0.0
+    for root, _dirs, files in os.walk(path):
+        for name in [root, *[os.path.join(root, f) for f in files]]:
+            try:
+                newest = max(newest, os.lstat(name).st_mtime)
+            except OSError:
+                continue
+    return newest
+
+
+def _sessions_handler(base: Path, work_dir: Path, dry_run: bool, now: float) -> Handler:
+    max_age_s = _env_float("CQ_GC_SESSION_MAX_AGE_S", DEFAULT_SESSION_MAX_AGE_S)
+    lock_cwd = str(work_dir)
+
+    def handle(name: str) -> List[GcAction]:
+        session_dir = base / name
+        if not session_dir.is_dir():
+            return []
+        try:
+            normalized = normalize_session_name(name)
+        except ValueError:
+            return []
+        if now - _newest_mtime(session_dir) < max_age_s:
+            return []
+        # A running launcher for this session holds its lock (see cmd_start).
+        lock_file = ProviderLock("cq", timeout=0.1, cwd=f"{lock_cwd}::{normalized}").lock_file
+        if lock_file.exists() and _lock_is_held(lock_file):
+            return []
+        action = GcAction("sessions", str(session_dir), "abandoned session", _tree_size(session_dir))
+        if not dry_run:
+            _remove(session_dir)
+        return [action]
+
+    return handle
+
+
+def run_gc(
+    stores: Optional[Iterable[str]] = None,
+    *,
+    dry_run: bool = False,
+    budget: Optional[Budget] = None,
+    work_dir: Optional[Path] = None,
+    exclude: Optional[Path] = None,
+    state: Optional[GcState] = None,
+) -> GcReport:
+    """
+    Collect stale state from `stores` (default: all) within `budget`.
+
+    `work_dir` selects the project whose `.cq_config/sessions/` is checked (default: cwd);
+    `exclude` protects a runtime dir (the caller's own).
+    """
+    started = time.monotonic()
+    now = time.time()
+    selected = [s for s in (stores or STORES) if s in STORES]
+    budget = Budget(30.0) if budget is None else budget
+    state = GcState() if state is None else state
+    report = GcReport(dry_run=dry_run)
+    # Dry runs never move cursors, so a real run afterwards covers the same entries.
+    walk_state = state
+    if dry_run:
+        walk_state = GcState(state.path, load=False)
+        walk_state.cursors = dict(state.cursors)
+
+    try:
+        wd = Path(work_dir or Path.cwd()).resolve()
+    except Exception:
+        wd = Path(work_dir or Path.cwd()).absolute()
+
+    for store in selected:
+        if store == "registry":
+            base = run_dir()
+            names = _list_names(base, lambda n: n.startswith(REGISTRY_PREFIX) and n.endswith(REGISTRY_SUFFIX))
+            handle = _registry_handler(base, dry_run, now)
+        elif store == "locks":
+            base = run_dir()
+            names = _list_names(base, lambda n: n.endswith(".lock"))
+            handle = _lock_handler(base, dry_run, now)
+        elif store == "runtime":
+            if not _env_bool("CQ_RUNTIME_GC", True):
+                continue
+            base = runtime_base_dir()
+            names = _list_names(base, lambda n: n.startswith("ai-"))
+            handle = _runtime_handler(base, dry_run, now, exclude)
+        else:
+            base = wd / ".cq_config" / "sessions"
+            names = _list_names(base, lambda n: not n.startswith("."))
+            handle = _sessions_handler(base, wd, dry_run, now)
+        _walk(store, names, handle, state=walk_state, budget=budget, report=report)
+
+    if not dry_run:
+        state.save()
+    report.elapsed_s = time.monotonic() - started
+    return report
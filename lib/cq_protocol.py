@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import hashlib
 import re
 import secrets
+from dataclasses import dataclass
+from typing import Optional, Union
 
 REQ_ID_PREFIX = "CQ_REQ_ID:"
 REPLY_PREFIX = "CQ_REPLY:"
@@ -70,3 +73,275 @@ def wrap_reply_payload(
         "[CQ_RESULT] No reply required.\n\n"
         f"{message}\n"
     )
+
+
+# ---------------------------------------------------------------------------
+# v2 envelope
+#
+# An optional single header line in front of the v1 payload:
+#
+#   CQ_ENVELOPE: v2 kind=req id=<req_id> len=<bytes> sha=<16 hex> [part=<i>/<n>] [from=<provider>]
+#
+# followed by exactly `len` bytes (UTF-8) of body, which is the usual v1 payload
+# (`CQ_REQ_ID:` / `CQ_REPLY:` headers + message), so readers that do not know v2 still work.
+# A v2 reader routes on the header alone, takes the body by length, and detects truncation
+# (fewer bytes) or corruption (hash mismatch) without scanning the text; anything after the
+# body (harness `*_DONE` tags, prompts) is returned as `trailer`.
+#
+# The body is canonicalized before measuring (no `\r`, no trailing whitespace) because the
+# terminal backends strip exactly that when sending.
+# ---------------------------------------------------------------------------
+
+ENVELOPE_PREFIX = "CQ_ENVELOPE:"
+ENVELOPE_VERSION = "v2"
+ENVELOPE_KINDS = ("req", "reply")
+_ENVELOPE_MARKER = ENVELOPE_PREFIX.encode()
+_HASH_HEX = 16
+
+
+def _canonical_body(text: str) -> bytes:
+    return (text or "").replace("\r", "").rstrip().encode("utf-8")
+
+
+def _body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:_HASH_HEX]
+
+
+def _header_token(name: str, value: str) -> str:
+    value = str(value or "").strip()
+    if not value or any(ch.isspace() for ch in value) or "=" in value:
+        raise ValueError(f"invalid envelope {name}: {value!r}")
+    return f"{name}={value}"
+
+
+@dataclass
+class Envelope:
+    """One parsed v2 envelope. `complete` is False when fewer than `length` body bytes arrived."""
+
+    kind: str
+    msg_id: str
+    length: int
+    sha: str
+    body: str
+    complete: bool
+    part: int = 1
+    parts: int = 1
+    from_provider: str = ""
+    version: str = ENVELOPE_VERSION
+    trailer: str = ""
+
+    @property
+    def verified(self) -> bool:
+        """Complete and the body hash matches the header."""
+        return self.complete and _body_hash(self.body.encode("utf-8")) == self.sha
+
+    @property
+    def truncated(self) -> bool:
+        return not self.complete
+
+
+def encode_envelope(
+    body: str,
+    *,
+    kind: str,
+    msg_id: str,
+    from_provider: str = "",
+    part: int = 1,
+    parts: int = 1,
+) -> str:
+    """Frame `body` (normally a v1 payload) with a v2 header line."""
+    if kind not in ENVELOPE_KINDS:
+        raise ValueError(f"invalid envelope kind: {kind!r}")
+    if not (1 <= part <= parts):
+        raise ValueError(f"invalid envelope part {part}/{parts}")
+    data = _canonical_body(body)
+    tokens = [
+        ENVELOPE_PREFIX,
+        ENVELOPE_VERSION,
+        f"kind={kind}",
+        _header_token("id", msg_id),
+        f"len={len(data)}",
+        f"sha={_body_hash(data)}",
+    ]
+    if parts > 1:
+        tokens.append(f"part={part}/{parts}")
+    if from_provider:
+        tokens.append(_header_token("from", from_provider))
+    return " ".join(tokens) + "\n" + data.decode("utf-8") + "\n"
+
+
+def _bad_cut(data: bytes, end: int) -> bool:
+    """Cutting before `end` would split a UTF-8 sequence or leave the chunk ending in whitespace."""
+    if end < len(data) and (data[end] & 0xC0) == 0x80:
+        return True
+    start = end - 1
+    while start > 0 and (data[start] & 0xC0) == 0x80:
+        start -= 1
+    # `str.isspace`, like the `rstrip()` in `_canonical_body`: NBSP, U+3000 etc. count too.
+    return data[start:end].decode("utf-8", errors="replace").isspace()
+
+
+def _split_points(data: bytes, max_bytes: int) -> list[int]:
+    """
+    Cut offsets so every chunk fits `max_bytes`, ends on a UTF-8 boundary and not in whitespace.
+
+    A whitespace run longer than `max_bytes` cannot be cut that way, so the chunk holding it runs
+    past `max_bytes` up to the next non-whitespace character instead.
+    """
+    cuts = [0]
+    while len(data) - cuts[-1] > max_bytes:
+        start = cuts[-1]
+        end = start + max_bytes
+        while end > start and _bad_cut(data, end):
+            end -= 1
+        if end == start:
+            end = start + max_bytes
+            while end < len(data) and _bad_cut(data, end):
+                end += 1
+            if end >= len(data):
+                break
+        cuts.append(end)
+    cuts.append(len(data))
+    return cuts
+
+
+def encode_parts(body: str, *, kind: str, msg_id: str, max_bytes: int, from_provider: str = "") -> list[str]:
+    """Split `body` into envelopes of at most `max_bytes` body bytes each (`part=i/n`; see `_split_points`)."""
+    if max_bytes <= 0:
+        raise ValueError("max_bytes must be positive")
+    data = _canonical_body(body)
+    cuts = _split_points(data, max_bytes)
+    chunks = [data[a:b].decode("utf-8") for a, b in zip(cuts, cuts[1:])] or [""]
+    return [
+        encode_envelope(chunk, kind=kind, msg_id=msg_id, from_provider=from_provider, part=i, parts=len(chunks))
+        for i, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def _parse_header(line: bytes) -> Optional[dict]:
+    try:
+        tokens = line.decode("utf-8").strip().split()
+    except UnicodeDecodeError:
+        return None
+    if len(tokens) < 2 or tokens[0] != ENVELOPE_PREFIX or tokens[1] != ENVELOPE_VERSION:
+        return None
+    fields = dict(tok.split("=", 1) for tok in tokens[2:] if "=" in tok)
+    try:
+        header = {
+            "kind": fields["kind"],
+            "msg_id": fields["id"],
+            "length": int(fields["len"]),
+            "sha": fields["sha"],
+            "from_provider": fields.get("from", ""),
+        }
+        part, _, parts = fields.get("part", "1/1").partition("/")
+        header["part"], header["parts"] = int(part), int(parts)
+    except (KeyError, ValueError):
+        return None
+    if header["length"] < 0 or header["kind"] not in ENVELOPE_KINDS:
+        return None
+    return header
+
+
+class EnvelopeParser:
+    """
+    Incremental v2 reader: `feed()` text or bytes as they arrive, get completed envelopes back.
+
+    Only header lines are searched for; bodies are consumed by length. Text outside envelopes is
+    skipped. `finish()` returns a pending, truncated envelope (if any) at end of input.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._header: Optional[dict] = None
+        # Whether the buffer starts at a line start (the last byte dropped from it was `\n`).
+        self._at_line_start = True
+
+    def _drop(self, n: int) -> None:
+        if n > 0:
+            self._at_line_start = self._buf[n - 1] == 0x0A
+            del self._buf[:n]
+
+    def feed(self, data: Union[str, bytes]) -> list[Envelope]:
+        self._buf += data.encode("utf-8") if isinstance(data, str) else data
+        out: list[Envelope] = []
+        while True:
+            if self._header is None:
+                idx = self._buf.find(_ENVELOPE_MARKER)
+                if idx < 0:
+                    # Keep a possible partial marker at the end.
+                    self._drop(len(self._buf) - (len(_ENVELOPE_MARKER) - 1))
+                    break
+                if not (self._buf[idx - 1] == 0x0A if idx > 0 else self._at_line_start):
+                    self._drop(idx + 1)
+                    continue
+                nl = self._buf.find(b"\n", idx)
+                if nl < 0:
+                    self._drop(idx)
+                    break
+                header = _parse_header(bytes(self._buf[idx:nl]))
+                self._drop(nl + 1)
+                if header is None:
+                    continue
+                self._header = header
+            need = self._header["length"]
+            if len(self._buf) < need:
+                break
+            body = bytes(self._buf[:need])
+            self._drop(need)
+            out.append(Envelope(body=body.decode("utf-8", errors="replace"), complete=True, **self._header))
+            self._header = None
+        return out
+
+    def finish(self) -> Optional[Envelope]:
+        if self._header is None:
+            return None
+        env = Envelope(body=bytes(self._buf).decode("utf-8", errors="replace"), complete=False, **self._header)
+        self._header = None
+        self._buf.clear()
+        self._at_line_start = True
+        return env
+
+    def pending(self) -> bytes:
+        """Bytes buffered after the last complete envelope."""
+        return bytes(self._buf)
+
+
+def decode_envelope(text: str) -> Optional[Envelope]:
+    """Parse the first v2 envelope in `text` (None if there is none); what follows becomes `trailer`."""
+    data = (text or "").encode("utf-8")
+    start = 0
+    while True:
+        idx = data.find(_ENVELOPE_MARKER, start)
+        if idx < 0:
+            return None
+        start = idx + 1
+        if idx > 0 and data[idx - 1 : idx] != b"\n":
+            continue
+        nl = data.find(b"\n", idx)
+        if nl < 0:
+            return None
+        header = _parse_header(data[idx:nl])
+        if header is None:
+            continue
+        end = nl + 1 + header["length"]
+        body = data[nl + 1 : end]
+        return Envelope(
+            body=body.decode("utf-8", errors="replace"),
+            complete=len(body) == header["length"],
+            trailer=data[end:].decode("utf-8", errors="replace").strip(),
+            **header,
+        )
+
+
+def join_parts(envelopes: list[Envelope]) -> Optional[str]:
+    """Reassemble a multi-part message; None if a part is missing, truncated or corrupt."""
+    if not envelopes:
+        return None
+    total = envelopes[0].parts
+    by_part = {env.part: env for env in envelopes if env.msg_id == envelopes[0].msg_id}
+    if sorted(by_part) != list(range(1, total + 1)):
+        return None
+    if not all(by_part[i].verified for i in by_part):
+        return None
+    return "".join(by_part[i].body for i in range(1, total + 1))
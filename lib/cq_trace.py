@@ -0,0 +1,212 @@
+"""
+Resolution tracing for `--explain` / `CQ_EXPLAIN=1`.
+
+Tracing is off by default and every helper is a cheap no-op until `enable()` is called.
+When enabled, a process-wide trace records named stages with elapsed time plus what each
+stage touched: files opened, subprocesses spawned (via `sys.addaudithook`), counters such as
+registry records considered, and the winning resolution source.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+_IGNORED_SUFFIXES = (".py", ".pyc", ".so", ".pyd", ".pth", ".zip")
+
+
+@dataclass
+class Stage:
+    name: str
+    depth: int
+    started: float
+    elapsed_ms: float = 0.0
+    files: List[str] = field(default_factory=list)
+    procs: List[str] = field(default_factory=list)
+    counters: Dict[str, int] = field(default_factory=dict)
+    notes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "files": list(self.files),
+            "procs": list(self.procs),
+            "counters": dict(self.counters),
+            "notes": dict(self.notes),
+        }
+
+
+class Trace:
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.stages: List[Stage] = []
+        self.winner: Optional[str] = None
+        self._stack: List[Stage] = []
+        self._root = Stage(name="(other)", depth=0, started=self.started)
+
+    def current(self) -> Stage:
+        return self._stack[-1] if self._stack else self._root
+
+    def push(self, name: str) -> Stage:
+        st = Stage(name=name, depth=len(self._stack), started=time.perf_counter())
+        self.stages.append(st)
+        self._stack.append(st)
+        return st
+
+    def pop(self, st: Stage) -> None:
+        st.elapsed_ms = (time.perf_counter() - st.started) * 1000.0
+        if self._stack and self._stack[-1] is st:
+            self._stack.pop()
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        for st in self._stack:
+            # Stages still open when the trace is reported run up to "now".
+            st.elapsed_ms = (now - st.started) * 1000.0
+        stages = [st.to_dict() for st in self.stages]
+        root = self._root
+        if root.files or root.procs or root.counters or root.notes:
+            # Activity outside any stage; its "elapsed" is the whole run.
+            root.elapsed_ms = self.total_ms()
+            stages.append(root.to_dict())
+        return {
+            "trace": self.label,
+            "winner": self.winner,
+            "total_ms": round(self.total_ms(), 3),
+            "stages": stages,
+        }
+
+    def format(self) -> str:
+        data = self.to_dict()
+        lines = [f"[EXPLAIN] {self.label}"]
+        for st in data["stages"]:
+            indent = "  " * (st["depth"] + 1)
+            summary = f"{indent}{st['name']}: {st['elapsed_ms']:.1f} ms"
+            extras = [f"files={len(st['files'])}", f"procs={len(st['procs'])}"]
+            extras.extend(f"{k}={v}" for k, v in st["counters"].items())
+            lines.append(f"{summary} ({', '.join(extras)})")
+            for k, v in st["notes"].items():
+                lines.append(f"{indent}  {k}: {v}")
+            for path in st["files"]:
+                lines.append(f"{indent}  read {path}")
+            for cmd in st["procs"]:
+                lines.append(f"{indent}  exec {cmd}")
+        lines.append(f"  winner: {data['winner'] or '-'}")
+        lines.append(f"  total: {data['total_ms']:.1f} ms")
+        return "\n".join(lines)
+
+
+_ACTIVE: Optional[Trace] = None
+_HOOK_INSTALLED = False
+
+
+def _audit_hook(event: str, args: tuple) -> None:
+    trace = _ACTIVE
+    if trace is None:
+        return
+    try:
+        if event == "open":
+            path = args[0]
+            if not isinstance(path, (str, bytes, os.PathLike)):
+                return
+            path = os.fsdecode(path)
+            if path.endswith(_IGNORED_SUFFIXES) or "__pycache__" in path:
+                return
+            trace.current().files.append(path)
+        elif event == "subprocess.Popen":
+            argv = args[1]
+            if isinstance(argv, (list, tuple)):
+                cmd = " ".join(os.fsdecode(a) if isinstance(a, bytes) else str(a) for a in argv)
+            else:
+                cmd = str(argv)
+            trace.current().procs.append(cmd)
+    except Exception:
+        pass
+
+
+def env_enabled(env: Optional[Dict[str, str]] = None) -> bool:
+    env_map = os.environ if env is None else env
+    val = (env_map.get("CQ_EXPLAIN") or "").strip().lower()
+    return bool(val) and val not in ("0", "false", "no", "off")
+
+
+def enable(label: str) -> Trace:
+    """Start a new process-wide trace (replacing any previous one)."""
+    global _ACTIVE, _HOOK_INSTALLED
+    _ACTIVE = Trace(label)
+    if not _HOOK_INSTALLED:
+        # Audit hooks cannot be removed; the hook is inert while no trace is active.
+        sys.addaudithook(_audit_hook)
+        _HOOK_INSTALLED = True
+    return _ACTIVE
+
+
+def disable() -> Optional[Trace]:
+    global _ACTIVE
+    trace, _ACTIVE = _ACTIVE, None
+    return trace
+
+
+def active() -> Optional[Trace]:
+    return _ACTIVE
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Optional[Stage]]:
+    trace = _ACTIVE
+    if trace is None:
+        yield None
+        return
+    st = trace.push(name)
+    try:
+        yield st
+    finally:
+        trace.pop(st)
+
+
+def count(name: str, n: int = 1) -> None:
+    trace = _ACTIVE
+    if trace is None:
+        return
+    counters = trace.current().counters
+    counters[name] = counters.get(name, 0) + int(n)
+
+
+def note(key: str, value: Any) -> None:
+    trace = _ACTIVE
+    if trace is None:
+        return
+    trace.current().notes[key] = value
+
+
+def set_winner(source: str) -> None:
+    trace = _ACTIVE
+    if trace is None:
+        return
+    trace.winner = source
+
+
+def report(stream: Optional[TextIO] = None) -> None:
+    """Print and stop the active trace (text by default, JSON when CQ_EXPLAIN=json)."""
+    trace = disable()
+    if trace is None:
+        return
+    out = sys.stderr if stream is None else stream
+    try:
+        if (os.environ.get("CQ_EXPLAIN") or "").strip().lower() == "json":
+            print(json.dumps(trace.to_dict(), ensure_ascii=False), file=out)
+        else:
+            print(trace.format(), file=out)
+    except Exception:
+        pass
@@ -0,0 +1,108 @@
+"""
+delivery_dedupe.py - Skip re-delivering the exact same `ask` payload to the same pane.
+
+Wrapper retries and skill flows that re-run `ask` after an ambiguous failure can send the same
+`CQ_REQ_ID` request or `CQ_REPLY` payload twice, and the provider then does the work twice.
+`ask` keeps a short-lived record per pane of what it delivered, keyed by (req_id, body hash);
+an exact repeat within `TTL_S` is skipped unless `--force` is given. The same req_id with a
+different body is delivered (it is a new message).
+
+Records live in `<runtime dir>/delivered/<pane>.json` (see `sandbox_probe.runtime_dir`) and are
+read, checked and updated under an flock around the send, so two racing retries deliver once.
+
+Set `CQ_DEDUPE=0` to disable.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sandbox_probe import runtime_dir
+
+TTL_S = 600.0
+MAX_ENTRIES = 200
+
+
+def enabled(env: Optional[Dict[str, str]] = None) -> bool:
+    env_map = os.environ if env is None else env
+    val = (env_map.get("CQ_DEDUPE") or "").strip().lower()
+    return val not in ("0", "false", "no", "off")
+
+
+def body_hash(text: str) -> str:
+    # Same canonical form the terminal backends send (no `\r`, no surrounding whitespace).
+    data = (text or "").replace("\r", "").strip().encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def record_path(pane_key: str, base: Optional[Path] = None) -> Path:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", pane_key or "unknown")[:120]
+    return (runtime_dir() if base is None else base) / "delivered" / f"{safe}.json"
+
+
+class PaneDeliveries:
+    """Recent deliveries to one pane, read and rewritten under an exclusive flock."""
+
+    def __init__(self, pane_key: str, *, base: Optional[Path] = None, ttl: float = TTL_S):
+        self.path = record_path(pane_key, base)
+        self.ttl = ttl
+        self.entries: List[dict] = []
+        self._fd: Optional[int] = None
+        self._dirty = False
+
+    def __enter__(self) -> "PaneDeliveries":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self.path), os.O_CREAT | os.O_RDWR, 0o600)
+        if os.name != "nt":
+            import fcntl
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        now = time.time()
+        self.entries = [e for e in self._read() if now - float(e.get("ts") or 0) < self.ttl]
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._dirty:
+                self._write()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read(self) -> List[dict]:
+        chunks = []
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        while True:
+            chunk = os.read(self._fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            data = json.loads(b"".join(chunks).decode("utf-8"))
+        except Exception:
+            return []
+        entries = data.get("delivered") if isinstance(data, dict) else None
+        return [e for e in entries or [] if isinstance(e, dict)]
+
+    def _write(self) -> None:
+        data = json.dumps({"delivered": self.entries[-MAX_ENTRIES:]}, ensure_ascii=False).encode("utf-8")
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, data)
+
+    def find(self, req_id: str, digest: str) -> Optional[dict]:
+        """The earlier delivery of exactly this (req_id, body), if any."""
+        for entry in reversed(self.entries):
+            if entry.get("req_id") == req_id and entry.get("hash") == digest:
+                return entry
+        return None
+
+    def add(self, req_id: str, digest: str, *, kind: str) -> None:
+        self.entries.append({"req_id": req_id, "hash": digest, "kind": kind, "ts": round(time.time(), 3)})
+        self._dirty = True
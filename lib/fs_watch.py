@@ -0,0 +1,285 @@
+"""
+fs_watch.py - Wait for changes in a handful of directories (inotify, with a polling fallback).
+
+Used by long-running consumers such as `cq-mounted --watch`: instead of re-probing on a timer,
+they block in `wait()` until one of the watched directories changes. Each watched directory can
+carry an `accept(name)` filter so unrelated churn (temp files, lock files, source edits in the
+project root) does not wake the consumer.
+
+On Linux the watcher uses inotify through ctypes (no extra dependency); elsewhere, or when
+inotify is unavailable, it compares directory listings (name, mtime, size) every
+`poll_interval` seconds. Set `CQ_FS_WATCH=poll` to force the polling backend.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+Accept = Optional[Callable[[str], bool]]
+WatchSpec = Union[Path, Tuple[Path, Accept]]
+
+SETTLE_S = 0.05
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_MASK = (
+    _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+
+def _split(spec: WatchSpec) -> Tuple[Path, Accept]:
+    if isinstance(spec, tuple):
+        return Path(spec[0]), spec[1]
+    return Path(spec), None
+
+
+def _accepted(accept: Accept, name: str) -> bool:
+    if not name or accept is None:
+        return True
+    try:
+        return bool(accept(name))
+    except Exception:
+        return True
+
+
+class PollWatcher:
+    """Detects changes by comparing directory listings every `poll_interval` seconds."""
+
+    kind = "poll"
+
+    def __init__(self, *, poll_interval: float = 1.0):
+        self.poll_interval = max(0.05, float(poll_interval))
+        self._watches: Dict[Path, Accept] = {}
+        self._state: Dict[Path, object] = {}
+
+    def _fingerprint(self, path: Path, accept: Accept) -> object:
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            return None
+        entries = []
+        for name in names:
+            if not _accepted(accept, name):
+                continue
+            try:
+                st = os.stat(path / name)
+                if stat.S_ISDIR(st.st_mode):
+                    # Like inotify, a subdirectory's own contents are not part of its parent.
+                    entries.append((name, "dir", None))
+                    continue
+                entries.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                entries.append((name, None, None))
+        return tuple(entries)
+
+    def sync(self, specs: Iterable[WatchSpec]) -> None:
+        """Watch exactly `specs` (directories that do not exist are skipped)."""
+        wanted = dict(_split(s) for s in specs)
+        wanted = {p: a for p, a in wanted.items() if p.is_dir()}
+        for path in list(self._watches):
+            if path not in wanted:
+                del self._watches[path]
+                self._state.pop(path, None)
+        for path, accept in wanted.items():
+            if path not in self._watches:
+                self._state[path] = self._fingerprint(path, accept)
+            self._watches[path] = accept
+
+    def _changed(self) -> bool:
+        changed = False
+        for path, accept in self._watches.items():
+            current = self._fingerprint(path, accept)
+            if current != self._state.get(path):
+                self._state[path] = current
+                changed = True
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until a watched directory changes (True) or `timeout` elapses (False)."""
+        deadline = None if timeout is None else time.monotonic() + max(0.0, timeout)
+        while True:
+            if self._changed():
+                return True
+            if deadline is None:
+                time.sleep(self.poll_interval)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def close(self) -> None:
+        self._watches.clear()
+        self._state.clear()
+
+
+_LIBC = None
+
+
+def _libc():
+    global _LIBC
+    if _LIBC is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _LIBC = libc
+    return _LIBC
+
+
+class InotifyWatcher:
+    """Linux inotify watcher; one non-recursive watch per directory."""
+
+    kind = "inotify"
+
+    def __init__(self) -> None:
+        self._libc = _libc()
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd: Optional[int] = fd
+        self._by_path: Dict[Path, int] = {}
+        self._by_wd: Dict[int, Tuple[Path, Accept]] = {}
+
+    def _add(self, path: Path, accept: Accept) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(path)), _MASK)
+        if wd < 0:
+            return False
+        self._by_path[path] = wd
+        self._by_wd[wd] = (path, accept)
+        return True
+
+    def _remove(self, path: Path) -> None:
+        wd = self._by_path.pop(path, None)
+        if wd is None:
+            return
+        self._by_wd.pop(wd, None)
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def sync(self, specs: Iterable[WatchSpec]) -> None:
+        """Watch exactly `specs` (directories that do not exist are skipped)."""
+        wanted = dict(_split(s) for s in specs)
+        for path in list(self._by_path):
+            if path not in wanted:
+                self._remove(path)
+        for path, accept in wanted.items():
+            wd = self._by_path.get(path)
+            if wd is not None:
+                self._by_wd[wd] = (path, accept)
+            else:
+                self._add(path, accept)
+
+    def _drain(self) -> bool:
+        """Read every queued event; True if any passes its directory's filter."""
+        relevant = False
+        while True:
+            try:
+                buf = os.read(self._fd, 65536)
+            except OSError as exc:
+                if exc.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return relevant
+                raise
+            if not buf:
+                return relevant
+            offset = 0
+            while offset + _EVENT.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+                raw = buf[offset + _EVENT.size : offset + _EVENT.size + length]
+                offset += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    relevant = True
+                    continue
+                entry = self._by_wd.get(wd)
+                if entry is None:
+                    # Unknown wd, or the IN_IGNORED echo of a watch we removed ourselves.
+                    continue
+                if mask & _IN_IGNORED:
+                    # The directory itself went away; the kernel already dropped the watch.
+                    self._by_wd.pop(wd, None)
+                    self._by_path.pop(entry[0], None)
+                    relevant = True
+                    continue
+                name = os.fsdecode(raw.rstrip(b"\0"))
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF) or _accepted(entry[1], name):
+                    relevant = True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until a watched directory changes (True) or `timeout` elapses (False)."""
+        deadline = None if timeout is None else time.monotonic() + max(0.0, timeout)
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._drain():
+                # Let a burst (write + rename, several files) settle into one wakeup.
+                while select.select([self._fd], [], [], SETTLE_S)[0]:
+                    self._drain()
+                return True
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._by_path.clear()
+        self._by_wd.clear()
+
+
+def inotify_available() -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        return hasattr(_libc(), "inotify_init1")
+    except Exception:
+        return False
+
+
+def create(specs: Iterable[WatchSpec] = (), *, poll_interval: float = 1.0, backend: Optional[str] = None):
+    """
+    Build a watcher for `specs` (paths, or `(path, accept)` pairs).
+
+    `backend` is "inotify" or "poll"; by default `CQ_FS_WATCH`, else inotify when available.
+    """
+    choice = (backend or os.environ.get("CQ_FS_WATCH") or "").strip().lower()
+    watcher = None
+    if choice != "poll" and inotify_available():
+        try:
+            watcher = InotifyWatcher()
+        except Exception:
+            watcher = None
+    if watcher is None:
+        watcher = PollWatcher(poll_interval=poll_interval)
+    watcher.sync(specs)
+    return watcher
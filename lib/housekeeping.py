@@ -0,0 +1,134 @@
+"""
+housekeeping.py - Rate-limited background housekeeping for the launcher.
+
+Garbage collection (`tmpclaude-*-cwd` markers plus an incremental `cq gc` pass) does not need
+to finish before panes appear. The launcher calls `maybe_schedule(...)`, which at most once per
+`CQ_HOUSEKEEPING_INTERVAL_S` (per user, tracked by a stamp file in `~/.cache/cq`) spawns a
+detached worker and returns immediately. The worker runs the collectors under a time budget.
+
+Controls:
+  - `CQ_HOUSEKEEPING` (default: true; false disables scheduling entirely)
+  - `CQ_HOUSEKEEPING_INTERVAL_S` (default: 600)
+  - `CQ_HOUSEKEEPING_BUDGET_S` (default: 5)
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_INTERVAL_S = 600.0
+DEFAULT_BUDGET_S = 5.0
+
+
+def _env_float(env: Dict[str, str], name: str, default: float) -> float:
+    raw = (env.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(0.0, float(raw))
+    except Exception:
+        return default
+
+
+def enabled(env: Optional[Dict[str, str]] = None) -> bool:
+    env_map = os.environ if env is None else env
+    val = (env_map.get("CQ_HOUSEKEEPING") or "").strip().lower()
+    return val not in ("0", "false", "no", "off")
+
+
+def interval_s(env: Optional[Dict[str, str]] = None) -> float:
+    return _env_float(os.environ if env is None else env, "CQ_HOUSEKEEPING_INTERVAL_S", DEFAULT_INTERVAL_S)
+
+
+def budget_s(env: Optional[Dict[str, str]] = None) -> float:
+    return _env_float(os.environ if env is None else env, "CQ_HOUSEKEEPING_BUDGET_S", DEFAULT_BUDGET_S)
+
+
+def stamp_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "housekeeping.stamp"
+
+
+def is_due(stamp: Path, interval: float, now: Optional[float] = None) -> bool:
+    now = time.time() if now is None else now
+    try:
+        last = stamp.stat().st_mtime
+    except OSError:
+        return True
+    # A stamp from the future (clock change) counts as stale.
+    return not (0.0 <= now - last < interval)
+
+
+def claim(stamp: Optional[Path] = None, interval: Optional[float] = None) -> bool:
+    """
+    Return True (and touch the stamp) when housekeeping is due.
+
+    The stamp is touched before the worker starts so concurrent launchers rarely both spawn one;
+    a duplicate worker is harmless since every collector is idempotent.
+    """
+    stamp = stamp_path() if stamp is None else stamp
+    interval = interval_s() if interval is None else interval
+    if not is_due(stamp, interval):
+        return False
+    try:
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.touch()
+    except OSError:
+        return False
+    return True
+
+
+def spawn_detached(argv: Sequence[str], *, cwd: Optional[str] = None) -> bool:
+    """Start `argv` fully detached from the launcher (own session, no stdio)."""
+    kwargs: dict = {
+        "stdin": subprocess.DEVNULL,
+        "stdout": subprocess.DEVNULL,
+        "stderr": subprocess.DEVNULL,
+        "close_fds": True,
+        "cwd": cwd,
+    }
+    if os.name == "nt":
+        kwargs["creationflags"] = getattr(subprocess, "DETACHED_PROCESS", 0) | getattr(
+            subprocess, "CREATE_NEW_PROCESS_GROUP", 0
+        )
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        subprocess.Popen(list(argv), **kwargs)
+    except Exception:
+        return False
+    return True
+
+
+def maybe_schedule(argv: Sequence[str], *, cwd: Optional[str] = None, force: bool = False) -> bool:
+    """Spawn the housekeeping worker `argv` if enabled and due; never blocks on the work itself."""
+    if not enabled():
+        return False
+    if not force and not claim():
+        return False
+    return spawn_detached(argv, cwd=cwd)
+
+
+class Budget:
+    """Wall-clock (and optional I/O operation) budget shared by the collectors of one run."""
+
+    def __init__(self, seconds: float, max_ops: Optional[int] = None):
+        self.deadline = time.monotonic() + max(0.0, float(seconds))
+        self.max_ops = max_ops
+        self.ops = 0
+
+    def spend(self, n: int = 1) -> None:
+        self.ops += int(n)
+
+    def exhausted(self) -> bool:
+        if self.max_ops is not None and self.ops >= self.max_ops:
+            return True
+        return time.monotonic() >= self.deadline
+
+
+def worker_argv(script: Path, extra: Optional[List[str]] = None) -> List[str]:
+    return [sys.executable, str(script), "__housekeeping", *(extra or [])]
@@ -0,0 +1,199 @@
+"""
+lock_stats.py - Contention telemetry for `ProviderLock` and the `cq locks` report.
+
+Every acquisition attempt is recorded: lock file, scope, mode (`acquire` or `try`), holder pid,
+wait time and, once released, hold time. Records are buffered in memory and appended to
+`~/.cache/cq/lock-stats.jsonl` in one write when a lock is released (and at exit), so a launch
+that probes many auto-session slots still costs a single append. Each record keeps the file it
+was meant for when it was taken, so a later change of `HOME` does not redirect it. When a trace is active
+(`--explain` / `--timings`), lock waits are also counted on the current stage.
+
+`cq locks` combines the current state of `~/.cq/run/*.lock` (holder, waiters) with
+wait/hold percentiles from the recorded history.
+
+Set `CQ_LOCK_STATS=0` to disable recording.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cq_trace
+from cli_output import append_capped_lines
+
+HISTORY_MAX_BYTES = 512 * 1024
+HISTORY_KEEP_RECORDS = 2000
+
+_PENDING: List[Tuple[Path, Dict[str, Any]]] = []
+_ATEXIT_REGISTERED = False
+
+
+def enabled(env: Optional[Dict[str, str]] = None) -> bool:
+    env_map = os.environ if env is None else env
+    val = (env_map.get("CQ_LOCK_STATS") or "").strip().lower()
+    return val not in ("0", "false", "no", "off")
+
+
+def stats_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "lock-stats.jsonl"
+
+
+def record(
+    lock_file: Path,
+    *,
+    provider: str,
+    scope: str,
+    mode: str,
+    ok: bool,
+    wait_ms: float,
+    hold_ms: Optional[float] = None,
+) -> None:
+    """Buffer one attempt; `flush()` writes it out."""
+    global _ATEXIT_REGISTERED
+    cq_trace.count("lock_attempts")
+    cq_trace.count("lock_wait_ms", int(wait_ms))
+    if not enabled():
+        return
+    entry = {
+        "ts": round(time.time(), 3),
+        "lock": Path(lock_file).name,
+        "provider": provider,
+        "scope": scope,
+        "mode": mode,
+        "pid": os.getpid(),
+        "ok": bool(ok),
+        "wait_ms": round(float(wait_ms), 3),
+        "hold_ms": None if hold_ms is None else round(float(hold_ms), 3),
+    }
+    _PENDING.append((stats_path(), entry))
+    if not _ATEXIT_REGISTERED:
+        _ATEXIT_REGISTERED = True
+        atexit.register(flush)
+
+
+def flush(path: Optional[Path] = None) -> None:
+    """Append buffered records to the file each was taken for (or all of them to `path`)."""
+    if not _PENDING:
+        return
+    batches: Dict[Path, List[Dict[str, Any]]] = {}
+    for target, rec in _PENDING:
+        batches.setdefault(target if path is None else path, []).append(rec)
+    _PENDING.clear()
+    for target, records in batches.items():
+        _append(target, records)
+
+
+def _append(target: Path, records: List[Dict[str, Any]]) -> None:
+    lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    try:
+        append_capped_lines(target, lines, max_bytes=HISTORY_MAX_BYTES, keep_lines=HISTORY_KEEP_RECORDS)
+    except Exception:
+        pass
+
+
+def load(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    target = stats_path() if path is None else path
+    events: List[Dict[str, Any]] = []
+    try:
+        raw = target.read_text(encoding="utf-8")
+    except Exception:
+        return events
+    for line in raw.splitlines():
+        try:
+            item = json.loads(line)
+        except Exception:
+            continue
+        if isinstance(item, dict) and item.get("lock"):
+            events.append(item)
+    return events
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (`q` in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-lock attempt counts and wait/hold percentiles, busiest (longest p90 wait) first."""
+    grouped: Dict[str, Dict[str, Any]] = {}
+    for ev in events:
+        g = grouped.setdefault(
+            ev["lock"],
+            {"lock": ev["lock"], "provider": ev.get("provider"), "scope": ev.get("scope"), "waits": [], "holds": [], "failed": 0},
+        )
+        g["scope"] = ev.get("scope") or g["scope"]
+        g["waits"].append(float(ev.get("wait_ms") or 0.0))
+        if not ev.get("ok"):
+            g["failed"] += 1
+        if ev.get("hold_ms") is not None:
+            g["holds"].append(float(ev["hold_ms"]))
+    rows = []
+    for g in grouped.values():
+        waits, holds = g.pop("waits"), g.pop("holds")
+        g["attempts"] = len(waits)
+        g["wait_ms"] = {f"p{q}": percentile(waits, q) for q in (50, 90, 99)}
+        g["wait_ms"]["max"] = max(waits) if waits else None
+        g["hold_ms"] = {f"p{q}": percentile(holds, q) for q in (50, 90)}
+        g["hold_ms"]["max"] = max(holds) if holds else None
+        rows.append(g)
+    rows.sort(key=lambda r: -(r["wait_ms"]["p90"] or 0.0))
+    return rows
+
+
+def current_locks(lock_dir: Optional[Path] = None, *, now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """State of every lock file: holder pid (if held), how long, and queued waiters."""
+    from process_lock import lock_status
+
+    base = Path.home() / ".cq" / "run" if lock_dir is None else lock_dir
+    now = time.time() if now is None else now
+    rows = []
+    try:
+        names = sorted(n for n in os.listdir(base) if n.endswith(".lock"))
+    except OSError:
+        return rows
+    for name in names:
+        status = lock_status(base / name)
+        held_s = None
+        if status["held"] and status["since"]:
+            held_s = round(max(0.0, now - status["since"]), 1)
+        rows.append({"lock": name, "held": status["held"], "holder_pid": status["pid"], "held_s": held_s, "waiters": status["waiters"]})
+    return rows
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def format_report(current: List[Dict[str, Any]], summary: List[Dict[str, Any]], *, all_locks: bool = False) -> str:
+    scopes = {row["lock"]: row.get("scope") or "" for row in summary}
+    lines = ["🔒 Lock holders"]
+    shown = [r for r in current if all_locks or r["held"] or r["waiters"]]
+    if not shown:
+        lines.append("   (no lock is held)")
+    for row in shown:
+        state = f"held by pid {row['holder_pid']}" if row["held"] else "free"
+        if row["held_s"] is not None:
+            state += f" for {row['held_s']:.0f}s"
+        scope = scopes.get(row["lock"], "")
+        lines.append(f"   {row['lock']:<24} {state:<28} waiters={row['waiters']}  {scope}".rstrip())
+    lines.append("")
+    lines.append("⏱️ Wait/hold times (ms, recorded history)")
+    if not summary:
+        lines.append("   (no attempts recorded)")
+    for row in summary:
+        w, h = row["wait_ms"], row["hold_ms"]
+        lines.append(
+            f"   {row['lock']:<24} n={row['attempts']:<5} failed={row['failed']:<4} "
+            f"wait p50/p90/p99/max={_ms(w['p50'])}/{_ms(w['p90'])}/{_ms(w['p99'])}/{_ms(w['max'])}  "
+            f"hold p50/p90/max={_ms(h['p50'])}/{_ms(h['p90'])}/{_ms(h['max'])}  {row.get('scope') or ''}".rstrip()
+        )
+    return "\n".join(lines)
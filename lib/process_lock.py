@@ -4,15 +4,24 @@ process_lock.py - Per-provider, per-directory file lock to serialize request-res
 Each provider (codex, claude) has its own lock file per working directory,
 allowing concurrent use across different directories while ensuring serial access
 within the same directory.
+
+Waiting (`acquire`) is fair and event-driven on POSIX: each waiter draws a ticket from
+`<lock>.queue/seq` and holds an flock on its own ticket file until it releases the lock. A waiter
+blocks on its predecessor's ticket, so it wakes as soon as that one is done (or dies: the kernel
+drops its flocks) and the lock is granted in arrival order without polling. The only polling
+left is the head of the queue waiting out a non-queued (`try_acquire`) holder of the lock file.
 """
 from __future__ import annotations
 
 import hashlib
 import os
 import sys
+import threading
 import time
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+
+import lock_stats
 
 
 def _is_pid_alive(pid: int) -> bool:
@@ -37,6 +46,203 @@ def _is_pid_alive(pid: int) -> bool:
             return False
 
 
+def _flock_with_timeout(path: Path, timeout: float, *, create: bool = True) -> Optional[int]:
+    """
+    Open `path` and take an exclusive flock, blocking for at most `timeout` seconds.
+
+    Returns the fd holding the lock, or None on timeout. The blocking call runs in a daemon
+    thread so the kernel wakes us the moment the holder lets go; if we give up first, the
+    thread releases the lock as soon as it gets it.
+
+    That last part means an abandoned wait can still hold `path` for an instant after the
+    holder lets go, so only use this on files where a brief phantom holder is harmless:
+    queue tickets (a finished owner unlinks its ticket first), not the provider lock file.
+    """
+    import fcntl
+
+    fd = os.open(str(path), (os.O_CREAT | os.O_RDWR) if create else os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fd
+    except OSError:
+        pass
+    if timeout <= 0:
+        os.close(fd)
+        return None
+
+    # `guard` orders the two sides: whichever of "flock returned" / "gave up" is recorded first
+    # decides who owns (and closes) the fd. `done` only wakes us up early.
+    state = {"done": False, "locked": False, "abandoned": False}
+    guard = threading.Lock()
+    done = threading.Event()
+
+    def _wait() -> None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            locked = True
+        except OSError:
+            locked = False
+        with guard:
+            state["done"] = True
+            state["locked"] = locked
+            abandoned = state["abandoned"]
+        if abandoned:
+            os.close(fd)
+        done.set()
+
+    threading.Thread(target=_wait, name="cq-lock-wait", daemon=True).start()
+    done.wait(timeout)
+    with guard:
+        if not state["done"]:
+            state["abandoned"] = True
+            return None
+    if state["locked"]:
+        return fd
+    os.close(fd)
+    return None
+
+
+class _TicketQueue:
+    """FIFO of waiters for one lock file (POSIX only); see the module docstring."""
+
+    def __init__(self, lock_file: Path):
+        self.dir = lock_file.with_name(lock_file.name + ".queue")
+        self.ticket: Optional[Path] = None
+        self._fd: Optional[int] = None
+
+    @staticmethod
+    def _next_seq(fd: int) -> int:
+        raw = os.read(fd, 32).strip()
+        seq = (int(raw) if raw.isdigit() else 0) + 1
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(seq).encode())
+        return seq
+
+    def enter(self) -> None:
+        import fcntl
+
+        # `seq` stays locked until our ticket is in place: gc removes an idle queue directory only
+        # while holding the same lock (see `cq_gc`), so it never sees a queue that is being joined.
+        while True:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            seq_path = self.dir / "seq"
+            seq_fd = os.open(str(seq_path), os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(seq_fd, fcntl.LOCK_EX)
+                try:
+                    current = os.fstat(seq_fd).st_ino == os.stat(seq_path).st_ino
+                except OSError:
+                    current = False
+                if not current:
+                    continue  # gc removed the queue while we waited; join the new one.
+                name = f"{self._next_seq(seq_fd):012d}-{os.getpid()}.ticket"
+                # Lock the ticket before it becomes visible, so an unlocked ticket always means "gone".
+                tmp = self.dir / f".{name}.tmp"
+                fd = os.open(str(tmp), os.O_CREAT | os.O_RDWR)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                os.rename(tmp, self.dir / name)
+                self._fd = fd
+                self.ticket = self.dir / name
+                return
+            finally:
+                os.close(seq_fd)
+
+    def _tickets(self) -> List[Path]:
+        try:
+            return sorted(p for p in self.dir.iterdir() if p.name.endswith(".ticket"))
+        except OSError:
+            return []
+
+    def predecessor(self) -> Optional[Path]:
+        ahead = [p for p in self._tickets() if self.ticket is None or p.name < self.ticket.name]
+        return ahead[-1] if ahead else None
+
+    def has_live_waiters(self) -> bool:
+        return any(_ticket_is_live(p) for p in self._tickets())
+
+    def wait_turn(self, deadline: float) -> bool:
+        """Block until every earlier ticket is gone; False if the deadline passes first."""
+        while True:
+            prev = self.predecessor()
+            if prev is None:
+                return True
+            try:
+                fd = _flock_with_timeout(prev, deadline - time.time(), create=False)
+            except FileNotFoundError:
+                continue
+            if fd is None:
+                return False
+            # Its owner released (or died); a finished ticket is removed by whoever sees it first.
+            try:
+                prev.unlink()
+            except OSError:
+                pass
+            os.close(fd)
+
+    def leave(self) -> None:
+        if self.ticket is not None:
+            try:
+                self.ticket.unlink()
+            except OSError:
+                pass
+            self.ticket = None
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+
+def _ticket_is_live(path: Path) -> bool:
+    import fcntl
+
+    try:
+        fd = os.open(str(path), os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+
+
+def lock_status(lock_file: Path) -> dict:
+    """Current state of a lock file: held, holder pid, since (last acquire) and queued waiters."""
+    status = {"held": False, "pid": None, "since": None, "waiters": 0}
+    try:
+        st = os.stat(lock_file)
+        raw = Path(lock_file).read_text(encoding="utf-8", errors="replace").strip("\0 \n")
+    except OSError:
+        return status
+    pid = int(raw) if raw.isdigit() else None
+    if os.name == "nt":
+        held = pid is not None and _is_pid_alive(pid)
+    else:
+        import fcntl
+
+        try:
+            fd = os.open(str(lock_file), os.O_RDWR)
+        except OSError:
+            return status
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            held = False
+        except OSError:
+            held = True
+        finally:
+            os.close(fd)
+        live = [p for p in _TicketQueue(Path(lock_file))._tickets() if _ticket_is_live(p)]
+        # A holder that came through `acquire()` keeps its own ticket until it releases.
+        status["waiters"] = sum(1 for p in live if not (held and p.name.endswith(f"-{pid}.ticket")))
+    status.update({"held": held, "pid": pid if held else None, "since": st.st_mtime if held else None})
+    return status
+
+
 class ProviderLock:
     """Per-provider, per-directory file lock to serialize request-response cycles.
 
@@ -58,10 +264,15 @@ class ProviderLock:
         # Use working directory hash for per-directory locking
         if cwd is None:
             cwd = os.getcwd()
+        self.scope = cwd
         cwd_hash = hashlib.md5(cwd.encode()).hexdigest()[:8]
         self.lock_file = self.lock_dir / f"{provider}-{cwd_hash}.lock"
         self._fd: Optional[int] = None
         self._acquired = False
+        self._queue: Optional[_TicketQueue] = None
+        self._mode = ""
+        self._wait_ms = 0.0
+        self._acquired_at: Optional[float] = None
 
     def _try_acquire_once(self) -> bool:
         """Attempt to acquire lock once without blocking."""
@@ -80,6 +291,13 @@ class ProviderLock:
             else:
                 import fcntl
                 fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if not self._fd_is_current():
+                    # gc or a stale takeover unlinked the file we opened; lock the one at the path now.
+                    os.close(self._fd)
+                    self._fd = os.open(str(self.lock_file), os.O_CREAT | os.O_RDWR)
+                    fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    if not self._fd_is_current():
+                        return False
 
             # Write PID for debugging and stale lock detection
             pid_bytes = f"{os.getpid()}\n".encode()
@@ -98,6 +316,13 @@ class ProviderLock:
         except (OSError, IOError):
             return False
 
+    def _fd_is_current(self) -> bool:
+        """Whether our fd still refers to the file at `lock_file` (and not an unlinked inode)."""
+        try:
+            return os.fstat(self._fd).st_ino == os.stat(self.lock_file).st_ino
+        except OSError:
+            return False
+
     def _check_stale_lock(self) -> bool:
         """Check if current lock holder is dead, allowing us to take over."""
         try:
@@ -116,13 +341,32 @@ class ProviderLock:
             pass
         return False
 
+    def _record_attempt(self, mode: str, ok: bool, started: float) -> bool:
+        """Telemetry: failures are recorded now, successes on release together with the hold time."""
+        wait_ms = (time.monotonic() - started) * 1000.0
+        if ok:
+            self._mode, self._wait_ms, self._acquired_at = mode, wait_ms, time.monotonic()
+        else:
+            try:
+                lock_stats.record(self.lock_file, provider=self.provider, scope=self.scope, mode=mode, ok=False, wait_ms=wait_ms)
+            except Exception:
+                pass
+        return ok
+
     def try_acquire(self) -> bool:
         """Try to acquire lock without blocking. Returns immediately.
 
         Returns:
             True if lock acquired, False if lock is held by another process
         """
+        started = time.monotonic()
+        return self._record_attempt("try", self._try_acquire(), started)
+
+    def _try_acquire(self) -> bool:
         self.lock_dir.mkdir(parents=True, exist_ok=True)
+        # Do not jump the queue of processes already waiting in `acquire()`.
+        if os.name != "nt" and _TicketQueue(self.lock_file).has_live_waiters():
+            return False
         self._fd = os.open(str(self.lock_file), os.O_CREAT | os.O_RDWR)
 
         if self._try_acquire_once():
@@ -143,9 +387,65 @@ class ProviderLock:
     def acquire(self) -> bool:
         """Acquire the lock, waiting up to timeout seconds.
 
+        Waiters are served in arrival order (POSIX); see the module docstring.
+
         Returns:
             True if lock acquired, False if timeout
         """
+        started = time.monotonic()
+        return self._record_attempt("acquire", self._acquire(), started)
+
+    def _acquire(self) -> bool:
+        if os.name == "nt":
+            return self._acquire_polling()
+
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        deadline = time.time() + self.timeout
+        queue = _TicketQueue(self.lock_file)
+        try:
+            queue.enter()
+        except OSError:
+            return self._acquire_polling()
+        try:
+            if queue.wait_turn(deadline) and self._acquire_head(deadline):
+                self._queue = queue
+                return True
+        except OSError:
+            pass
+        queue.leave()
+        return False
+
+    def _acquire_head(self, deadline: float) -> bool:
+        """First in line: take the lock file itself once any non-queued holder releases it."""
+        self._fd = os.open(str(self.lock_file), os.O_CREAT | os.O_RDWR)
+        if self._try_acquire_once():
+            return True
+        os.close(self._fd)
+        self._fd = None
+        if self._check_stale_lock():
+            self._fd = os.open(str(self.lock_file), os.O_CREAT | os.O_RDWR)
+            if self._try_acquire_once():
+                return True
+            os.close(self._fd)
+            self._fd = None
+        # Non-queued holders (`try_acquire`) are short-lived, so poll here instead of blocking in
+        # `_flock_with_timeout`: a waiter that times out must never take the lock file, even briefly,
+        # or `try_acquire`/`cq locks`/gc would see a holder that is not there.
+        delay = 0.005
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+            # Reopen each round: the lock file may have been replaced (stale takeover) meanwhile.
+            self._fd = os.open(str(self.lock_file), os.O_CREAT | os.O_RDWR)
+            if self._try_acquire_once():
+                return True
+            os.close(self._fd)
+            self._fd = None
+
+    def _acquire_polling(self) -> bool:
         self.lock_dir.mkdir(parents=True, exist_ok=True)
         self._fd = os.open(str(self.lock_file), os.O_CREAT | os.O_RDWR)
 
@@ -198,6 +498,21 @@ class ProviderLock:
                     pass
                 self._fd = None
                 self._acquired = False
+        # Hand over to the next waiter only after the lock file itself is free.
+        if self._queue is not None:
+            self._queue.leave()
+            self._queue = None
+        if self._acquired_at is not None:
+            hold_ms = (time.monotonic() - self._acquired_at) * 1000.0
+            self._acquired_at = None
+            try:
+                lock_stats.record(
+                    self.lock_file, provider=self.provider, scope=self.scope, mode=self._mode,
+                    ok=True, wait_ms=self._wait_ms, hold_ms=hold_ms,
+                )
+                lock_stats.flush()
+            except Exception:
+                pass
 
     def __enter__(self) -> "ProviderLock":
         if not self.acquire():
@@ -0,0 +1,116 @@
+"""
+project_keys.py - One place to derive every key CQ uses for a work dir.
+
+A launch (and every `ask`) needs the same handful of values for the project directory: the
+normalized path, the resolved (symlink-free) path, the `$PWD` spelling, the `cq_project_id`
+hash and Claude's `~/.claude/projects/<key>` names. `project_keys(work_dir)` returns a
+per-process memoized `ProjectKeys`; each value is computed at most once, on first use.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from project_id import compute_cq_project_id, normalize_work_dir
+
+_CLAUDE_KEY_RE = re.compile(r"[^A-Za-z0-9]")
+
+_CACHE: Dict[Tuple[str, str], "ProjectKeys"] = {}
+
+
+def normalize_for_match(value: str | Path) -> str:
+    """Normalize a path-like value for loose matching (normalized, no trailing slash)."""
+    if not value:
+        return ""
+    s = normalize_work_dir(value)
+    if len(s) > 1 and s.endswith("/"):
+        s = s.rstrip("/")
+    return s
+
+
+def claude_project_key(path: str | Path) -> str:
+    """Claude Code's filesystem-friendly directory key for a working directory."""
+    return _CLAUDE_KEY_RE.sub("-", str(path))
+
+
+class ProjectKeys:
+    def __init__(self, work_dir: Path, pwd: Optional[str]):
+        self.work_dir = work_dir
+        self._pwd = pwd
+
+    @cached_property
+    def normalized(self) -> str:
+        return normalize_for_match(self.work_dir)
+
+    @cached_property
+    def resolved(self) -> Path:
+        try:
+            return self.work_dir.resolve()
+        except Exception:
+            return self.work_dir
+
+    @cached_property
+    def pwd(self) -> Optional[Path]:
+        if not self._pwd:
+            return None
+        try:
+            return Path(self._pwd)
+        except Exception:
+            return None
+
+    @cached_property
+    def cq_project_id(self) -> str:
+        try:
+            return compute_cq_project_id(self.work_dir)
+        except Exception:
+            return ""
+
+    @cached_property
+    def path_variants(self) -> Tuple[Path, ...]:
+        """`$PWD`, the work dir as given, and its resolved form (deduplicated, in that order)."""
+        out: list[Path] = []
+        for candidate in (self.pwd, self.work_dir, self.resolved):
+            if candidate is not None and candidate not in out:
+                out.append(candidate)
+        return tuple(out)
+
+    @cached_property
+    def claude_keys(self) -> Tuple[str, ...]:
+        out: list[str] = []
+        for candidate in self.path_variants:
+            key = claude_project_key(candidate)
+            if key not in out:
+                out.append(key)
+        return tuple(out)
+
+    @cached_property
+    def match_keys(self) -> FrozenSet[str]:
+        return frozenset(k for k in (normalize_for_match(p) for p in self.path_variants) if k)
+
+
+def project_keys(work_dir: str | Path, *, pwd: Optional[str] = None) -> ProjectKeys:
+    """
+    Return the memoized keys for `work_dir` (`pwd` defaults to `$PWD`).
+
+    `cq_project_id` only depends on the absolute work dir (the `.cq_config` anchor is the
+    directory itself), so entries stay valid for the life of the process.
+    """
+    try:
+        wd = Path(work_dir).expanduser().absolute()
+    except Exception:
+        wd = Path(work_dir)
+    env_pwd = os.environ.get("PWD") if pwd is None else pwd
+    key = (str(wd), env_pwd or "")
+    cached = _CACHE.get(key)
+    if cached is None:
+        cached = ProjectKeys(wd, env_pwd)
+        _CACHE[key] = cached
+    return cached
+
+
+def clear_project_keys_cache() -> None:
+    _CACHE.clear()
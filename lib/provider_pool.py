@@ -0,0 +1,344 @@
+"""
+provider_pool.py - Opt-in pool of pre-launched ("hot spare") Codex panes for tmux.
+
+A cold start splits a pane and boots the provider CLI, which takes seconds before warmup
+succeeds. With `CQ_POOL_SIZE=N` the launcher instead adopts an idle spare: a Codex process
+already running in a detached tmux session (`cqpool-*`). The spare's pane is moved into the
+layout with `join-pane` (same pane id, same process), titled, and bound to the project by the
+usual session file + registry write. A detached `cq pool fill` tops the pool up afterwards.
+
+Spares are keyed by project root, CQ session name and auto mode, because the Codex cwd, the
+`CQ_SESSION` env and the approval flags are fixed when the process starts. Resumed sessions
+always start cold. `N` bounds the number of spares per user; when the pool is full of other
+projects' spares, the oldest ones are evicted to make room for the current project.
+
+State lives in `~/.cache/cq/pool/`: one `<spare_id>.json` record per spare and a
+`<spare_id>/` dir holding its ready file. Adopting renames the record first, so two launchers
+can never take the same spare.
+
+Controls:
+  - `CQ_POOL_SIZE` (default: 0 = disabled)
+  - `CQ_POOL_MAX_AGE_S` (default: 21600; older spares are discarded instead of adopted)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from cli_output import atomic_write_text
+
+DEFAULT_MAX_AGE_S = 6 * 3600.0
+SESSION_PREFIX = "cqpool-"
+PROVIDER = "codex"
+
+_seq = 0
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(0, int(raw))
+    except Exception:
+        return default
+
+
+def pool_size() -> int:
+    return _env_int("CQ_POOL_SIZE", 0)
+
+
+def enabled() -> bool:
+    return pool_size() > 0
+
+
+def max_age_s() -> float:
+    raw = (os.environ.get("CQ_POOL_MAX_AGE_S") or "").strip()
+    try:
+        return max(0.0, float(raw)) if raw else DEFAULT_MAX_AGE_S
+    except Exception:
+        return DEFAULT_MAX_AGE_S
+
+
+def pool_dir() -> Path:
+    return Path.home() / ".cache" / "cq" / "pool"
+
+
+def pool_key(work_dir: str | Path, session_name: str, auto: bool) -> str:
+    raw = f"{work_dir}\0{session_name}\0{int(bool(auto))}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class Spare:
+    spare_id: str
+    key: str
+    tmux_session: str
+    pane_id: str
+    work_dir: str
+    session_name: str
+    auto: bool
+    start_cmd: str
+    created_at: float
+    provider: str = PROVIDER
+
+    @property
+    def record_path(self) -> Path:
+        return pool_dir() / f"{self.spare_id}.json"
+
+    @property
+    def state_dir(self) -> Path:
+        return pool_dir() / self.spare_id
+
+    @property
+    def ready_file(self) -> Path:
+        return self.state_dir / "ready"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Optional["Spare"]:
+        try:
+            return cls(
+                spare_id=str(data["spare_id"]),
+                key=str(data["key"]),
+                tmux_session=str(data["tmux_session"]),
+                pane_id=str(data["pane_id"]),
+                work_dir=str(data["work_dir"]),
+                session_name=str(data.get("session_name") or ""),
+                auto=bool(data.get("auto")),
+                start_cmd=str(data.get("start_cmd") or ""),
+                created_at=float(data.get("created_at") or 0),
+                provider=str(data.get("provider") or PROVIDER),
+            )
+        except Exception:
+            return None
+
+
+def list_spares() -> List[Spare]:
+    """All recorded (unclaimed) spares, oldest first."""
+    spares: List[Spare] = []
+    try:
+        paths = list(pool_dir().glob("*.json"))
+    except Exception:
+        return []
+    for path in paths:
+        try:
+            spare = Spare.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except Exception:
+            spare = None
+        if spare is not None:
+            spares.append(spare)
+    spares.sort(key=lambda s: (s.created_at, s.spare_id))
+    return spares
+
+
+def _remove_state(spare: Spare, record: Optional[Path] = None) -> None:
+    try:
+        (record or spare.record_path).unlink()
+    except Exception:
+        pass
+    shutil.rmtree(spare.state_dir, ignore_errors=True)
+
+
+def discard(spare: Spare, backend, *, record: Optional[Path] = None) -> None:
+    """Kill the spare's tmux session and forget it."""
+    try:
+        backend._tmux_run(["kill-session", "-t", spare.tmux_session], check=False)
+    except Exception:
+        pass
+    _remove_state(spare, record)
+
+
+def _pane_exists(spare: Spare, backend) -> bool:
+    try:
+        return bool(backend.is_pane_alive(spare.pane_id))
+    except Exception:
+        return False
+
+
+def claim(key: str, backend, *, now: Optional[float] = None) -> Optional[Spare]:
+    """
+    Take ownership of the oldest usable spare for `key`.
+
+    The record is renamed before anything else, so concurrent launchers never adopt the same
+    pane. Dead or expired spares met along the way are discarded; spares still starting up
+    are put back.
+    """
+    now = time.time() if now is None else now
+    for spare in list_spares():
+        if spare.key != key:
+            continue
+        claimed = spare.record_path.with_suffix(f".claimed-{os.getpid()}")
+        try:
+            os.rename(spare.record_path, claimed)
+        except OSError:
+            continue
+        if now - spare.created_at > max_age_s() or not _pane_exists(spare, backend):
+            discard(spare, backend, record=claimed)
+            continue
+        if not spare.ready_file.exists():
+            try:
+                os.rename(claimed, spare.record_path)
+            except OSError:
+                pass
+            continue
+        try:
+            claimed.unlink()
+        except Exception:
+            pass
+        return spare
+    return None
+
+
+def adopt(spare: Spare, backend, *, parent_pane: str, direction: str) -> str:
+    """Move a claimed spare's pane next to `parent_pane`; its pool state is removed."""
+    try:
+        pane_id = backend.join_pane(spare.pane_id, parent_pane, direction)
+    except Exception:
+        discard(spare, backend)
+        raise
+    shutil.rmtree(spare.state_dir, ignore_errors=True)
+    return pane_id
+
+
+def _new_spare_id() -> str:
+    global _seq
+    _seq += 1
+    return f"{int(time.time() * 1000)}-{os.getpid()}-{_seq}"
+
+
+def spawn(
+    key: str,
+    work_dir: str,
+    session_name: str,
+    auto: bool,
+    build_cmd: Callable[[Path], str],
+    backend,
+) -> Spare:
+    """
+    Start one spare in a new detached tmux session.
+
+    `build_cmd(ready_file)` returns the pane command; it must signal readiness by writing
+    `ready_file` right before the provider CLI starts (see `_build_ready_signal_cmd` in `cq`).
+    """
+    spare_id = _new_spare_id()
+    state_dir = pool_dir() / spare_id
+    state_dir.mkdir(parents=True, exist_ok=True)
+    tmux_session = f"{SESSION_PREFIX}{key[:8]}-{spare_id}"
+    cmd = build_cmd(state_dir / "ready")
+    try:
+        backend._tmux_run(["new-session", "-d", "-s", tmux_session, "-c", work_dir], check=True)
+        cp = backend._tmux_run(["list-panes", "-t", tmux_session, "-F", "#{pane_id}"], capture=True, check=True)
+        pane_id = ((cp.stdout or "").splitlines() or [""])[0].strip()
+        if not pane_id.startswith("%"):
+            raise RuntimeError(f"tmux failed to resolve root pane_id for session {tmux_session!r}")
+        backend.respawn_pane(pane_id, cmd=cmd, cwd=work_dir, remain_on_exit=True)
+        backend.set_pane_user_option(pane_id, "@cq_pool", key)
+    except Exception:
+        try:
+            backend._tmux_run(["kill-session", "-t", tmux_session], check=False)
+        except Exception:
+            pass
+        shutil.rmtree(state_dir, ignore_errors=True)
+        raise
+    spare = Spare(
+        spare_id=spare_id,
+        key=key,
+        tmux_session=tmux_session,
+        pane_id=pane_id,
+        work_dir=str(work_dir),
+        session_name=session_name,
+        auto=bool(auto),
+        start_cmd=cmd,
+        created_at=time.time(),
+    )
+    atomic_write_text(spare.record_path, json.dumps(spare.to_dict(), ensure_ascii=False))
+    return spare
+
+
+def prune(backend, *, now: Optional[float] = None) -> int:
+    """Forget spares whose pane died or that outlived `CQ_POOL_MAX_AGE_S`."""
+    now = time.time() if now is None else now
+    removed = 0
+    # Claims left behind by a launcher that died between claiming and adopting.
+    for claimed in pool_dir().glob("*.claimed-*"):
+        try:
+            if now - claimed.stat().st_ctime < 300:  # rename updates ctime
+                continue
+            spare = Spare.from_dict(json.loads(claimed.read_text(encoding="utf-8")))
+        except Exception:
+            continue
+        if spare is not None:
+            discard(spare, backend, record=claimed)
+            removed += 1
+    for spare in list_spares():
+        if now - spare.created_at > max_age_s() or not _pane_exists(spare, backend):
+            discard(spare, backend)
+            removed += 1
+    return removed
+
+
+def fill(
+    key: str,
+    work_dir: str,
+    session_name: str,
+    auto: bool,
+    build_cmd: Callable[[Path], str],
+    backend,
+    *,
+    size: Optional[int] = None,
+) -> List[Spare]:
+    """
+    Top up spares for `key` to the pool size, evicting other keys' oldest spares if needed.
+
+    Returns the newly started spares.
+    """
+    size = pool_size() if size is None else max(0, int(size))
+    prune(backend)
+    spares = list_spares()
+    mine = [s for s in spares if s.key == key]
+    others = [s for s in spares if s.key != key]
+    want = max(0, size - len(mine))
+    while want and others and len(mine) + len(others) + want > size:
+        discard(others.pop(0), backend)
+    want = min(want, max(0, size - len(mine) - len(others)))
+    return [spawn(key, work_dir, session_name, auto, build_cmd, backend) for _ in range(want)]
+
+
+def drain(backend, *, key: Optional[str] = None) -> int:
+    """Kill all spares (or those for `key`); returns how many were removed."""
+    count = 0
+    for spare in list_spares():
+        if key is not None and spare.key != key:
+            continue
+        discard(spare, backend)
+        count += 1
+    return count
+
+
+def status(backend, *, now: Optional[float] = None) -> List[Dict[str, object]]:
+    now = time.time() if now is None else now
+    rows: List[Dict[str, object]] = []
+    for spare in list_spares():
+        rows.append({
+            "spare_id": spare.spare_id,
+            "key": spare.key,
+            "work_dir": spare.work_dir,
+            "session_name": spare.session_name,
+            "auto": spare.auto,
+            "pane_id": spare.pane_id,
+            "tmux_session": spare.tmux_session,
+            "age_s": round(max(0.0, now - spare.created_at), 1),
+            "ready": spare.ready_file.exists(),
+            "alive": _pane_exists(spare, backend),
+        })
+    return rows
@@ -0,0 +1,212 @@
+"""
+request_ledger.py - Per-project log of `ask` requests and replies, and the `cq stats` report.
+
+`ask <provider>` appends a `req` entry when it sends a request (req_id, session, from, to,
+message size, time); `ask --reply-to <req_id>` appends a `reply` entry for the same req_id.
+Providers run in the project directory, so both sides write to the same file:
+`~/.cache/cq/projects/<project-hash>/requests.jsonl` (next to the project's other run state).
+Each entry is a single short line appended under an flock on `requests.jsonl.lock`; the file is
+trimmed to the most recent entries under the same lock once it grows past `MAX_BYTES`, so a
+trim never drops a concurrent append.
+
+`cq stats` pairs requests with their first reply and reports outstanding requests, reply
+latency percentiles by provider and by session, and request throughput per time bucket.
+
+Set `CQ_LEDGER=0` to disable recording.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from cli_output import append_capped_lines
+from lock_stats import percentile
+from project_keys import project_keys
+
+MAX_BYTES = 1024 * 1024
+KEEP_RECORDS = 5000
+
+
+def enabled(env: Optional[Dict[str, str]] = None) -> bool:
+    env_map = os.environ if env is None else env
+    val = (env_map.get("CQ_LEDGER") or "").strip().lower()
+    return val not in ("0", "false", "no", "off")
+
+
+def ledger_path(work_dir: Path) -> Path:
+    project_hash = (project_keys(work_dir).cq_project_id or "")[:16] or "unknown"
+    return Path.home() / ".cache" / "cq" / "projects" / project_hash / "requests.jsonl"
+
+
+def record(
+    work_dir: Path,
+    *,
+    kind: str,
+    req_id: str,
+    session: str,
+    from_provider: str,
+    to_provider: str,
+    size: int,
+    ts: Optional[float] = None,
+    path: Optional[Path] = None,
+) -> None:
+    """Append one `req`/`reply` entry; never raises."""
+    if not enabled():
+        return
+    entry = {
+        "ts": round(time.time() if ts is None else ts, 3),
+        "ev": kind,
+        "req_id": req_id,
+        "session": session,
+        "from": from_provider,
+        "to": to_provider,
+        "bytes": int(size),
+    }
+    try:
+        target = ledger_path(work_dir) if path is None else path
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        append_capped_lines(target, line, max_bytes=MAX_BYTES, keep_lines=KEEP_RECORDS)
+    except Exception:
+        pass
+
+
+def load(path: Path) -> List[Dict[str, Any]]:
+    entries: List[Dict[str, Any]] = []
+    try:
+        raw = path.read_text(encoding="utf-8")
+    except Exception:
+        return entries
+    for line in raw.splitlines():
+        try:
+            item = json.loads(line)
+        except Exception:
+            continue
+        if isinstance(item, dict) and item.get("req_id") and item.get("ev") in ("req", "reply"):
+            entries.append(item)
+    return entries
+
+
+def pair(entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One row per request: who was asked, when, and the first reply's latency (or None)."""
+    requests: Dict[str, Dict[str, Any]] = {}
+    for ev in sorted(entries, key=lambda e: float(e.get("ts") or 0)):
+        rid = ev["req_id"]
+        if ev["ev"] == "req":
+            if rid not in requests:
+                requests[rid] = {
+                    "req_id": rid,
+                    "session": ev.get("session") or "",
+                    "from": ev.get("from") or "",
+                    "to": ev.get("to") or "",
+                    "ts": float(ev.get("ts") or 0),
+                    "bytes": ev.get("bytes") or 0,
+                    "reply_ts": None,
+                    "latency_s": None,
+                }
+            continue
+        req = requests.get(rid)
+        if req is not None and req["reply_ts"] is None:
+            req["reply_ts"] = float(ev.get("ts") or 0)
+            req["latency_s"] = round(max(0.0, req["reply_ts"] - req["ts"]), 3)
+    return list(requests.values())
+
+
+def _latency_rows(rows: List[Dict[str, Any]], key) -> List[Dict[str, Any]]:
+    groups: Dict[str, List[float]] = {}
+    for row in rows:
+        if row["latency_s"] is not None:
+            groups.setdefault(key(row), []).append(row["latency_s"])
+    out = []
+    for name, values in groups.items():
+        stats = {f"p{q}": percentile(values, q) for q in (50, 90, 99)}
+        stats["max"] = max(values)
+        out.append({"key": name, "n": len(values), "latency_s": stats})
+    out.sort(key=lambda r: -(r["latency_s"]["p90"] or 0.0))
+    return out
+
+
+def summarize(
+    entries: Iterable[Dict[str, Any]],
+    *,
+    now: Optional[float] = None,
+    since_s: float = 24 * 3600,
+    bucket_s: float = 3600,
+) -> Dict[str, Any]:
+    """Outstanding requests, latency by provider/session and throughput for the last `since_s`."""
+    now = time.time() if now is None else now
+    rows = [r for r in pair(entries) if r["ts"] >= now - since_s]
+    outstanding = [
+        {"req_id": r["req_id"], "to": r["to"], "session": r["session"], "age_s": round(now - r["ts"], 1)}
+        for r in rows
+        if r["reply_ts"] is None
+    ]
+    outstanding.sort(key=lambda r: -r["age_s"])
+    buckets: Dict[int, Dict[str, int]] = {}
+    for r in rows:
+        start = int(r["ts"] // bucket_s * bucket_s)
+        b = buckets.setdefault(start, {"requests": 0, "replied": 0})
+        b["requests"] += 1
+        if r["reply_ts"] is not None:
+            b["replied"] += 1
+    return {
+        "requests": len(rows),
+        "replied": sum(1 for r in rows if r["reply_ts"] is not None),
+        "outstanding": outstanding,
+        "by_provider": _latency_rows(rows, lambda r: r["to"]),
+        "by_session": _latency_rows(rows, lambda r: f"{r['session']}/{r['to']}"),
+        "throughput": [{"start": start, **buckets[start]} for start in sorted(buckets)],
+        "since_s": since_s,
+        "bucket_s": bucket_s,
+    }
+
+
+def parse_duration(text: str) -> float:
+    """`90`, `90s`, `15m`, `24h`, `7d` -> seconds."""
+    text = (text or "").strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    scale = units.get(text[-1:], None)
+    number = text[:-1] if scale else text
+    value = float(number) * (scale or 1)
+    if value <= 0:
+        raise ValueError(f"duration must be positive: {text!r}")
+    return value
+
+
+def _s(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.1f}" if value < 100 else f"{value:.0f}"
+
+
+def format_report(summary: Dict[str, Any], *, limit: int = 10) -> str:
+    hours = summary["since_s"] / 3600
+    lines = [f"📨 Requests (last {hours:g}h): {summary['requests']} sent, {summary['replied']} replied"]
+    lines.append("")
+    lines.append(f"⏳ Outstanding: {len(summary['outstanding'])}")
+    for row in summary["outstanding"][:limit]:
+        lines.append(f"   {row['req_id']}  → {row['to']:<8} {row['session']:<16} waiting {_s(row['age_s'])}s")
+    if len(summary["outstanding"]) > limit:
+        lines.append(f"   ... {len(summary['outstanding']) - limit} more")
+    for title, key in (("provider", "by_provider"), ("session/provider", "by_session")):
+        lines.append("")
+        lines.append(f"⏱️ Reply latency by {title} (s)")
+        if not summary[key]:
+            lines.append("   (no replies recorded)")
+        for row in summary[key]:
+            lat = row["latency_s"]
+            lines.append(
+                f"   {row['key']:<24} n={row['n']:<5} p50/p90/p99/max="
+                f"{_s(lat['p50'])}/{_s(lat['p90'])}/{_s(lat['p99'])}/{_s(lat['max'])}"
+            )
+    lines.append("")
+    lines.append(f"📈 Throughput (per {summary['bucket_s'] / 60:g} min)")
+    if not summary["throughput"]:
+        lines.append("   (no requests)")
+    for b in summary["throughput"]:
+        stamp = time.strftime("%m-%d %H:%M", time.localtime(b["start"]))
+        lines.append(f"   {stamp}  {b['requests']:>4} sent  {b['replied']:>4} replied  {'▇' * min(b['requests'], 40)}")
+    return "\n".join(lines)
@@ -4,13 +4,14 @@ import json
 import os
 import sys
 import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from cli_output import atomic_write_text
-from project_id import compute_cq_project_id
+from project_keys import project_keys
 from session_scope import DEFAULT_SESSION, normalize_session_name
-from terminal import get_backend_for_session
+from terminal import PaneSnapshot, get_backend_for_session
 
 REGISTRY_PREFIX = "cq-session-"
 REGISTRY_SUFFIX = ".json"
@@ -77,6 +78,17 @@ def _is_stale(updated_at: int, now: Optional[int] = None) -> bool:
     return (now_ts - updated_at) > REGISTRY_TTL_SECONDS
 
 
+def registry_record_expired(path: Path, now: Optional[int] = None) -> bool:
+    """
+    Whether a registry file is past `REGISTRY_TTL_SECONDS` (and therefore ignored by lookups).
+
+    Unreadable files fall back to their mtime.
+    """
+    data = _load_registry_file(path)
+    updated_at = _coerce_updated_at((data or {}).get("updated_at"), path)
+    return _is_stale(updated_at, now)
+
+
 def _load_registry_file(path: Path) -> Optional[Dict[str, Any]]:
     try:
         with path.open("r", encoding="utf-8") as handle:
@@ -131,7 +143,15 @@ def _get_providers_map(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     return out
 
 
-def _provider_pane_alive(record: Dict[str, Any], provider: str) -> bool:
+def _provider_pane_alive(
+    record: Dict[str, Any], provider: str, snapshots: Optional[Dict[str, PaneSnapshot]] = None
+) -> bool:
+    """
+    Check whether the provider pane recorded in `record` is alive.
+
+    When `snapshots` is given, one `PaneSnapshot` per terminal type is cached in it so that
+    checking many records costs a single pane listing per backend.
+    """
     providers = _get_providers_map(record)
     entry = providers.get((provider or "").strip().lower())
     if not isinstance(entry, dict):
@@ -140,30 +160,97 @@ def _provider_pane_alive(record: Dict[str, Any], provider: str) -> bool:
     pane_id = str(entry.get("pane_id") or "").strip()
     marker = str(entry.get("pane_title_marker") or "").strip()
 
-    backend = None
-    try:
-        backend = get_backend_for_session({"terminal": record.get("terminal", "tmux")})
-    except Exception:
+    terminal = str(record.get("terminal", "tmux") or "tmux")
+    snapshot = snapshots.get(terminal) if snapshots is not None else None
+    if snapshot is None:
         backend = None
-    if not backend:
+        try:
+            backend = get_backend_for_session({"terminal": terminal})
+        except Exception:
+            backend = None
+        if not backend:
+            return False
+        snapshot = PaneSnapshot(backend)
+        if snapshots is not None:
+            snapshots[terminal] = snapshot
+    if snapshot.backend is None:
         return False
 
     # Best-effort marker resolution if pane_id is missing/stale.
     if (not pane_id) and marker:
-        resolver = getattr(backend, "find_pane_by_title_marker", None)
-        if callable(resolver):
-            try:
-                pane_id = str(resolver(marker) or "").strip()
-            except Exception:
-                pane_id = ""
+        pane_id = str(snapshot.find_pane_by_title_marker(marker) or "").strip()
 
     if not pane_id:
         return False
 
+    return snapshot.is_alive(pane_id)
+
+
+@dataclass
+class RegistryRecord:
+    path: Path
+    data: Dict[str, Any]
+    updated_at: int
+
+    @property
+    def session_id(self) -> str:
+        name = self.path.name
+        return name[len(REGISTRY_PREFIX) : len(name) - len(REGISTRY_SUFFIX)]
+
+
+def load_registry_records(session_name: str | None = None) -> List[RegistryRecord]:
+    """
+    Read every non-stale registry record in one directory pass.
+
+    When `session_name` is given, only records for that CQ session are returned.
+    """
+    want_session = None
+    if (session_name or "").strip():
+        want_session = _normalize_cq_session_name(session_name)
+
+    now = int(time.time())
+    out: List[RegistryRecord] = []
+    for path in _iter_registry_files():
+        data = _load_registry_file(path)
+        if not data:
+            continue
+        if want_session is not None:
+            have = _normalize_cq_session_name(data.get("cq_session_name"))
+            if have != want_session:
+                continue
+        updated_at = _coerce_updated_at(data.get("updated_at"), path)
+        if _is_stale(updated_at, now):
+            continue
+        out.append(RegistryRecord(path=path, data=data, updated_at=updated_at))
+    return out
+
+
+def record_project_id(data: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    Return `(cq_project_id, inferred)` for a registry record.
+
+    Legacy records without `cq_project_id` get it inferred from `work_dir` (no side effects).
+    """
+    existing = str(data.get("cq_project_id") or "").strip()
+    if existing:
+        return existing, False
+    wd = str(data.get("work_dir") or "").strip()
+    if not wd:
+        return "", False
+    inferred = project_keys(wd).cq_project_id
+    return inferred, bool(inferred)
+
+
+def persist_inferred_project_id(data: Dict[str, Any]) -> None:
+    """Best-effort: write the inferred cq_project_id back into a legacy record."""
     try:
-        return bool(backend.is_alive(pane_id))
+        if not (data.get("cq_project_id") or "").strip():
+            pid, _ = record_project_id(data)
+            if pid:
+                data["cq_project_id"] = pid
+                upsert_registry(data)
     except Exception:
-        return False
+        pass
 
 
 def load_registry_by_session_id(
@@ -242,6 +329,7 @@ def load_registry_by_project_id(
     best: Optional[Dict[str, Any]] = None
     best_ts = -1
     best_needs_migration = False
+    snapshots: Dict[str, PaneSnapshot] = {}
 
     for path in _iter_registry_files():
         data = _load_registry_file(path)
@@ -262,16 +350,13 @@ def load_registry_by_project_id(
             # Back-compat: infer from work_dir (no side effects while scanning).
             wd = (data.get("work_dir") or "").strip()
             if wd:
-                try:
-                    inferred = compute_cq_project_id(Path(wd))
-                except Exception:
-                    inferred = ""
+                inferred = project_keys(wd).cq_project_id
         effective = existing or inferred
 
         if effective != proj:
             continue
 
-        if not _provider_pane_alive(data, prov):
+        if not _provider_pane_alive(data, prov, snapshots):
             continue
 
         # Prefer the newest record for this project+provider.
@@ -282,14 +367,7 @@ def load_registry_by_project_id(
 
     if best and best_needs_migration:
         # Best-effort persistence: update only the winning record to include cq_project_id.
-        try:
-            if not (best.get("cq_project_id") or "").strip():
-                wd = (best.get("work_dir") or "").strip()
-                if wd:
-                    best["cq_project_id"] = compute_cq_project_id(Path(wd))
-                    upsert_registry(best)
-        except Exception:
-            pass
+        persist_inferred_project_id(best)
 
     return best
 
@@ -332,10 +410,7 @@ def load_registry_by_project_id_unfiltered(
         if not existing:
             wd = (data.get("work_dir") or "").strip()
             if wd:
-                try:
-                    inferred = compute_cq_project_id(Path(wd))
-                except Exception:
-                    inferred = ""
+                inferred = project_keys(wd).cq_project_id
         effective = existing or inferred
         if effective != proj:
             continue
@@ -425,10 +500,9 @@ def upsert_registry(record: Dict[str, Any]) -> bool:
     if not (data.get("cq_project_id") or "").strip():
         wd = (data.get("work_dir") or "").strip()
         if wd:
-            try:
-                data["cq_project_id"] = compute_cq_project_id(Path(wd))
-            except Exception:
-                pass
+            pid = project_keys(wd).cq_project_id
+            if pid:
+                data["cq_project_id"] = pid
 
     data["updated_at"] = int(time.time())
 
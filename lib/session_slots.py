@@ -0,0 +1,163 @@
+"""
+session_slots.py - Auto-session slot allocation (`default-2` .. `default-50`) for `cq`.
+
+When the default session of a directory is taken, `cq` starts the next free auto session.
+Instead of probing `default-2`, `default-3`, ... with one lock file each, a compact per-project
+slot table (`~/.cq/run/cq-slots-<hash>.json`, next to the session locks) records which slots
+are in use and by which pid. Under one flock on the table the allocator drops every entry whose
+holder is dead, picks the lowest free slot and confirms it with the slot's session lock, so a
+launch normally costs one table read/write and one lock attempt.
+
+The session lock stays authoritative: a slot held by a process that is not in the table (an
+older `cq`, or an explicit `--session default-2`) fails its lock attempt, is recorded with that
+holder's pid and skipped.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from process_lock import _is_pid_alive
+from session_scope import DEFAULT_SESSION, normalize_session_name
+
+TABLE_VERSION = 1
+FIRST_SLOT = 2
+LAST_SLOT = 50
+
+L = TypeVar("L")
+
+
+def slot_name(n: int, base: str = DEFAULT_SESSION) -> str:
+    return normalize_session_name(f"{base}-{n}")
+
+
+def table_path(table_dir: Path, scope: str) -> Path:
+    digest = hashlib.md5(scope.encode()).hexdigest()[:8]
+    return Path(table_dir) / f"cq-slots-{digest}.json"
+
+
+class SlotTable:
+    """The slot table for one project scope, read and rewritten under an exclusive flock."""
+
+    def __init__(self, table_dir: Path, scope: str):
+        self.path = table_path(table_dir, scope)
+        self.scope = scope
+        self.slots: Dict[int, dict] = {}
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "SlotTable":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self.path), os.O_CREAT | os.O_RDWR)
+        if os.name != "nt":
+            import fcntl
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self.slots = self._read()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self._write()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read(self) -> Dict[int, dict]:
+        chunks = []
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        while True:
+            chunk = os.read(self._fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            data = json.loads(b"".join(chunks).decode("utf-8"))
+        except Exception:
+            return {}
+        if not isinstance(data, dict) or data.get("version") != TABLE_VERSION:
+            return {}
+        slots: Dict[int, dict] = {}
+        for key, entry in (data.get("slots") or {}).items():
+            if str(key).isdigit() and isinstance(entry, dict):
+                slots[int(key)] = entry
+        return slots
+
+    def _write(self) -> None:
+        payload = {
+            "version": TABLE_VERSION,
+            "scope": self.scope,
+            "slots": {str(n): self.slots[n] for n in sorted(self.slots)},
+        }
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, data)
+
+    def reclaim(self) -> int:
+        """Drop every slot whose holder is gone (or unknown); returns how many were freed."""
+        dead = [n for n, entry in self.slots.items() if not _holder_alive(entry)]
+        for n in dead:
+            del self.slots[n]
+        return len(dead)
+
+    def claim(self, n: int, pid: Optional[int], name: str) -> None:
+        self.slots[n] = {"pid": pid, "session": name, "ts": int(time.time())}
+
+
+def _holder_alive(entry: dict) -> bool:
+    pid = entry.get("pid")
+    return isinstance(pid, int) and pid > 0 and _is_pid_alive(pid)
+
+
+def allocate(
+    table_dir: Path,
+    scope: str,
+    session_lock: Callable[[str], L],
+    *,
+    holder_pid: Optional[Callable[[L], Optional[int]]] = None,
+    base: str = DEFAULT_SESSION,
+    first: int = FIRST_SLOT,
+    last: int = LAST_SLOT,
+) -> Tuple[Optional[str], Optional[L]]:
+    """
+    Take the lowest free auto-session slot for `scope`.
+
+    `session_lock(name)` builds the session's lock (anything with `try_acquire()`);
+    `holder_pid(lock)` may report who holds a busy one so it is skipped until that pid exits.
+    Returns `(session_name, acquired_lock)` or `(None, None)` when every slot is taken.
+    """
+    with SlotTable(table_dir, scope) as table:
+        table.reclaim()
+        for n in range(first, last + 1):
+            if n in table.slots:
+                continue
+            try:
+                name = slot_name(n, base)
+            except ValueError:
+                continue
+            lock = session_lock(name)
+            if lock.try_acquire():
+                table.claim(n, os.getpid(), name)
+                return name, lock
+            pid = holder_pid(lock) if holder_pid is not None else None
+            if pid is not None and pid != os.getpid() and _is_pid_alive(pid):
+                table.claim(n, pid, name)
+    return None, None
+
+
+def release(table_dir: Path, scope: str, name: str, *, pid: Optional[int] = None) -> None:
+    """Free `name`'s slot if it is still recorded for `pid` (default: this process)."""
+    pid = os.getpid() if pid is None else pid
+    try:
+        with SlotTable(table_dir, scope) as table:
+            for n, entry in list(table.slots.items()):
+                if entry.get("session") == name and entry.get("pid") == pid:
+                    del table.slots[n]
+    except Exception:
+        pass
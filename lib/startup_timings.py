@@ -0,0 +1,102 @@
+"""
+startup_timings.py - Phase timeline for `cq --timings` / `CQ_TIMINGS=1`.
+
+The launcher wraps its startup phases in `cq_trace.stage(...)`; this module turns the resulting
+trace into a short per-phase summary (wall time, subprocesses, files touched) and appends one
+JSON record per launch to `~/.cache/cq/timings.jsonl` so regressions can be compared across
+versions.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+
+import cq_trace
+from cli_output import append_capped_lines
+
+TRACE_LABEL = "cq startup"
+HISTORY_MAX_BYTES = 512 * 1024
+HISTORY_KEEP_RECORDS = 500
+
+
+def env_enabled(env: Optional[Dict[str, str]] = None) -> bool:
+    env_map = os.environ if env is None else env
+    val = (env_map.get("CQ_TIMINGS") or "").strip().lower()
+    return bool(val) and val not in ("0", "false", "no", "off")
+
+
+def history_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "timings.jsonl"
+
+
+def start() -> None:
+    cq_trace.enable(TRACE_LABEL)
+
+
+def build_record(trace: cq_trace.Trace, version: str) -> Dict[str, Any]:
+    data = trace.to_dict()
+    phases = []
+    for st in data["stages"]:
+        phases.append(
+            {
+                "name": st["name"],
+                "depth": st["depth"],
+                "ms": st["elapsed_ms"],
+                "procs": len(st["procs"]),
+                "files": len(st["files"]),
+            }
+        )
+    return {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "version": version,
+        "total_ms": data["total_ms"],
+        "phases": phases,
+    }
+
+
+def format_record(record: Dict[str, Any]) -> str:
+    lines = [f"⏱️ Startup timings (v{record['version']}): {record['total_ms']:.1f} ms total"]
+    width = max([len("  " * p["depth"] + p["name"]) for p in record["phases"]] + [5])
+    for phase in record["phases"]:
+        name = ("  " * phase["depth"] + phase["name"]).ljust(width)
+        lines.append(f"   {name}  {phase['ms']:8.1f} ms  procs={phase['procs']:<3} files={phase['files']}")
+    return "\n".join(lines)
+
+
+def _append_history(path: Path, record: Dict[str, Any]) -> None:
+    append_capped_lines(
+        path,
+        json.dumps(record, ensure_ascii=False) + "\n",
+        max_bytes=HISTORY_MAX_BYTES,
+        keep_lines=HISTORY_KEEP_RECORDS,
+    )
+
+
+def finish(version: str, *, stream: Optional[TextIO] = None, history: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Stop the startup trace, print its summary and append it to the history file.
+
+    Safe to call more than once: only the first call after `start()` reports anything.
+    """
+    trace = cq_trace.active()
+    if trace is None or trace.label != TRACE_LABEL:
+        return None
+    cq_trace.disable()
+    record = build_record(trace, version)
+    out = sys.stderr if stream is None else stream
+    try:
+        print(format_record(record), file=out)
+    except Exception:
+        pass
+    target = history_path() if history is None else history
+    try:
+        _append_history(target, record)
+        print(f"   history: {target}", file=out)
+    except Exception:
+        pass
+    return record
@@ -0,0 +1,268 @@
+"""
+status_snapshot.py - Precomputed tmux status-bar segments for `config/cq-status.sh`.
+
+tmux re-runs the status script on every `status-interval` tick for every client. Instead of
+forking `pgrep`/`tmux list-panes`/`wc` there, one producer (`bin/cq-status-snapshot --daemon`)
+keeps a small file per mode in `<cache>/status/<mode>.txt` (two lines: epoch seconds, rendered
+segment) and the script only reads it back.
+
+The producer recomputes when the registry (`~/.cq/run`) changes and otherwise every `interval`
+seconds with one pane listing per backend, so the status cost is constant no matter how many
+sessions or clients exist. It holds a lock so at most one instance runs, and exits after
+`IDLE_EXIT_S` without any CQ pane, leaving an `idle` marker next to the files. The status script
+keeps showing the last (idle) segment while the marker is newer than the registry directory, and
+only starts the producer again when the files are stale and the registry has changed since.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional
+
+import fs_watch
+from cli_output import atomic_write_text
+from session_registry import (
+    REGISTRY_PREFIX,
+    REGISTRY_SUFFIX,
+    _get_providers_map,
+    _provider_pane_alive,
+    _registry_dir,
+    load_registry_records,
+)
+from terminal import PaneSnapshot, get_backend_for_session
+
+MODES = ("full", "daemons", "compact", "modern")
+LEGACY_DAEMONS = ("cask", "gask", "oask", "dask")
+PANE_TITLE_PREFIXES = {"claude": "CQ-Claude", "codex": "CQ-Codex"}
+DEFAULT_INTERVAL_S = 5.0
+IDLE_EXIT_S = 300.0
+IDLE_MARKER = "idle"
+
+C_GREEN = "#[fg=#9ece6a,bold]"
+C_BLUE = "#[fg=#7aa2f7,bold]"
+C_YELLOW = "#[fg=#e0af68,bold]"
+C_PURPLE = "#[fg=#bb9af7,bold]"
+C_ORANGE = "#[fg=#ff9e64,bold]"
+C_PINK = "#[fg=#ff007c,bold]"
+C_TEAL = "#[fg=#7dcfff,bold]"
+C_RESET = "#[fg=default,nobold]"
+C_DIM = "#[fg=#565f89]"
+C_OFF = "#[fg=colour240]"
+
+
+@dataclass(frozen=True)
+class StatusState:
+    """What the status bar shows: providers with a live pane, and running legacy daemons."""
+
+    providers: FrozenSet[str] = frozenset()
+    daemons: FrozenSet[str] = frozenset()
+    sessions: int = 0
+
+    @property
+    def idle(self) -> bool:
+        return not self.providers and not self.daemons
+
+
+def status_dir(env: Optional[Mapping[str, str]] = None) -> Path:
+    """Same location as `$CQ_CACHE_DIR/status` in cq-status.sh."""
+    env_map = os.environ if env is None else env
+    explicit = (env_map.get("CQ_CACHE_DIR") or "").strip()
+    if explicit:
+        return Path(explicit) / "status"
+    xdg = (env_map.get("XDG_CACHE_HOME") or "").strip()
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "cq" / "status"
+
+
+def running_daemons(names: Iterable[str] = LEGACY_DAEMONS) -> FrozenSet[str]:
+    """Legacy `bin/<name>d` daemons that are running (one /proc pass, or one `pgrep` call)."""
+    wanted = {f"bin/{n}d": n for n in names}
+    cmdlines = []
+    proc = Path("/proc")
+    if proc.is_dir():
+        for entry in proc.iterdir():
+            if not entry.name.isdigit():
+                continue
+            try:
+                raw = (entry / "cmdline").read_bytes()
+            except OSError:
+                continue
+            if raw:
+                cmdlines.append(raw.replace(b"\0", b" ").decode("utf-8", "replace").strip())
+    else:
+        try:
+            cp = subprocess.run(["pgrep", "-fl", "bin/.*d$"], capture_output=True, text=True, timeout=2)
+            cmdlines = cp.stdout.splitlines()
+        except Exception:
+            return frozenset()
+    found = set()
+    for line in cmdlines:
+        for suffix, name in wanted.items():
+            if line.endswith(suffix):
+                found.add(name)
+    return frozenset(found)
+
+
+def collect(*, snapshots: Optional[Dict[str, PaneSnapshot]] = None, daemons: Optional[FrozenSet[str]] = None) -> StatusState:
+    """
+    One status computation: registry records whose provider panes are alive, plus CQ pane
+    titles from the same per-backend listing (panes started without a registry record).
+    """
+    snapshots = {} if snapshots is None else snapshots
+    records = load_registry_records()
+    providers = set()
+    for rec in records:
+        for provider in _get_providers_map(rec.data):
+            if provider in providers:
+                continue
+            try:
+                if _provider_pane_alive(rec.data, provider, snapshots):
+                    providers.add(provider)
+            except Exception:
+                continue
+    if "tmux" not in snapshots:
+        try:
+            backend = get_backend_for_session({"terminal": "tmux"})
+        except Exception:
+            backend = None
+        snapshots["tmux"] = PaneSnapshot(backend)
+    tmux = snapshots["tmux"]
+    for provider, prefix in PANE_TITLE_PREFIXES.items():
+        if provider not in providers and tmux.backend is not None and tmux.find_pane_by_title_marker(prefix):
+            providers.add(provider)
+    return StatusState(
+        providers=frozenset(providers),
+        daemons=running_daemons() if daemons is None else daemons,
+        sessions=len(records),
+    )
+
+
+def _dot(on: bool, color: str) -> str:
+    return f"{color}●{C_RESET}" if on else f"{C_DIM}○{C_RESET}"
+
+
+def render(state: StatusState, mode: str) -> str:
+    """The segment cq-status.sh prints for `mode` (same markup as its shell implementation)."""
+    d = state.daemons
+    if mode == "full":
+        icons = [("cask", "C", C_ORANGE), ("cask", "X", C_GREEN), ("gask", "G", C_BLUE), ("oask", "O", C_PURPLE), ("dask", "D", C_YELLOW)]
+        return " " + "".join(f"{color if name in d else C_OFF}{icon}{C_RESET}" for name, icon, color in icons) + " "
+    if mode == "daemons":
+        icons = [("cask", "X", C_GREEN), ("gask", "G", C_BLUE), ("oask", "O", C_PURPLE), ("dask", "D", C_YELLOW)]
+        out = "".join(f"{color}{icon}{C_RESET}" for name, icon, color in icons if name in d)
+        return f" {out} " if out else ""
+    if mode == "compact":
+        return (
+            f"{C_PINK}CQ{C_RESET} "
+            f"{_dot('cask' in d, C_ORANGE)} {_dot('gask' in d, C_TEAL)} {_dot('oask' in d, C_PURPLE)} {_dot('dask' in d, C_YELLOW)}"
+        )
+    if mode == "modern":
+        p = state.providers
+        return (
+            f"{_dot('claude' in p, C_ORANGE)} {_dot('codex' in p, C_GREEN)} "
+            f"{_dot('gask' in d, C_TEAL)} {_dot('oask' in d, C_PURPLE)} {_dot('dask' in d, C_YELLOW)}"
+        )
+    raise ValueError(f"unknown status mode: {mode}")
+
+
+def write(state: StatusState, directory: Optional[Path] = None, *, now: Optional[float] = None) -> None:
+    directory = status_dir() if directory is None else directory
+    stamp = int(time.time() if now is None else now)
+    for mode in MODES:
+        atomic_write_text(directory / f"{mode}.txt", f"{stamp}\n{render(state, mode)}\n")
+
+
+def _mark_idle(directory: Path, idle: bool) -> None:
+    """Tell cq-status.sh that the last segment stays valid until the registry changes (or not)."""
+    marker = directory / IDLE_MARKER
+    try:
+        if idle:
+            atomic_write_text(marker, f"{int(time.time())}\n")
+        else:
+            marker.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _single_instance(directory: Path) -> Optional[int]:
+    """Hold `producer.lock` for the life of the process; None if another producer has it."""
+    if os.name == "nt":
+        return None
+    import fcntl
+
+    directory.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(directory / "producer.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    return fd
+
+
+def _registry_spec():
+    return (_registry_dir(), lambda name: name.startswith(REGISTRY_PREFIX) and name.endswith(REGISTRY_SUFFIX))
+
+
+def run(
+    *,
+    directory: Optional[Path] = None,
+    interval: float = DEFAULT_INTERVAL_S,
+    idle_exit: float = IDLE_EXIT_S,
+    watcher=None,
+    max_cycles: Optional[int] = None,
+) -> int:
+    """Keep the status files current until idle for `idle_exit` seconds (producer loop)."""
+    directory = status_dir() if directory is None else directory
+    lock_fd = _single_instance(directory)
+    if lock_fd is None and os.name != "nt":
+        return 0
+    _mark_idle(directory, False)
+    watcher = watcher if watcher is not None else fs_watch.create(poll_interval=min(1.0, interval))
+    last_busy = time.monotonic()
+    cycles = 0
+    try:
+        while True:
+            watcher.sync([_registry_spec()])
+            state = collect()
+            write(state, directory)
+            now = time.monotonic()
+            if not state.idle:
+                last_busy = now
+            elif now - last_busy >= idle_exit:
+                _mark_idle(directory, True)
+                return 0
+            cycles += 1
+            if max_cycles is not None and cycles >= max_cycles:
+                return 0
+            watcher.wait(max(0.5, interval))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+        if lock_fd is not None:
+            os.close(lock_fd)
+
+
+def main(argv: Optional[list] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="cq-status-snapshot", description="Write precomputed tmux status segments for cq-status.sh.")
+    parser.add_argument("--daemon", action="store_true", help="Keep the snapshot current until idle (single instance).")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_S, help="Seconds between pane snapshots (default: 5).")
+    parser.add_argument("--print", dest="print_mode", choices=MODES, default=None, help="Print one mode's segment after writing.")
+    args = parser.parse_args(argv)
+    if args.daemon:
+        return run(interval=args.interval)
+    state = collect()
+    write(state)
+    if args.print_mode:
+        sys.stdout.write(render(state, args.print_mode) + "\n")
+    return 0
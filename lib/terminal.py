@@ -4,7 +4,6 @@ import os
 import platform
 import re
 import shlex
-import shutil
 import subprocess
 import sys
 import time
@@ -13,6 +12,8 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
+import tool_cache
+
 
 def _env_float(name: str, default: float) -> float:
     raw = os.environ.get(name)
@@ -104,17 +105,25 @@ def _get_wezterm_bin() -> str | None:
     if cached:
         _cached_wezterm_bin = cached
         return cached
-    found = shutil.which("wezterm") or shutil.which("wezterm.exe")
+    found = tool_cache.which("wezterm") or tool_cache.which("wezterm.exe")
     if found:
         _cached_wezterm_bin = found
         return found
     if is_wsl():
-        for drive in "cdefghijklmnopqrstuvwxyz":
-            for path in [f"/mnt/{drive}/Program Files/WezTerm/wezterm.exe",
-                         f"/mnt/{drive}/Program Files (x86)/WezTerm/wezterm.exe"]:
-                if Path(path).exists():
-                    _cached_wezterm_bin = path
-                    return path
+        # Probing every drive letter under /mnt is slow; the result is cached in ~/.cache/cq.
+        found = tool_cache.probe("wezterm_wsl", _probe_wsl_wezterm_bin)
+        if found:
+            _cached_wezterm_bin = found
+            return found
+    return None
+
+
+def _probe_wsl_wezterm_bin() -> str | None:
+    for drive in "cdefghijklmnopqrstuvwxyz":
+        for path in [f"/mnt/{drive}/Program Files/WezTerm/wezterm.exe",
+                     f"/mnt/{drive}/Program Files (x86)/WezTerm/wezterm.exe"]:
+            if Path(path).exists():
+                return path
     return None
 
 
@@ -298,6 +307,25 @@ class TmuxBackend(TerminalBackend):
             raise RuntimeError(f"tmux split-window did not return pane_id: {pane_id!r}")
         return pane_id
 
+    def join_pane(self, src_pane_id: str, target_pane_id: str, direction: str = "right") -> str:
+        """
+        Move `src_pane_id` (e.g. from a detached session) next to `target_pane_id`.
+
+        The pane keeps its id and its running process; a source session left without panes is
+        destroyed by tmux. Like `split_pane`, no size is passed (tmux's default 50% split).
+        """
+        if not src_pane_id or not target_pane_id:
+            raise ValueError("src_pane_id and target_pane_id are required")
+        direction_norm = (direction or "").strip().lower()
+        if direction_norm in ("right", "h", "horizontal"):
+            flag = "-h"
+        elif direction_norm in ("bottom", "v", "vertical"):
+            flag = "-v"
+        else:
+            raise ValueError(f"unsupported direction: {direction!r} (use 'right' or 'bottom')")
+        self._tmux_run(["join-pane", flag, "-s", src_pane_id, "-t", target_pane_id], check=True, capture=True)
+        return src_pane_id
+
     def set_pane_title(self, pane_id: str, title: str) -> None:
         if not pane_id:
             return
@@ -339,6 +367,33 @@ class TmuxBackend(TerminalBackend):
                     return pid
         return None
 
+    def list_pane_states(self) -> Optional[list[dict]]:
+        """
+        List all panes on the server in one call (`pane_id`, `title`, `alive`).
+
+        Returns None when tmux cannot be queried, so callers can fall back to per-pane probes.
+        """
+        try:
+            cp = self._tmux_run(
+                ["list-panes", "-a", "-F", "#{pane_id}\t#{pane_dead}\t#{pane_title}"],
+                capture=True,
+                timeout=1.0,
+            )
+        except Exception:
+            return None
+        if cp.returncode != 0:
+            return None
+        panes: list[dict] = []
+        for line in (cp.stdout or "").splitlines():
+            parts = line.split("\t", 2)
+            pid = parts[0].strip()
+            if not self._looks_like_pane_id(pid):
+                continue
+            dead = parts[1].strip() if len(parts) > 1 else "0"
+            title = parts[2] if len(parts) > 2 else ""
+            panes.append({"pane_id": pid, "title": title, "alive": dead == "0"})
+        return panes
+
     def get_pane_content(self, pane_id: str, lines: int = 20) -> Optional[str]:
         if not pane_id:
             return None
@@ -858,6 +913,19 @@ class WeztermBackend(TerminalBackend):
             return None
         return self._pane_id_by_title_marker(panes, marker)
 
+    def list_pane_states(self) -> Optional[list[dict]]:
+        """List all panes in one `wezterm cli list` call (`pane_id`, `title`, `alive`)."""
+        panes = self._list_panes()
+        if panes is None:
+            return None
+        out: list[dict] = []
+        for pane in panes:
+            pane_id = pane.get("pane_id")
+            if pane_id is None:
+                continue
+            out.append({"pane_id": str(pane_id), "title": str(pane.get("title") or ""), "alive": True})
+        return out
+
     def is_alive(self, pane_id: str) -> bool:
         panes = self._list_panes()
         if panes is None:
@@ -963,7 +1031,7 @@ def _current_tty() -> str | None:
 def _inside_tmux() -> bool:
     if not (os.environ.get("TMUX") or os.environ.get("TMUX_PANE")):
         return False
-    if not shutil.which("tmux"):
+    if not tool_cache.which("tmux"):
         return False
 
     tty = _current_tty()
@@ -1077,6 +1145,76 @@ def get_backend_for_session(session_data: dict) -> Optional[TerminalBackend]:
     return TmuxBackend()
 
 
+class PaneSnapshot:
+    """
+    Point-in-time view of one backend's panes.
+
+    The first liveness query lists all panes once (`tmux list-panes -a` / `wezterm cli list`);
+    later queries are answered from that listing. Backends without `list_pane_states` (or whose
+    listing fails) fall back to per-pane `is_alive`, memoized per pane id.
+    """
+
+    def __init__(self, backend: Optional[TerminalBackend]):
+        self.backend = backend
+        self._panes: Optional[list[dict]] = None
+        self._loaded = False
+        self._alive: dict[str, bool] = {}
+
+    def _listing(self) -> Optional[list[dict]]:
+        if self._loaded:
+            return self._panes
+        self._loaded = True
+        lister = getattr(self.backend, "list_pane_states", None)
+        if callable(lister):
+            try:
+                self._panes = lister()
+            except Exception:
+                self._panes = None
+        return self._panes
+
+    def is_alive(self, pane_id: str) -> bool:
+        pane_id = str(pane_id or "").strip()
+        if not pane_id or self.backend is None:
+            return False
+        if pane_id in self._alive:
+            return self._alive[pane_id]
+        alive: Optional[bool] = None
+        # tmux legacy targets (session names, `sess:win.pane`) are not in the pane listing.
+        if not isinstance(self.backend, TmuxBackend) or pane_id.startswith("%"):
+            panes = self._listing()
+            if panes is not None:
+                alive = any(p.get("pane_id") == pane_id and p.get("alive") for p in panes)
+                if not alive and isinstance(self.backend, WeztermBackend):
+                    # WezTerm `is_alive` also accepts a title marker.
+                    alive = any(str(p.get("title") or "").startswith(pane_id) for p in panes)
+        if alive is None:
+            try:
+                alive = bool(self.backend.is_alive(pane_id))
+            except Exception:
+                alive = False
+        self._alive[pane_id] = alive
+        return alive
+
+    def find_pane_by_title_marker(self, marker: str) -> Optional[str]:
+        marker = (marker or "").strip()
+        if not marker or self.backend is None:
+            return None
+        panes = self._listing()
+        if panes is None:
+            resolver = getattr(self.backend, "find_pane_by_title_marker", None)
+            if not callable(resolver):
+                return None
+            try:
+                found = resolver(marker)
+            except Exception:
+                return None
+            return str(found) if found else None
+        for pane in panes:
+            if str(pane.get("title") or "").startswith(marker):
+                return str(pane.get("pane_id"))
+        return None
+
+
 def get_pane_id_from_session(session_data: dict) -> Optional[str]:
     terminal = session_data.get("terminal", "tmux")
     if terminal == "wezterm":
@@ -0,0 +1,189 @@
+"""
+tool_cache.py - Persisted tool discovery shared by `cq`, `ask`, `ping` and `cq-mounted`.
+
+Looking up `tmux`/`wezterm`/`claude` on PATH, probing the WSL WezTerm install locations and
+running `git log -1` for the version banner give the same answers on almost every invocation.
+Results are kept in `~/.cache/cq/tools.json` and re-validated with a few stats:
+
+  - `which(name)`: valid while PATH is unchanged, the binary's mtime is unchanged and no PATH
+    directory before it has changed (so nothing new can shadow it). Misses are not cached, so a
+    freshly installed tool is picked up immediately.
+  - `probe(key, ...)`: a found path is valid while it still exists; a miss is cached for a TTL.
+  - `git_info(install_dir)`: valid while the install dir and `.git` HEAD/ref mtimes are unchanged.
+
+Set `CQ_TOOL_CACHE=0` to bypass the persisted cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from cli_output import atomic_write_text
+
+CACHE_VERSION = 1
+DEFAULT_MISS_TTL_S = 24 * 3600.0
+
+_DATA: Optional[dict] = None
+_DIRTY = False
+_MEMO: Dict[str, str] = {}
+
+
+def _enabled() -> bool:
+    return (os.environ.get("CQ_TOOL_CACHE") or "").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _cache_path() -> Path:
+    return Path.home() / ".cache" / "cq" / "tools.json"
+
+
+def _mtime_ns(path: str | Path) -> int:
+    try:
+        return int(os.stat(path).st_mtime_ns)
+    except OSError:
+        return -1
+
+
+def _load() -> dict:
+    global _DATA
+    if _DATA is None:
+        data: dict = {}
+        if _enabled():
+            try:
+                raw = json.loads(_cache_path().read_text(encoding="utf-8"))
+                if isinstance(raw, dict) and raw.get("version") == CACHE_VERSION:
+                    data = raw
+            except Exception:
+                data = {}
+        data.setdefault("which", {})
+        data.setdefault("probe", {})
+        data.setdefault("git", {})
+        _DATA = data
+    return _DATA
+
+
+def _put(section: str, key: str, entry: dict) -> None:
+    global _DIRTY
+    _load()[section][key] = entry
+    _DIRTY = True
+    save()
+
+
+def save() -> None:
+    global _DIRTY
+    if not _DIRTY or not _enabled() or _DATA is None:
+        return
+    payload = dict(_DATA)
+    payload["version"] = CACHE_VERSION
+    try:
+        atomic_write_text(_cache_path(), json.dumps(payload, ensure_ascii=False))
+        _DIRTY = False
+    except Exception:
+        pass
+
+
+def clear_memory() -> None:
+    """Drop in-process state (tests, or after changing PATH/HOME)."""
+    global _DATA, _DIRTY
+    _DATA = None
+    _DIRTY = False
+    _MEMO.clear()
+
+
+def _path_dirs() -> List[str]:
+    return [d for d in (os.environ.get("PATH") or "").split(os.pathsep) if d]
+
+
+def which(name: str) -> Optional[str]:
+    """`shutil.which(name)` backed by the persisted cache (hits only)."""
+    path_env = os.environ.get("PATH") or ""
+    memo_key = f"{path_env}\0{name}"
+    hit = _MEMO.get(memo_key)
+    if hit:
+        return hit
+
+    entries = _load()["which"]
+    entry = entries.get(name) if _enabled() else None
+    if isinstance(entry, dict) and entry.get("path_env") == path_env:
+        found = str(entry.get("found") or "")
+        shadow = entry.get("shadow_dirs") or {}
+        if (
+            found
+            and _mtime_ns(found) == entry.get("mtime_ns")
+            and all(_mtime_ns(d) == m for d, m in shadow.items())
+        ):
+            _MEMO[memo_key] = found
+            return found
+
+    found = shutil.which(name)
+    if not found:
+        return None
+    _MEMO[memo_key] = found
+    mtime = _mtime_ns(found)
+    if mtime < 0:
+        return found
+    # PATH directories searched before the hit; a new binary in any of them would shadow it.
+    found_dir = os.path.dirname(found)
+    shadow_dirs: Dict[str, int] = {}
+    for d in _path_dirs():
+        if os.path.normpath(d) == os.path.normpath(found_dir):
+            break
+        shadow_dirs[d] = _mtime_ns(d)
+    _put("which", name, {"path_env": path_env, "found": found, "mtime_ns": mtime, "shadow_dirs": shadow_dirs})
+    return found
+
+
+def probe(key: str, compute: Callable[[], Optional[str]], *, miss_ttl_s: float = DEFAULT_MISS_TTL_S) -> Optional[str]:
+    """Cache the result of an expensive filesystem probe that returns a path (or None)."""
+    entry = _load()["probe"].get(key) if _enabled() else None
+    now = time.time()
+    if isinstance(entry, dict):
+        found = entry.get("found")
+        if found and os.path.exists(found):
+            return str(found)
+        if not found and now - float(entry.get("checked_at") or 0) < miss_ttl_s:
+            return None
+    found = compute()
+    _put("probe", key, {"found": found or "", "checked_at": now})
+    return found
+
+
+def _git_fingerprint(install_dir: Path) -> List[int]:
+    git_dir = install_dir / ".git"
+    parts = [_mtime_ns(install_dir), _mtime_ns(git_dir / "HEAD"), _mtime_ns(git_dir / "packed-refs")]
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except Exception:
+        head = ""
+    if head.startswith("ref:"):
+        parts.append(_mtime_ns(git_dir / head[4:].strip()))
+    return parts
+
+
+def git_info(install_dir: Path) -> str:
+    """`git log -1 --format='%h %ci'` for the install dir, cached until HEAD moves."""
+    install_dir = Path(install_dir)
+    key = str(install_dir)
+    fingerprint = _git_fingerprint(install_dir)
+    entry = _load()["git"].get(key) if _enabled() else None
+    if isinstance(entry, dict) and entry.get("fingerprint") == fingerprint:
+        return str(entry.get("info") or "")
+
+    info = ""
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(install_dir), "log", "-1", "--format=%h %ci"],
+            capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=2,
+        )
+        if result.returncode == 0:
+            info = result.stdout.strip()
+    except Exception:
+        # Transient failure (e.g. git missing or timed out): do not cache.
+        return ""
+    _put("git", key, {"fingerprint": fingerprint, "info": info})
+    return info
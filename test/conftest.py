@@ -3,9 +3,21 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import pytest
+
 
 def pytest_configure() -> None:
     repo_root = Path(__file__).resolve().parents[1]
     lib_dir = repo_root / "lib"
     sys.path.insert(0, str(lib_dir))
 
+
+@pytest.fixture(autouse=True)
+def _isolated_user_state(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Nothing a test runs may touch (or garbage-collect) the developer's real ~/.cq / ~/.cache/cq.
+    home = tmp_path_factory.mktemp("home")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    for name in ("XDG_RUNTIME_DIR", "XDG_CACHE_HOME", "CQ_CACHE_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("CQ_HOUSEKEEPING", "0")
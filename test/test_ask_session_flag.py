@@ -16,6 +16,12 @@ def _load_ask_module(repo_root: Path):
     return module
 
 
+@pytest.fixture(autouse=True)
+def _home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+
+
 def test_ask_passes_session_flag_to_loader(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
     repo_root = Path(__file__).resolve().parents[1]
     ask = _load_ask_module(repo_root)
@@ -100,3 +106,148 @@ def test_ask_rejects_invalid_session_flag(tmp_path: Path, monkeypatch: pytest.Mo
     assert rc == ask.EXIT_ERROR
     err = capsys.readouterr().err
     assert "Invalid --session" in err
+
+
+def test_ask_skips_pane_probe_when_sandboxed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    ask = _load_ask_module(repo_root)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CQ_SANDBOXED", "1")
+
+    sent: dict[str, str] = {}
+
+    class _Backend:
+        def send_text(self, pane_id: str, text: str) -> None:
+            sent["pane_id"] = pane_id
+
+    class _Session:
+        pane_id = "%7"
+
+        def ensure_pane(self):
+            raise AssertionError("pane probe must be skipped in a sandbox")
+
+        def backend(self):
+            return _Backend()
+
+    monkeypatch.setattr(ask, "load_codex_session", lambda work_dir, *, session=None, env=None: _Session())
+
+    rc = ask.main(["ask", "codex", "--req-id", "abc", "hello"])
+    assert rc == ask.EXIT_OK
+    captured = capsys.readouterr()
+    assert captured.out.strip() == "abc"
+    assert "without verifying" in captured.err
+    assert sent["pane_id"] == "%7"
+
+
+def test_ask_envelope_flag_frames_payload(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    ask = _load_ask_module(repo_root)
+    from cq_protocol import decode_envelope
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("CQ_SANDBOXED", raising=False)
+    sent: dict[str, str] = {}
+
+    class _Backend:
+        def send_text(self, pane_id: str, text: str) -> None:
+            sent["text"] = text
+
+    class _Session:
+        def ensure_pane(self):
+            return True, "pane-1"
+
+        def backend(self):
+            return _Backend()
+
+    monkeypatch.setattr(ask, "load_codex_session", lambda work_dir, *, session=None, env=None: _Session())
+    monkeypatch.setattr(ask.sandbox_probe, "is_sandboxed", lambda env=None: False)
+
+    rc = ask.main(["ask", "codex", "--envelope", "--reply-to", "abc", "--caller", "claude", "done"])
+    assert rc == ask.EXIT_OK
+    env = decode_envelope(sent["text"])
+    assert env is not None and env.verified
+    assert (env.kind, env.msg_id, env.from_provider) == ("reply", "abc", "claude")
+
+
+def test_ask_records_request_and_reply_in_ledger(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    ask = _load_ask_module(repo_root)
+    import request_ledger
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("CQ_SESSION", raising=False)
+
+    class _Backend:
+        def send_text(self, pane_id: str, text: str) -> None:
+            pass
+
+    class _Session:
+        def ensure_pane(self):
+            return True, "pane-1"
+
+        def backend(self):
+            return _Backend()
+
+    monkeypatch.setattr(ask, "load_codex_session", lambda work_dir, *, session=None, env=None: _Session())
+    monkeypatch.setattr(ask, "load_claude_session", lambda work_dir, *, session=None, env=None: _Session())
+    monkeypatch.setattr(ask.sandbox_probe, "is_sandboxed", lambda env=None: False)
+
+    assert ask.main(["ask", "codex", "--req-id", "r1", "--caller", "claude", "question"]) == ask.EXIT_OK
+    assert ask.main(["ask", "claude", "--reply-to", "r1", "--caller", "codex", "answer"]) == ask.EXIT_OK
+
+    entries = request_ledger.load(request_ledger.ledger_path(Path.cwd()))
+    assert [(e["ev"], e["req_id"], e["from"], e["to"]) for e in entries] == [
+        ("req", "r1", "claude", "codex"),
+        ("reply", "r1", "codex", "claude"),
+    ]
+    assert entries[0]["bytes"] == len("question") and entries[0]["session"] == "default"
+
+
+def test_ask_skips_exact_duplicate_delivery_unless_forced(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    ask = _load_ask_module(repo_root)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("CQ_DEDUPE", raising=False)
+    sent: list[tuple[str, str]] = []
+
+    class _Backend:
+        def send_text(self, pane_id: str, text: str) -> None:
+            sent.append((pane_id, text))
+
+    class _Session:
+        terminal = "tmux"
+        pane = "%1"
+
+        def ensure_pane(self):
+            return True, self.pane
+
+        def backend(self):
+            return _Backend()
+
+    target = _Session()
+    monkeypatch.setattr(ask, "load_codex_session", lambda work_dir, *, session=None, env=None: target)
+    monkeypatch.setattr(ask.sandbox_probe, "is_sandboxed", lambda env=None: False)
+
+    def _ask(*extra: str) -> int:
+        return ask.main(["ask", "codex", "--req-id", "r1", *extra, "same body"])
+
+    assert _ask() == ask.EXIT_OK
+    assert _ask() == ask.EXIT_OK
+    captured = capsys.readouterr()
+    assert captured.out.split() == ["r1", "r1"]
+    assert "already delivered" in captured.err
+    assert len(sent) == 1
+
+    assert _ask("--force") == ask.EXIT_OK
+    assert ask.main(["ask", "codex", "--req-id", "r1", "different body"]) == ask.EXIT_OK
+    target.pane = "%2"  # another pane has its own record
+    assert _ask() == ask.EXIT_OK
+    assert [p for p, _ in sent] == ["%1", "%1", "%1", "%2"]
+
+    # Skipped duplicates are not recorded in the ledger.
+    import request_ledger
+
+    entries = request_ledger.load(request_ledger.ledger_path(Path.cwd()))
+    assert len(entries) == 4
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+import claude_history
+
+
+def _transcript(project_dir: Path, sid: str, *, mtime: float, body: str = "{}\n", env: bool = True) -> Path:
+    project_dir.mkdir(parents=True, exist_ok=True)
+    path = project_dir / f"{sid}.jsonl"
+    path.write_text(body, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    if env:
+        env_dir = Path.home() / ".claude" / "session-env" / sid
+        env_dir.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def test_find_latest_claude_session_prefers_newest_resumable(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    work_dir = tmp_path / "repo"
+    project_dir = tmp_path / ".claude" / "projects" / "repo"
+    old, new, empty = (str(uuid.uuid4()) for _ in range(3))
+    _transcript(project_dir, old, mtime=1000)
+    _transcript(project_dir, new, mtime=2000)
+    _transcript(project_dir, empty, mtime=3000, body="")
+    _transcript(project_dir, str(uuid.uuid4()), mtime=4000, env=False)
+    _transcript(project_dir, "not-a-uuid", mtime=5000)
+
+    sid, has_history, cwd = claude_history.find_latest_claude_session([(work_dir, project_dir)])
+    assert (sid, has_history, cwd) == (new, True, work_dir)
+
+    missing = tmp_path / ".claude" / "projects" / "none"
+    assert claude_history.find_latest_claude_session([(work_dir, missing)]) == (None, False, None)
+
+
+def test_find_latest_claude_session_uses_cache_until_dir_changes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    work_dir = tmp_path / "repo"
+    project_dir = tmp_path / ".claude" / "projects" / "repo"
+    first = str(uuid.uuid4())
+    _transcript(project_dir, first, mtime=1000)
+
+    assert claude_history.find_latest_claude_session([(work_dir, project_dir)])[0] == first
+
+    scans: list[Path] = []
+    real = claude_history.summarize_project_dir
+    monkeypatch.setattr(claude_history, "summarize_project_dir", lambda d, env: scans.append(d) or real(d, env))
+
+    assert claude_history.find_latest_claude_session([(work_dir, project_dir)])[0] == first
+    assert scans == []
+
+    # A new transcript changes the directory mtime and invalidates the cached summary.
+    second = str(uuid.uuid4())
+    _transcript(project_dir, second, mtime=2000)
+    os.utime(project_dir, ns=(0, project_dir.stat().st_mtime_ns + 1_000_000))
+    assert claude_history.find_latest_claude_session([(work_dir, project_dir)])[0] == second
+    assert scans == [project_dir]
@@ -124,3 +124,49 @@ def test_resolve_claude_session_defaults_to_default_session(tmp_path: Path, monk
     resolved = resolve_claude_session(work_dir, env={})
     assert resolved is not None
     assert resolved.data.get("pane_id") == "%default"
+
+
+def test_resolve_claude_session_probes_backend_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    created: list[dict] = []
+
+    def _backend(rec: dict) -> _FakeBackend:
+        created.append(rec)
+        return _FakeBackend(alive={"%old"})
+
+    monkeypatch.setattr(session_registry, "get_backend_for_session", _backend)
+
+    work_dir = tmp_path / "repo"
+    work_dir.mkdir()
+    (work_dir / ".cq_config").mkdir()
+    pid = compute_cq_project_id(work_dir)
+    now = int(time.time())
+
+    for idx, pane in enumerate(("%old", "%dead1", "%dead2")):
+        _write_registry_file(
+            tmp_path,
+            f"s{idx}",
+            {
+                "cq_session_id": f"s{idx}",
+                "cq_project_id": pid,
+                "work_dir": str(work_dir),
+                "terminal": "tmux",
+                "updated_at": now - (3 - idx),
+                "providers": {"claude": {"pane_id": pane}},
+            },
+        )
+
+    resolved = resolve_claude_session(work_dir, env={})
+    assert resolved is not None
+    assert resolved.source == "registry:project"
+    assert resolved.data.get("pane_id") == "%old"
+    assert len(created) == 1
+
+    # A session id from the environment wins without probing any pane.
+    created.clear()
+    via_env = resolve_claude_session(work_dir, env={"CQ_SESSION_ID": "s2"})
+    assert via_env is not None
+    assert via_env.source == "registry:CQ_SESSION_ID"
+    assert via_env.data.get("pane_id") == "%dead2"
+    assert created == []
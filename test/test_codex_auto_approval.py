@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import codex_auto_approval as caa
+
+CWD = "/work/repo"
+HEADER = '[projects."/work/repo"]'
+
+
+def test_appends_project_table_when_missing() -> None:
+    text, changed = caa.apply_auto_approval('model = "o3"\n', CWD)
+    assert changed
+    assert text == "\n".join(['model = "o3"', "", HEADER, caa.CQ_BEGIN, *caa.DESIRED, caa.CQ_END]) + "\n"
+
+
+def test_adds_missing_keys_inside_existing_table() -> None:
+    original = "\n".join([HEADER, 'trust_level = "trusted"', "", "[other]", "x = 1", ""])
+    text, changed = caa.apply_auto_approval(original, CWD)
+    assert changed
+    assert text == "\n".join(
+        [
+            HEADER,
+            'trust_level = "trusted"',
+            "",
+            caa.CQ_BEGIN,
+            'approval_policy = "never"',
+            'sandbox_mode = "danger-full-access"',
+            caa.CQ_END,
+            "",
+            "[other]",
+            "x = 1",
+            "",
+        ]
+    )
+    # Applying again is a no-op.
+    assert caa.apply_auto_approval(text, CWD) == (text, False)
+
+
+def test_wraps_existing_keys_dedupes_and_migrates() -> None:
+    original = "\n".join(
+        [
+            HEADER,
+            'sandbox_mode = "full-auto"',
+            "",
+            "[projects.'/work/other']",
+            "trust_level = 'trusted'",
+            HEADER,
+            'trust_level = "trusted"',
+            'approval_policy = "never"',
+            'sandbox_mode = "full-auto"',
+            "",
+        ]
+    )
+    text, changed = caa.apply_auto_approval(original, CWD)
+    assert changed
+    assert text.count(HEADER) == 1
+    assert "full-auto" not in text
+    assert "[projects.'/work/other']" in text
+    sections = [s for s in caa.index_sections(text) if s.project_key == CWD]
+    assert [ln.strip() for ln in sections[0].body[:5]] == [caa.CQ_BEGIN, *caa.DESIRED, caa.CQ_END]
+
+
+def test_replaces_differently_quoted_table() -> None:
+    original = "[projects.'/work/repo']\ntrust_level = \"trusted\"\n"
+    text, changed = caa.apply_auto_approval(original, CWD)
+    assert changed
+    assert "[projects.'/work/repo']" not in text
+    assert text.startswith(HEADER)
+
+
+def test_fingerprint_skips_unchanged_config(tmp_path: Path, monkeypatch) -> None:
+    config = tmp_path / "config.toml"
+    state = tmp_path / "state" / "codex-auto-approval.json"
+    config.write_text('model = "o3"\n', encoding="utf-8")
+
+    assert caa.ensure_auto_approval(CWD, state_path=state, config_path=config) == "updated"
+    written = config.read_text(encoding="utf-8")
+    assert HEADER in written
+
+    reads: list[Path] = []
+    real_read_bytes = Path.read_bytes
+
+    def _read_bytes(self: Path) -> bytes:
+        reads.append(self)
+        return real_read_bytes(self)
+
+    monkeypatch.setattr(Path, "read_bytes", _read_bytes)
+    assert caa.ensure_auto_approval(CWD, state_path=state, config_path=config) == "skipped"
+    assert reads == []
+
+    # A touch without content changes is confirmed by hash and re-fingerprinted.
+    st = config.stat()
+    os.utime(config, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert caa.ensure_auto_approval(CWD, state_path=state, config_path=config) == "skipped"
+    assert reads == [config]
+    assert caa.ensure_auto_approval(CWD, state_path=state, config_path=config) == "skipped"
+    assert reads == [config]
+
+    # Another project (or an edited config) is verified again.
+    assert caa.ensure_auto_approval("/work/other", state_path=state, config_path=config) == "updated"
+    config.write_text(written, encoding="utf-8")
+    assert caa.ensure_auto_approval(CWD, state_path=state, config_path=config) in ("ok", "skipped")
+    assert caa.ensure_auto_approval(CWD, state_path=state, config_path=tmp_path / "missing.toml") == "missing"
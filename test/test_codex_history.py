@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import codex_history
+
+
+def _write_log(path: Path, *, sid: str, cwd: str, mtime: float) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {"type": "session_meta", "payload": {"id": sid, "cwd": cwd}}
+    path.write_text(json.dumps(meta) + "\n" + json.dumps({"type": "message"}) + "\n", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_find_latest_session_picks_newest_matching_log(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    root = tmp_path / ".codex" / "sessions"
+    project = tmp_path / "repo"
+    _write_log(root / "2025" / "01" / "01" / "a.jsonl", sid="old", cwd=str(project), mtime=1000)
+    _write_log(root / "2025" / "01" / "02" / "b.jsonl", sid="new", cwd=str(project / "sub"), mtime=2000)
+    _write_log(root / "2025" / "01" / "03" / "c.jsonl", sid="other", cwd=str(tmp_path / "elsewhere"), mtime=3000)
+
+    def match(cwd_norm: str) -> bool:
+        return cwd_norm == str(project) or cwd_norm.startswith(str(project) + "/")
+
+    latest = codex_history.find_latest_session(match, root=root)
+    assert latest is not None
+    assert latest.session_id == "new"
+    assert latest.path.endswith("b.jsonl")
+
+
+def test_find_latest_session_reuses_index_for_unchanged_logs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    root = tmp_path / ".codex" / "sessions"
+    project = tmp_path / "repo"
+    log = _write_log(root / "2025" / "01" / "01" / "a.jsonl", sid="s1", cwd=str(project), mtime=1000)
+
+    assert codex_history.find_latest_session(lambda c: c == str(project), root=root).session_id == "s1"
+    index_file = tmp_path / ".cache" / "cq" / "codex-session-index.json"
+    assert str(log) in json.loads(index_file.read_text(encoding="utf-8"))["files"]
+
+    reads: list[Path] = []
+    real_read = codex_history.read_session_meta
+    monkeypatch.setattr(codex_history, "read_session_meta", lambda p: reads.append(p) or real_read(p))
+
+    # Appending to a log keeps its cached session_meta valid.
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps({"type": "message"}) + "\n")
+    assert codex_history.find_latest_session(lambda c: c == str(project), root=root).session_id == "s1"
+    assert reads == []
+
+    # A new log is read once and then indexed.
+    _write_log(root / "2025" / "01" / "02" / "b.jsonl", sid="s2", cwd=str(project), mtime=time.time() + 60)
+    assert codex_history.find_latest_session(lambda c: c == str(project), root=root).session_id == "s2"
+    assert len(reads) == 1
+
+
+def test_iter_logs_newest_first_walks_date_partitions_in_order(tmp_path: Path) -> None:
+    root = tmp_path / "sessions"
+    _write_log(root / "2024" / "12" / "31" / "a.jsonl", sid="a", cwd="/x", mtime=1000)
+    _write_log(root / "2025" / "01" / "02" / "b.jsonl", sid="b", cwd="/x", mtime=2000)
+    _write_log(root / "2025" / "01" / "02" / "c.jsonl", sid="c", cwd="/x", mtime=3000)
+    _write_log(root / "2025" / "01" / "10" / "d.jsonl", sid="d", cwd="/x", mtime=1500)
+
+    names = [p.name for p, _ in codex_history.iter_logs_newest_first(root)]
+    assert names == ["d.jsonl", "c.jsonl", "b.jsonl", "a.jsonl"]
+
+
+def test_find_latest_session_stops_at_first_match(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    root = tmp_path / ".codex" / "sessions"
+    for day in range(1, 21):
+        _write_log(root / "2025" / "01" / f"{day:02d}" / "log.jsonl", sid=f"s{day}", cwd="/repo", mtime=1000 + day)
+
+    reads: list[Path] = []
+    real_read = codex_history.read_session_meta
+    monkeypatch.setattr(codex_history, "read_session_meta", lambda p: reads.append(p) or real_read(p))
+
+    latest = codex_history.find_latest_session(lambda c: c == "/repo", root=root)
+    assert latest is not None and latest.session_id == "s20"
+    assert len(reads) <= codex_history.READ_BATCH
+
+
+def test_read_session_meta_recovers_fields_from_truncated_head(tmp_path: Path) -> None:
+    log = tmp_path / "big.jsonl"
+    meta = {
+        "timestamp": "2025-01-01T00:00:00Z",
+        "type": "session_meta",
+        "payload": {"id": "sid-1", "cwd": "/repo/./sub", "instructions": "x" * 200_000},
+    }
+    log.write_text(json.dumps(meta) + "\n", encoding="utf-8")
+
+    assert codex_history.read_session_meta(log, max_bytes=4096) == ("sid-1", "/repo/sub")
+    assert codex_history.read_session_meta(tmp_path / "missing.jsonl") is None
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import os
 import re
 import subprocess
 import sys
@@ -49,7 +50,13 @@ def test_cq_mounted_reports_session(tmp_path: Path) -> None:
         ],
         capture_output=True,
         text=True,
+        # cq-mounted caches its sandbox probe under HOME / XDG_RUNTIME_DIR.
+        env={
+            **{k: v for k, v in os.environ.items() if k != "XDG_RUNTIME_DIR"},
+            "HOME": str(tmp_path / "home"),
+        },
     )
     assert result.returncode == 0
     payload = json.loads(result.stdout)
     assert payload["mounted"] == ["codex"]
+    assert (tmp_path / "home" / ".cache" / "cq" / "sandbox-probe.json").exists()
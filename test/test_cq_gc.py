@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import cq_gc
+import process_lock
+from housekeeping import Budget
+from process_lock import ProviderLock
+
+
+@pytest.fixture
+def env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setattr(cq_gc.tempfile, "gettempdir", lambda: str(tmp_path / "tmp"))
+    return home
+
+
+def _age(path: Path, seconds: float) -> None:
+    ts = time.time() - seconds
+    os.utime(path, (ts, ts))
+
+
+def _write_registry(run: Path, sid: str, updated_at: int) -> Path:
+    run.mkdir(parents=True, exist_ok=True)
+    path = run / f"cq-session-{sid}.json"
+    path.write_text(json.dumps({"cq_session_id": sid, "updated_at": updated_at}), encoding="utf-8")
+    return path
+
+
+def test_registry_and_lock_collection(env: Path) -> None:
+    run = env / ".cq" / "run"
+    expired = _write_registry(run, "old", int(time.time()) - 8 * 24 * 3600)
+    fresh = _write_registry(run, "new", int(time.time()))
+
+    idle = run / "codex-deadbeef.lock"
+    idle.write_text("1\n", encoding="utf-8")
+    _age(idle, 2 * 24 * 3600)
+    held = ProviderLock("claude", cwd="/some/project")
+    assert held.try_acquire()
+    _age(held.lock_file, 2 * 24 * 3600)
+    try:
+        dry = cq_gc.run_gc(["registry", "locks"], dry_run=True)
+        assert sorted(Path(a.path).name for a in dry.actions) == sorted([expired.name, idle.name])
+        assert expired.exists() and idle.exists()
+
+        report = cq_gc.run_gc(["registry", "locks"])
+    finally:
+        held.release()
+
+    assert not expired.exists() and not idle.exists()
+    assert fresh.exists() and held.lock_file.exists()
+    assert report.complete == {"registry": True, "locks": True}
+
+
+@pytest.mark.skipif(os.name == "nt", reason="lock queues are POSIX-only")
+def test_lock_queue_is_removed_only_when_idle(env: Path) -> None:
+    run = env / ".cq" / "run"
+    idle = ProviderLock("codex", cwd="/idle")
+    busy = ProviderLock("codex", cwd="/busy")
+    for lock in (idle, busy):
+        assert lock.acquire()
+        lock.release()
+        _age(lock.lock_file, 2 * 24 * 3600)
+    waiter = process_lock._TicketQueue(busy.lock_file)
+    waiter.enter()
+    try:
+        cq_gc.run_gc(["locks"])
+        assert not idle.lock_file.exists() and not (run / f"{idle.lock_file.name}.queue").exists()
+        assert not busy.lock_file.exists() and waiter.dir.is_dir() and waiter.ticket.exists()
+    finally:
+        waiter.leave()
+    # The next user recreates both the lock file and its queue.
+    assert idle.acquire()
+    assert idle.lock_file.read_text().strip() == str(os.getpid())
+    idle.release()
+
+
+def test_runtime_dirs_and_crash_logs(env: Path, tmp_path: Path) -> None:
+    base = cq_gc.runtime_base_dir()
+    stale = base / "ai-1-1"
+    (stale / "codex").mkdir(parents=True)
+    (stale / "codex" / "codex.pid").write_text("999999999\n", encoding="utf-8")
+    live = base / "ai-2-2"
+    (live / "codex").mkdir(parents=True)
+    (live / "codex" / "codex.pid").write_text(f"{os.getpid()}\n", encoding="utf-8")
+    old_log = live / "codex" / "pane-crash-1.log"
+    old_log.write_text("boom", encoding="utf-8")
+    _age(old_log, 8 * 24 * 3600)
+    new_log = live / "codex" / "pane-crash-2.log"
+    new_log.write_text("boom", encoding="utf-8")
+    for d in (stale, live):
+        _age(d, 2 * 24 * 3600)
+
+    report = cq_gc.run_gc(["runtime"])
+
+    assert not stale.exists()
+    assert live.exists() and new_log.exists() and not old_log.exists()
+    assert {a.reason for a in report.actions} == {"stale runtime dir", "old crash log"}
+
+
+def test_session_dirs_skip_recent_and_locked(env: Path, tmp_path: Path) -> None:
+    work = tmp_path / "proj"
+    sessions = work / ".cq_config" / "sessions"
+    for name in ("old", "busy", "recent"):
+        (sessions / name).mkdir(parents=True)
+        (sessions / name / ".codex-session").write_text("{}", encoding="utf-8")
+    for name in ("old", "busy"):
+        _age(sessions / name / ".codex-session", 40 * 24 * 3600)
+        _age(sessions / name, 40 * 24 * 3600)
+
+    lock = ProviderLock("cq", timeout=0.1, cwd=f"{work.resolve()}::busy")
+    assert lock.try_acquire()
+    try:
+        cq_gc.run_gc(["sessions"], work_dir=work)
+    finally:
+        lock.release()
+
+    assert not (sessions / "old").exists()
+    assert (sessions / "busy").exists() and (sessions / "recent").exists()
+
+
+def test_budget_limited_walk_resumes_from_cursor(env: Path) -> None:
+    run = env / ".cq" / "run"
+    old = int(time.time()) - 8 * 24 * 3600
+    paths = [_write_registry(run, f"s{i}", old) for i in range(5)]
+
+    first = cq_gc.run_gc(["registry"], budget=Budget(30, max_ops=2))
+    assert first.scanned["registry"] == 2 and first.complete["registry"] is False
+    assert [p.exists() for p in paths] == [False, False, True, True, True]
+
+    # Dry runs report from the cursor but do not advance it.
+    cq_gc.run_gc(["registry"], dry_run=True, budget=Budget(30, max_ops=1))
+    second = cq_gc.run_gc(["registry"], budget=Budget(30, max_ops=2))
+    assert [Path(a.path).name for a in second.actions] == [paths[2].name, paths[3].name]
+
+    third = cq_gc.run_gc(["registry"])
+    assert third.complete["registry"] is True
+    assert not any(p.exists() for p in paths)
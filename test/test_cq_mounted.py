@@ -211,3 +211,130 @@ def test_cq_mounted_rejects_invalid_session_flag(tmp_path, monkeypatch, capsys)
     assert rc == 2
     err = capsys.readouterr().err
     assert "Invalid --session" in err
+
+
+def test_cq_mounted_all_sessions_uses_one_listing_per_backend(tmp_path, monkeypatch, capsys) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    cq_mounted = _load_cq_mounted_module(repo_root)
+
+    work_dir = tmp_path / "repo"
+    config = work_dir / ".cq_config"
+    files = {
+        config / ".codex-session": {"terminal": "tmux", "pane_id": "%1"},
+        config / ".claude-session": {"terminal": "wezterm", "pane_id": "7"},
+    }
+    for i in range(5):
+        files[config / "sessions" / f"s{i}" / ".codex-session"] = {"terminal": "tmux", "pane_id": f"%{10 + i}"}
+        files[config / "sessions" / f"s{i}" / ".claude-session"] = {"terminal": "wezterm", "pane_id": str(20 + i)}
+    for path, data in files.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data), encoding="utf-8")
+
+    listings: dict[str, int] = {}
+    reads: list[str] = []
+
+    class _FakeBackend:
+        last_list_error = None
+
+        def __init__(self, terminal: str):
+            self.terminal = terminal
+
+        def list_pane_states(self):
+            listings[self.terminal] = listings.get(self.terminal, 0) + 1
+            live = {"tmux": ["%1", "%10", "%12"], "wezterm": ["7", "21"]}[self.terminal]
+            return [{"pane_id": p, "title": "", "alive": True} for p in live]
+
+        def is_alive(self, pane_id):
+            raise AssertionError("per-pane probes should not be needed")
+
+    real_read_text = Path.read_text
+
+    def _read_text(self, *args, **kwargs):
+        if self.name.endswith("-session"):
+            reads.append(str(self))
+        return real_read_text(self, *args, **kwargs)
+
+    monkeypatch.delenv("CQ_SESSION", raising=False)
+    monkeypatch.setattr(Path, "read_text", _read_text)
+    monkeypatch.setattr(cq_mounted, "can_connect_localhost", lambda: True)
+    monkeypatch.setattr(cq_mounted, "get_backend_for_session", lambda data: _FakeBackend(data.get("terminal", "tmux")))
+
+    monkeypatch.setattr(cq_mounted.sys, "argv", ["cq-mounted", str(work_dir), "--json", "--all-sessions"])
+    cq_mounted.main()
+
+    payload = json.loads(capsys.readouterr().out.strip())
+    mounted = {s["session"]: s["mounted"] for s in payload["sessions"]}
+    assert mounted == {
+        "default": ["codex", "claude"],
+        "s0": ["codex"],
+        "s1": ["claude"],
+        "s2": ["codex"],
+        "s3": [],
+        "s4": [],
+    }
+    assert listings == {"tmux": 1, "wezterm": 1}
+    assert sorted(reads) == sorted(str(p) for p in files)
+
+
+def test_cq_mounted_watch_streams_changes(tmp_path, monkeypatch) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    cq_mounted = _load_cq_mounted_module(repo_root)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("CQ_SESSION", raising=False)
+
+    work_dir = tmp_path / "repo"
+    cfg = work_dir / ".cq_config"
+    cfg.mkdir(parents=True)
+    (cfg / ".codex-session").write_text(json.dumps({"active": True, "pane_id": "%1"}), encoding="utf-8")
+    alive = {"%1": True, "%2": True}
+    monkeypatch.setattr(cq_mounted, "pane_alive_for_session", lambda data: alive.get(data.get("pane_id")))
+
+    def _write_claude() -> None:
+        (cfg / ".claude-session").write_text(json.dumps({"active": True, "pane_id": "%2"}), encoding="utf-8")
+
+    def _add_session() -> None:
+        (cfg / "sessions" / "feat").mkdir(parents=True)
+        (cfg / "sessions" / "feat" / ".codex-session").write_text(json.dumps({"pane_id": "%1"}), encoding="utf-8")
+
+    def _kill_codex_pane() -> None:
+        alive["%1"] = False
+
+    class _Watcher:
+        def __init__(self) -> None:
+            self.steps = [_write_claude, _add_session, _kill_codex_pane]
+            self.synced: list = []
+
+        def sync(self, specs) -> None:
+            self.synced = [Path(s[0]) for s in specs]
+
+        def wait(self, timeout):
+            self.steps.pop(0)()
+            return True
+
+        def close(self) -> None:
+            pass
+
+    events: list[dict] = []
+    watcher = _Watcher()
+    rc = cq_mounted.watch(
+        work_dir,
+        sessions=lambda: cq_mounted._iter_sessions(work_dir),
+        include_inactive=False,
+        sandboxed=False,
+        emit=events.append,
+        watcher=watcher,
+        max_cycles=4,
+    )
+    assert rc == 0
+    assert all("ts" in ev for ev in events)
+    assert [(ev["event"], ev["session"], ev.get("provider")) for ev in events] == [
+        ("session_added", "default", None),
+        ("mounted", "default", "codex"),
+        ("mounted", "default", "claude"),
+        ("session_added", "feat", None),
+        ("mounted", "feat", "codex"),
+        ("unmounted", "default", "codex"),
+        ("unmounted", "feat", "codex"),
+    ]
+    assert cfg / "sessions" / "feat" in watcher.synced
+    assert tmp_path / ".cq" / "run" in watcher.synced
@@ -36,3 +36,79 @@ def test_wrap_reply_payload_structure() -> None:
     assert payload.startswith(f"{REPLY_PREFIX} abc123\n{FROM_PREFIX} codex\n")
     assert "[CQ_RESULT] No reply required.\n\n" in payload
     assert payload.endswith("hello\nworld\n")
+
+
+def test_envelope_round_trip_with_trailer() -> None:
+    from cq_protocol import ENVELOPE_PREFIX, decode_envelope, encode_envelope
+
+    body = wrap_request_prompt("héllo\r\nworld  \n", "abc123")
+    framed = encode_envelope(body, kind="req", msg_id="abc123")
+    assert framed.startswith(f"{ENVELOPE_PREFIX} v2 kind=req id=abc123 len=")
+    # The v1 headers are still there for readers that ignore the envelope.
+    assert f"\n{REQ_ID_PREFIX} abc123\n" in framed
+
+    env = decode_envelope("noise\n" + framed.rstrip() + "\nHARNESS_DONE\n")
+    assert env is not None and env.verified
+    assert (env.kind, env.msg_id, env.parts) == ("req", "abc123", 1)
+    assert env.body.endswith("héllo\nworld")
+    assert env.trailer == "HARNESS_DONE"
+
+
+def test_envelope_detects_truncation_and_corruption() -> None:
+    from cq_protocol import decode_envelope, encode_envelope
+
+    framed = encode_envelope("x" * 100, kind="reply", msg_id="r1", from_provider="codex")
+    cut = decode_envelope(framed[:-20])
+    assert cut is not None and cut.truncated and not cut.verified
+    bad = decode_envelope(framed.replace("xxxx", "xxyx", 1))
+    assert bad is not None and bad.complete and not bad.verified
+    assert bad.from_provider == "codex"
+    assert decode_envelope("CQ_REQ_ID: abc\n\nplain v1") is None
+
+
+def test_incremental_parser_and_parts() -> None:
+    from cq_protocol import EnvelopeParser, encode_parts, join_parts
+
+    message = "première ligne\n" + "données " * 200
+    frames = encode_parts(message, kind="req", msg_id="m1", max_bytes=97)
+    assert len(frames) > 5
+
+    stream = "prompt> \n".join(frames)
+    parser = EnvelopeParser()
+    got = []
+    for i in range(0, len(stream.encode("utf-8")), 13):
+        got.extend(parser.feed(stream.encode("utf-8")[i : i + 13]))
+    assert parser.finish() is None
+    assert [env.part for env in got] == list(range(1, len(frames) + 1))
+    assert all(env.length <= 97 for env in got)
+    assert join_parts(got) == message.rstrip()
+    assert join_parts(got[:-1]) is None
+
+    parser = EnvelopeParser()
+    assert parser.feed(frames[0][:-10]) == []
+    pending = parser.finish()
+    assert pending is not None and pending.truncated
+
+
+def test_parser_ignores_mid_line_marker_split_across_feeds() -> None:
+    from cq_protocol import EnvelopeParser, encode_envelope
+
+    framed = encode_envelope("hello", kind="req", msg_id="q1")
+    parser = EnvelopeParser()
+    # All but the ":" of a mid-line marker arrives first; the byte before it gets trimmed away.
+    split = len("CQ_ENVELOPE")
+    assert parser.feed("$ echo " + framed[:split]) == []
+    assert parser.feed(framed[split:]) == []
+    assert parser.feed("\n" + framed)[0].msg_id == "q1"
+
+
+def test_parts_round_trip_through_long_whitespace_runs() -> None:
+    from cq_protocol import decode_envelope, encode_parts, join_parts
+
+    message = "a" + " " * 300 + "b" + "　" * 100 + "c" + " " * 50 + "d\n\n" + "\t" * 90 + "e"
+    frames = encode_parts(message, kind="reply", msg_id="w1", max_bytes=40)
+    got = [decode_envelope(frame) for frame in frames]
+    assert all(env is not None and env.verified and env.body for env in got)
+    # No part ends in whitespace, so the canonical form (rstrip) leaves every part intact.
+    assert all(not env.body[-1].isspace() for env in got)
+    assert join_parts(got) == message
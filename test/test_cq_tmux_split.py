@@ -41,12 +41,44 @@ def test_run_up_sorts_providers_in_tmux(monkeypatch, tmp_path: Path) -> None:
     monkeypatch.setattr(launcher, "_start_claude", lambda: 0)
     monkeypatch.setattr(launcher, "_start_provider_in_current_pane", lambda *_args, **_kwargs: 0)
     monkeypatch.setattr(launcher, "cleanup", lambda: None)
+    monkeypatch.setattr(cq.housekeeping, "maybe_schedule", lambda *_args, **_kwargs: False)
 
     rc = launcher.run_up()
     assert rc == 0
     assert called == ["provider_b", "provider_a"]
 
 
+def test_run_up_warms_up_providers_after_all_panes_exist(monkeypatch, tmp_path: Path) -> None:
+    cq = _load_cq_module()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".cq_config").mkdir(parents=True, exist_ok=True)
+    monkeypatch.setenv("TMUX_PANE", "%0")
+    monkeypatch.setattr(cq, "detect_terminal", lambda: "tmux")
+
+    launcher = cq.AILauncher(providers=["provider_a", "provider_b", "codex"])
+    launcher.terminal_type = "tmux"
+
+    events: list[str] = []
+
+    def _start_provider(p: str, **_kwargs) -> str:
+        events.append(f"start {p}")
+        return f"%{len(events)}"
+
+    def _warmup(p: str, *_args, **_kwargs) -> bool:
+        events.append(f"warmup {p}")
+        return True
+
+    monkeypatch.setattr(launcher, "_start_provider", _start_provider)
+    monkeypatch.setattr(launcher, "_warmup_provider", _warmup)
+    monkeypatch.setattr(launcher, "_start_provider_in_current_pane", lambda *_args, **_kwargs: 0)
+    monkeypatch.setattr(launcher, "cleanup", lambda: None)
+    monkeypatch.setattr(cq.housekeeping, "maybe_schedule", lambda *_args, **_kwargs: False)
+
+    assert launcher.run_up() == 0
+    # A slow warmup no longer sits between two splits.
+    assert events == ["start provider_b", "start provider_a", "warmup provider_b", "warmup provider_a"]
+
+
 def test_start_codex_tmux_writes_session_file(monkeypatch, tmp_path: Path) -> None:
     cq = _load_cq_module()
     monkeypatch.chdir(tmp_path)
@@ -115,11 +147,39 @@ def test_start_codex_tmux_writes_session_file(monkeypatch, tmp_path: Path) -> No
     session_file = tmp_path / ".cq_config" / ".codex-session"
     data = cq.json.loads(session_file.read_text(encoding="utf-8"))
     assert data["pane_id"] == pane_id
+    assert str(runtime / "ready") in data["codex_start_cmd"]
     assert "input_fifo" not in data
     assert "output_fifo" not in data
     assert "tmux_log" not in data
 
 
+def test_warmup_provider_waits_on_ready_file(monkeypatch, tmp_path: Path, capsys) -> None:
+    cq = _load_cq_module()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cq.tempfile, "gettempdir", lambda: str(tmp_path))
+
+    class _AliveBackend:
+        def is_alive(self, pane_id: str) -> bool:
+            return pane_id == "%7"
+
+    monkeypatch.setattr(cq, "TmuxBackend", _AliveBackend)
+
+    def _no_ping(*_args, **_kwargs):
+        raise AssertionError("ping fallback should not run")
+
+    launcher = cq.AILauncher(providers=["codex"])
+    launcher.terminal_type = "tmux"
+    launcher.tmux_panes["codex"] = "%7"
+    monkeypatch.setattr(launcher, "_warmup_provider_ping", _no_ping)
+
+    ready = launcher._reset_ready_file("codex")
+    ready.parent.mkdir(parents=True, exist_ok=True)
+    ready.write_text("123\n", encoding="utf-8")
+
+    assert launcher._warmup_provider("codex", timeout=1.0) is True
+    assert "OK (codex pane %7" in capsys.readouterr().out
+
+
 def test_start_codex_tmux_writes_session_file_session_scoped(monkeypatch, tmp_path: Path) -> None:
     cq = _load_cq_module()
     monkeypatch.chdir(tmp_path)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cq_trace
+
+
+def test_trace_is_noop_when_disabled() -> None:
+    cq_trace.disable()
+    with cq_trace.stage("anything") as st:
+        assert st is None
+    cq_trace.count("x")
+    cq_trace.set_winner("y")
+    assert cq_trace.active() is None
+
+
+def test_trace_records_stage_files_and_subprocesses(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("CQ_EXPLAIN", raising=False)
+    target = tmp_path / "session.json"
+    target.write_text("{}", encoding="utf-8")
+
+    trace = cq_trace.enable("test")
+    try:
+        with cq_trace.stage("resolve"):
+            target.read_text(encoding="utf-8")
+            cq_trace.count("registry_records", 3)
+            with cq_trace.stage("probe"):
+                subprocess.run([sys.executable, "-c", "pass"], check=True)
+        cq_trace.set_winner("registry:project")
+    finally:
+        out = io.StringIO()
+        cq_trace.report(out)
+
+    data = trace.to_dict()
+    resolve, probe = data["stages"][0], data["stages"][1]
+    assert resolve["name"] == "resolve" and resolve["depth"] == 0
+    assert str(target) in resolve["files"]
+    assert resolve["counters"] == {"registry_records": 3}
+    assert probe["depth"] == 1 and len(probe["procs"]) == 1
+    assert data["winner"] == "registry:project"
+
+    text = out.getvalue()
+    assert text.startswith("[EXPLAIN] test")
+    assert "winner: registry:project" in text
+    assert cq_trace.active() is None
+
+
+def test_trace_report_json(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CQ_EXPLAIN", "json")
+    assert cq_trace.env_enabled()
+    cq_trace.enable("json")
+    with cq_trace.stage("s"):
+        pass
+    out = io.StringIO()
+    cq_trace.report(out)
+    payload = json.loads(out.getvalue())
+    assert payload["trace"] == "json"
+    assert payload["stages"][0]["name"] == "s"
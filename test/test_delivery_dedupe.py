@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import delivery_dedupe
+
+
+def test_records_expire_and_are_per_pane(tmp_path: Path) -> None:
+    digest = delivery_dedupe.body_hash("CQ_REQ_ID: r1\n\nhello\n")
+    assert digest == delivery_dedupe.body_hash("CQ_REQ_ID: r1\r\n\r\nhello")
+
+    with delivery_dedupe.PaneDeliveries("tmux-%1", base=tmp_path) as seen:
+        assert seen.find("r1", digest) is None
+        seen.add("r1", digest, kind="req")
+    with delivery_dedupe.PaneDeliveries("tmux-%1", base=tmp_path) as seen:
+        assert seen.find("r1", digest)["kind"] == "req"
+        assert seen.find("r1", delivery_dedupe.body_hash("other")) is None
+    with delivery_dedupe.PaneDeliveries("tmux-%2", base=tmp_path) as seen:
+        assert seen.find("r1", digest) is None
+
+    time.sleep(0.06)
+    with delivery_dedupe.PaneDeliveries("tmux-%1", base=tmp_path, ttl=0.05) as seen:
+        assert seen.find("r1", digest) is None
+
+
+def test_record_path_is_filename_safe(tmp_path: Path) -> None:
+    path = delivery_dedupe.record_path("tmux-%1/../x", base=tmp_path)
+    assert path.parent == tmp_path / "delivered"
+    assert "/" not in path.name and path.name.endswith(".json")
+
+
+def test_disable_switch() -> None:
+    assert delivery_dedupe.enabled({}) is True
+    assert delivery_dedupe.enabled({"CQ_DEDUPE": "0"}) is False
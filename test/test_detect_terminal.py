@@ -15,7 +15,7 @@ def test_detect_terminal_prefers_current_tmux_session(monkeypatch) -> None:
     monkeypatch.setenv("TMUX", "/tmp/tmux-1000/default,123,0")
     monkeypatch.setenv("TMUX_PANE", "%1")
     monkeypatch.setattr(terminal, "_current_tty", lambda: "/dev/pts/7")
-    monkeypatch.setattr(terminal.shutil, "which", lambda name: "/usr/bin/tmux" if name == "tmux" else None)
+    monkeypatch.setattr(terminal.tool_cache, "which", lambda name: "/usr/bin/tmux" if name == "tmux" else None)
 
     def fake_run(*args, **kwargs):
         cmd = args[0]
@@ -53,7 +53,7 @@ def test_detect_terminal_rejects_stale_tmux_env(monkeypatch) -> None:
     monkeypatch.setenv("TMUX", "/tmp/tmux-1000/default,123,0")
     monkeypatch.setenv("TMUX_PANE", "%1")
     monkeypatch.setattr(terminal, "_current_tty", lambda: "/dev/pts/9")
-    monkeypatch.setattr(terminal.shutil, "which", lambda name: "/usr/bin/tmux" if name == "tmux" else None)
+    monkeypatch.setattr(terminal.tool_cache, "which", lambda name: "/usr/bin/tmux" if name == "tmux" else None)
 
     def fake_run(*args, **kwargs):
         cmd = args[0]
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import fs_watch
+
+BACKENDS = ["poll"] + (["inotify"] if fs_watch.inotify_available() else [])
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request) -> str:
+    return request.param
+
+
+def test_wait_reports_changes_and_times_out(tmp_path: Path, backend: str) -> None:
+    watcher = fs_watch.create([tmp_path], poll_interval=0.05, backend=backend)
+    try:
+        assert watcher.kind == backend
+        assert watcher.wait(0.1) is False
+        (tmp_path / "a.json").write_text("{}", encoding="utf-8")
+        assert watcher.wait(2.0) is True
+        assert watcher.wait(0.1) is False
+    finally:
+        watcher.close()
+
+
+def test_filter_ignores_unrelated_names(tmp_path: Path, backend: str) -> None:
+    watcher = fs_watch.create([(tmp_path, lambda name: name.endswith(".json"))], poll_interval=0.05, backend=backend)
+    try:
+        (tmp_path / "x.lock").write_text("1", encoding="utf-8")
+        assert watcher.wait(0.2) is False
+        (tmp_path / "x.json").write_text("1", encoding="utf-8")
+        assert watcher.wait(2.0) is True
+    finally:
+        watcher.close()
+
+
+def test_sync_picks_up_new_directories(tmp_path: Path, backend: str) -> None:
+    sub = tmp_path / "sub"
+    watcher = fs_watch.create([sub], poll_interval=0.05, backend=backend)
+    try:
+        sub.mkdir()
+        watcher.sync([tmp_path, sub])
+        (sub / "f").write_text("1", encoding="utf-8")
+        assert watcher.wait(2.0) is True
+        watcher.sync([tmp_path])
+        assert watcher.wait(0.1) is False
+        (sub / "g").write_text("1", encoding="utf-8")
+        assert watcher.wait(0.2) is False
+    finally:
+        watcher.close()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import time
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import housekeeping
+
+
+def _load_cq_module() -> object:
+    repo_root = Path(__file__).resolve().parents[1]
+    loader = SourceFileLoader("cq_script", str(repo_root / "cq"))
+    spec = importlib.util.spec_from_loader("cq_script", loader)
+    assert spec and spec.loader
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[union-attr]
+    return mod
+
+
+def test_claim_is_rate_limited_by_stamp(tmp_path: Path) -> None:
+    stamp = tmp_path / "cache" / "housekeeping.stamp"
+    assert housekeeping.claim(stamp, interval=600) is True
+    assert stamp.exists()
+    assert housekeeping.claim(stamp, interval=600) is False
+
+    old = time.time() - 601
+    os.utime(stamp, (old, old))
+    assert housekeeping.claim(stamp, interval=600) is True
+
+    # A stamp from the future (clock moved back) does not block forever.
+    future = time.time() + 3600
+    os.utime(stamp, (future, future))
+    assert housekeeping.is_due(stamp, 600) is True
+
+
+def test_maybe_schedule_spawns_once_per_interval(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("CQ_HOUSEKEEPING", raising=False)
+    spawned: list[list[str]] = []
+
+    def _popen(argv, **kwargs):
+        assert kwargs["stdout"] is housekeeping.subprocess.DEVNULL
+        spawned.append(argv)
+
+    monkeypatch.setattr(housekeeping.subprocess, "Popen", _popen)
+    assert housekeeping.maybe_schedule(["worker"]) is True
+    assert housekeeping.maybe_schedule(["worker"]) is False
+    assert spawned == [["worker"]]
+
+    monkeypatch.setenv("CQ_HOUSEKEEPING", "0")
+    assert housekeeping.maybe_schedule(["worker"], force=True) is False
+    assert len(spawned) == 1
+
+
+def test_run_up_does_not_collect_synchronously(monkeypatch, tmp_path: Path) -> None:
+    cq = _load_cq_module()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".cq_config").mkdir(parents=True, exist_ok=True)
+    monkeypatch.setenv("TMUX_PANE", "%0")
+    monkeypatch.setattr(cq, "detect_terminal", lambda: "tmux")
+
+    def _fail(*_args, **_kwargs):
+        raise AssertionError("GC must not run on the launcher path")
+
+    scheduled: list[list[str]] = []
+    monkeypatch.setattr(cq, "_cleanup_tmpclaude_artifacts", _fail)
+    monkeypatch.setattr(cq.cq_gc, "run_gc", _fail)
+    monkeypatch.setattr(cq.housekeeping, "maybe_schedule", lambda argv, **_kw: scheduled.append(argv) or True)
+
+    launcher = cq.AILauncher(providers=["codex"])
+    launcher.terminal_type = "tmux"
+    monkeypatch.setattr(launcher, "_start_provider_in_current_pane", lambda *_args, **_kwargs: 0)
+    monkeypatch.setattr(launcher, "cleanup", lambda: None)
+
+    assert launcher.run_up() == 0
+    assert scheduled and scheduled[0][2:4] == ["__housekeeping", "--exclude"]
+    assert scheduled[0][4] == str(launcher.runtime_dir)
+
+
+def test_housekeeping_worker_respects_budget(monkeypatch, tmp_path: Path) -> None:
+    cq = _load_cq_module()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr(cq.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setenv("CQ_TMPCLAUDE_MIN_AGE_S", "0")
+    monkeypatch.setenv("CQ_RUNTIME_GC_MIN_AGE_S", "0")
+    marker = tmp_path / "tmpclaude-abcd-cwd"
+    marker.write_text("", encoding="utf-8")
+    stale = cq.cq_gc.runtime_base_dir() / "ai-1-1"
+    stale.mkdir(parents=True)
+
+    monkeypatch.setenv("CQ_HOUSEKEEPING_BUDGET_S", "0")
+    assert cq.cmd_housekeeping([]) == 0
+    assert marker.exists() and stale.exists()
+
+    monkeypatch.setenv("CQ_HOUSEKEEPING_BUDGET_S", "5")
+    assert cq.cmd_housekeeping(["--exclude", str(tmp_path / "other")]) == 0
+    assert not marker.exists()
+    assert not stale.exists()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import lock_stats
+from process_lock import ProviderLock
+
+
+@pytest.fixture(autouse=True)
+def _home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("CQ_LOCK_STATS", raising=False)
+    lock_stats._PENDING.clear()
+    return tmp_path
+
+
+def test_attempts_are_recorded_with_wait_and_hold_times() -> None:
+    first = ProviderLock("codex", timeout=0.1, cwd="/proj")
+    assert first.try_acquire()
+    second = ProviderLock("codex", timeout=0.1, cwd="/proj")
+    assert second.acquire() is False
+    lock_stats.flush()
+
+    (current,) = lock_stats.current_locks()
+    assert current["lock"] == first.lock_file.name
+    assert current["held"] is True and current["waiters"] == 0
+    assert current["holder_pid"] == os.getpid() and current["held_s"] < 5
+    first.release()
+
+    events = lock_stats.load()
+    assert [(e["mode"], e["ok"]) for e in events] == [("acquire", False), ("try", True)]
+    assert events[0]["wait_ms"] >= 90
+    assert events[1]["hold_ms"] is not None and events[1]["scope"] == "/proj"
+    assert lock_stats.current_locks()[0]["held"] is False
+
+
+def test_summary_percentiles_and_report() -> None:
+    events = [{"lock": "codex-1.lock", "scope": "/p", "ok": True, "wait_ms": float(i), "hold_ms": 10.0} for i in range(1, 101)]
+    events.append({"lock": "cq-2.lock", "scope": "/q::default", "ok": False, "wait_ms": 0.5, "hold_ms": None})
+    summary = lock_stats.summarize(events)
+    assert [row["lock"] for row in summary] == ["codex-1.lock", "cq-2.lock"]
+    assert summary[0]["wait_ms"] == {"p50": 50.0, "p90": 90.0, "p99": 99.0, "max": 100.0}
+    assert summary[1]["failed"] == 1 and summary[1]["hold_ms"]["max"] is None
+
+    text = lock_stats.format_report([], summary)
+    assert "(no lock is held)" in text
+    assert "wait p50/p90/p99/max=50/90/99/100" in text
+
+
+def test_recording_can_be_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CQ_LOCK_STATS", "0")
+    lock = ProviderLock("claude", cwd="/proj")
+    assert lock.try_acquire()
+    lock.release()
+    assert not lock_stats.stats_path().exists()
+    assert lock_stats.load() == []
+
+
+def test_history_is_trimmed(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(lock_stats, "HISTORY_MAX_BYTES", 2000)
+    monkeypatch.setattr(lock_stats, "HISTORY_KEEP_RECORDS", 5)
+    path = tmp_path / "stats.jsonl"
+    for _ in range(40):
+        lock_stats.record(Path("codex-1.lock"), provider="codex", scope="/p", mode="try", ok=False, wait_ms=1.0)
+    lock_stats.flush(path)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[0])["lock"] == "codex-1.lock"
+
+
+def test_buffered_records_keep_the_home_they_were_taken_in(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    lock_stats.record(Path("codex-1.lock"), provider="codex", scope="/p", mode="try", ok=False, wait_ms=1.0)
+    taken = lock_stats.stats_path()
+    monkeypatch.setenv("HOME", str(tmp_path / "elsewhere"))
+    lock_stats.flush()
+    assert [e["lock"] for e in lock_stats.load(taken)] == ["codex-1.lock"]
+    assert not lock_stats.stats_path().exists()
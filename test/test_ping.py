@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import pytest
+
+
+def _load_ping_module(repo_root: Path):
+    loader = SourceFileLoader("ping_bin", str(repo_root / "bin" / "ping"))
+    spec = importlib.util.spec_from_loader("ping_bin", loader)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _Session:
+    pane_id = "%7"
+    data: dict = {}
+    session_file = ""
+
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.probed = False
+
+    def ensure_pane(self):
+        self.probed = True
+        return (True, self.pane_id) if self.alive else (False, "pane gone")
+
+
+@pytest.fixture
+def ping(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    return _load_ping_module(Path(__file__).resolve().parents[1])
+
+
+def test_sandboxed_ping_is_unverified_not_ok(ping, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    session = _Session()
+    monkeypatch.setattr(ping, "load_codex_session", lambda work_dir: session)
+    monkeypatch.setenv("CQ_SANDBOXED", "1")
+    monkeypatch.setattr(sys, "argv", ["ping", "codex"])
+
+    assert ping.main() == ping.EXIT_UNVERIFIED != 0
+    assert not session.probed
+    assert capsys.readouterr().out.startswith("UNVERIFIED")
+
+
+def test_ping_probes_the_pane_outside_a_sandbox(ping, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    session = _Session()
+    monkeypatch.setattr(ping, "load_codex_session", lambda work_dir: session)
+    monkeypatch.setenv("CQ_SANDBOXED", "0")
+    monkeypatch.setattr(sys, "argv", ["ping", "codex"])
+
+    assert ping.main() == 0
+    assert session.probed
+    assert capsys.readouterr().out.strip() == "OK (codex pane %7)"
+
+    session.alive = False
+    assert ping.main() == 1
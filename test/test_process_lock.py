@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from pathlib import Path
+
+import pytest
+
+import process_lock
+from process_lock import ProviderLock
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="queued waiting is POSIX-only")
+
+LIB_DIR = Path(__file__).resolve().parents[1] / "lib"
+
+WAITER = """
+import sys, time
+sys.path.insert(0, {lib!r})
+from process_lock import ProviderLock
+lock = ProviderLock("codex", timeout={timeout}, cwd={cwd!r})
+ok = lock.acquire()
+with open({out!r}, "a") as f:
+    f.write(f"{{sys.argv[1]}} {{ok}} {{time.time()}}\\n")
+if ok:
+    time.sleep({hold})
+    lock.release()
+"""
+
+
+@pytest.fixture
+def home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    # Failed attempts are buffered until exit; nothing here is about lock telemetry.
+    monkeypatch.setenv("CQ_LOCK_STATS", "0")
+    return tmp_path
+
+
+def _spawn(home: Path, name: str, out: Path, *, timeout: float = 10.0, hold: float = 0.0) -> subprocess.Popen:
+    code = WAITER.format(lib=str(LIB_DIR), timeout=timeout, cwd="/proj", out=str(out), hold=hold)
+    return subprocess.Popen([sys.executable, "-c", code, name], env={**os.environ, "HOME": str(home)})
+
+
+def _queue_len(lock: ProviderLock) -> int:
+    queue = lock.lock_file.with_name(lock.lock_file.name + ".queue")
+    return len(list(queue.glob("*.ticket"))) if queue.is_dir() else 0
+
+
+def _wait_for(cond, timeout: float = 5.0) -> None:
+    deadline = time.time() + timeout
+    while not cond():
+        assert time.time() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def _lines(out: Path) -> list[list[str]]:
+    return [ln.split() for ln in out.read_text().splitlines()] if out.exists() else []
+
+
+def test_waiters_are_served_in_arrival_order(home: Path, tmp_path: Path) -> None:
+    holder = ProviderLock("codex", timeout=1, cwd="/proj")
+    assert holder.acquire()
+    out = tmp_path / "order.txt"
+    procs = []
+    for i, name in enumerate(["a", "b", "c", "d"]):
+        procs.append(_spawn(home, name, out, hold=0.02))
+        _wait_for(lambda: _queue_len(holder) == i + 2)
+
+    # Queued waiters are not overtaken by a non-blocking attempt.
+    assert not ProviderLock("codex", cwd="/proj").try_acquire()
+    released_at = time.time()
+    holder.release()
+    for p in procs:
+        assert p.wait(timeout=10) == 0
+
+    lines = _lines(out)
+    assert [ln[0] for ln in lines] == ["a", "b", "c", "d"]
+    assert all(ln[1] == "True" for ln in lines)
+    # Event-driven handoff: the first waiter does not sit out a polling interval.
+    assert float(lines[0][2]) - released_at < 0.09
+    assert _queue_len(holder) == 0
+
+
+def test_timeout_leaves_the_queue(home: Path) -> None:
+    holder = ProviderLock("claude", cwd="/proj")
+    assert holder.acquire()
+    try:
+        waiter = ProviderLock("claude", timeout=0.2, cwd="/proj")
+        started = time.time()
+        assert waiter.acquire() is False
+        assert 0.15 <= time.time() - started < 1.0
+        assert _queue_len(holder) == 1
+    finally:
+        holder.release()
+    assert ProviderLock("claude", cwd="/proj").try_acquire()
+
+
+def test_dead_holder_and_dead_waiter_are_skipped(home: Path, tmp_path: Path) -> None:
+    out = tmp_path / "dead.txt"
+    holder = _spawn(home, "holder", out, hold=60)
+    _wait_for(lambda: bool(_lines(out)))
+    probe = ProviderLock("codex", cwd="/proj")
+    stuck = _spawn(home, "stuck", out, timeout=60)
+    _wait_for(lambda: _queue_len(probe) == 2)
+
+    # Both the lock holder and the first waiter die; a later waiter takes over without delay.
+    stuck.send_signal(signal.SIGKILL)
+    stuck.wait(timeout=5)
+    holder.send_signal(signal.SIGKILL)
+    holder.wait(timeout=5)
+
+    lock = ProviderLock("codex", timeout=2, cwd="/proj")
+    started = time.time()
+    assert lock.acquire()
+    assert time.time() - started < 0.5
+    assert lock.lock_file.read_text().strip() == str(os.getpid())
+    lock.release()
+
+
+def _held(path: Path) -> bool:
+    import fcntl
+
+    fd = os.open(str(path), os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return False
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+
+
+def test_flock_acquired_just_before_timeout_is_not_leaked(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import fcntl
+
+    class LateEvent(threading.Event):
+        # The waiter thread gets the lock, but its wakeup only lands after our timeout.
+        def set(self) -> None:
+            time.sleep(0.4)
+            super().set()
+
+    monkeypatch.setattr(
+        process_lock, "threading", SimpleNamespace(Lock=threading.Lock, Thread=threading.Thread, Event=LateEvent)
+    )
+    path = tmp_path / "x.lock"
+    holder = os.open(str(path), os.O_CREAT | os.O_RDWR)
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    releaser = threading.Timer(0.1, os.close, args=(holder,))
+    releaser.start()
+    fd = process_lock._flock_with_timeout(path, 0.3)
+    releaser.join()
+    # Whoever recorded its outcome first owns the fd: here the thread did, so we got the lock.
+    assert fd is not None
+    assert _held(path)
+    os.close(fd)
+    assert not _held(path)
+
+
+def test_timed_out_waiter_never_takes_the_lock_file(home: Path) -> None:
+    holder = ProviderLock("codex", cwd="/proj")
+    assert holder.try_acquire()
+    waiter = ProviderLock("codex", timeout=0.2, cwd="/proj")
+    assert waiter.acquire() is False
+    # No abandoned flock wait is left behind to grab the lock file once the holder lets go.
+    assert not any(t.name == "cq-lock-wait" and t.is_alive() for t in threading.enumerate())
+    holder.release()
+    assert not _held(holder.lock_file)
+
+
+def test_lock_file_unlinked_before_flock_is_not_used(home: Path) -> None:
+    lock = ProviderLock("codex", cwd="/proj")
+    lock.lock_dir.mkdir(parents=True, exist_ok=True)
+    # Opened, then gc unlinks the (idle) file before we get to flock it.
+    lock._fd = os.open(str(lock.lock_file), os.O_CREAT | os.O_RDWR)
+    lock.lock_file.unlink()
+    assert lock._try_acquire_once()
+    try:
+        assert lock.lock_file.read_text().strip() == str(os.getpid())
+        assert _held(lock.lock_file)
+        assert not ProviderLock("codex", cwd="/proj").try_acquire()
+    finally:
+        lock.release()
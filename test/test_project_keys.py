@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import project_keys as pk
+from project_id import compute_cq_project_id
+
+
+def test_project_keys_are_memoized_per_work_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pk.clear_project_keys_cache()
+    calls: list[Path] = []
+    monkeypatch.setattr(pk, "compute_cq_project_id", lambda wd: calls.append(wd) or compute_cq_project_id(wd))
+
+    keys = pk.project_keys(tmp_path, pwd="")
+    assert keys.cq_project_id == compute_cq_project_id(tmp_path)
+    assert pk.project_keys(tmp_path, pwd="") is keys
+    assert pk.project_keys(str(tmp_path) + "/", pwd="").cq_project_id == keys.cq_project_id
+    assert len(calls) == 1
+
+    pk.clear_project_keys_cache()
+    assert pk.project_keys(tmp_path, pwd="") is not keys
+
+
+def test_project_keys_cover_pwd_and_resolved_variants(tmp_path: Path) -> None:
+    pk.clear_project_keys_cache()
+    real = tmp_path / "real"
+    real.mkdir()
+    link = tmp_path / "link"
+    link.symlink_to(real)
+
+    keys = pk.project_keys(link, pwd=str(link))
+    assert keys.resolved == real.resolve()
+    assert keys.path_variants == (link, real.resolve())
+    assert keys.claude_keys == (pk.claude_project_key(link), pk.claude_project_key(real.resolve()))
+    assert keys.match_keys == {str(link), str(real.resolve())}
+    assert pk.normalize_for_match("/a//b/../c/") == "/a/c"
+    assert pk.normalize_for_match("") == ""
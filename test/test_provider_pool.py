@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import importlib.util
+import subprocess
+import time
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import pytest
+
+import provider_pool
+
+
+def _load_cq_module() -> object:
+    repo_root = Path(__file__).resolve().parents[1]
+    loader = SourceFileLoader("cq_script", str(repo_root / "cq"))
+    spec = importlib.util.spec_from_loader("cq_script", loader)
+    assert spec and spec.loader
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[union-attr]
+    return mod
+
+
+class FakeTmux:
+    """Just enough of TmuxBackend for the pool: sessions with one pane each."""
+
+    def __init__(self) -> None:
+        self.sessions: dict[str, str] = {}
+        self.dead: set[str] = set()
+        self.joined: list[tuple[str, str, str]] = []
+        self.respawned: dict[str, str] = {}
+        self._next = 100
+
+    def _tmux_run(self, args, *, check=False, capture=False, input_bytes=None, timeout=None):
+        if args[0] == "new-session":
+            self.sessions[args[args.index("-s") + 1]] = f"%{self._next}"
+            self._next += 1
+        elif args[0] == "list-panes":
+            return subprocess.CompletedProcess(args, 0, stdout=self.sessions[args[2]] + "\n", stderr="")
+        elif args[0] == "kill-session":
+            self.sessions.pop(args[2], None)
+        return subprocess.CompletedProcess(args, 0, stdout="", stderr="")
+
+    def respawn_pane(self, pane_id, *, cmd, cwd=None, remain_on_exit=True):
+        self.respawned[pane_id] = cmd
+
+    def set_pane_user_option(self, pane_id, name, value):
+        pass
+
+    def is_pane_alive(self, pane_id):
+        return pane_id in self.sessions.values() and pane_id not in self.dead
+
+    def join_pane(self, src, target, direction="right"):
+        self.joined.append((src, target, direction))
+        self.sessions = {k: v for k, v in self.sessions.items() if v != src}
+        return src
+
+
+@pytest.fixture(autouse=True)
+def _home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.delenv("CQ_POOL_MAX_AGE_S", raising=False)
+    return tmp_path / "home"
+
+
+def _build_cmd(ready: Path) -> str:
+    return f"touch {ready}; codex"
+
+
+def _mark_ready(spare: provider_pool.Spare) -> None:
+    spare.ready_file.write_text("1\n", encoding="utf-8")
+
+
+def test_fill_is_bounded_and_evicts_other_projects() -> None:
+    tmux = FakeTmux()
+    other = provider_pool.fill("other", "/p/other", "default", False, _build_cmd, tmux, size=2)
+    assert len(other) == 2
+
+    mine = provider_pool.fill("mine", "/p/mine", "default", False, _build_cmd, tmux, size=2)
+    assert len(mine) == 2
+    spares = provider_pool.list_spares()
+    assert sorted(s.key for s in spares) == ["mine", "mine"]
+    assert len(tmux.sessions) == 2
+    assert all(s.tmux_session.startswith(provider_pool.SESSION_PREFIX) for s in spares)
+    assert tmux.respawned[mine[0].pane_id] == _build_cmd(mine[0].ready_file)
+
+    # Already full: nothing new is started.
+    assert provider_pool.fill("mine", "/p/mine", "default", False, _build_cmd, tmux, size=2) == []
+
+
+def test_claim_skips_unusable_spares_and_is_exclusive() -> None:
+    tmux = FakeTmux()
+    dead, unready, good = provider_pool.fill("k", "/p", "default", False, _build_cmd, tmux, size=3)
+    _mark_ready(dead)
+    _mark_ready(good)
+    tmux.dead.add(dead.pane_id)
+
+    claimed = provider_pool.claim("k", tmux)
+    assert claimed is not None and claimed.spare_id == good.spare_id
+    # The dead spare was discarded; the one still starting stays in the pool.
+    assert [s.spare_id for s in provider_pool.list_spares()] == [unready.spare_id]
+    assert dead.tmux_session not in tmux.sessions
+    assert provider_pool.claim("k", tmux) is None
+
+    pane_id = provider_pool.adopt(claimed, tmux, parent_pane="%1", direction="right")
+    assert pane_id == good.pane_id
+    assert tmux.joined == [(good.pane_id, "%1", "right")]
+    assert not good.state_dir.exists()
+
+
+def test_expired_spares_are_not_adopted(monkeypatch: pytest.MonkeyPatch) -> None:
+    tmux = FakeTmux()
+    (spare,) = provider_pool.fill("k", "/p", "default", False, _build_cmd, tmux, size=1)
+    _mark_ready(spare)
+    assert provider_pool.claim("k", tmux, now=time.time() + provider_pool.DEFAULT_MAX_AGE_S + 1) is None
+    assert provider_pool.list_spares() == []
+    assert tmux.sessions == {}
+
+
+def test_launcher_adopts_spare_without_cold_start(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    cq = _load_cq_module()
+    project = tmp_path / "proj"
+    project.mkdir()
+    monkeypatch.chdir(project)
+    monkeypatch.setenv("CQ_POOL_SIZE", "1")
+    monkeypatch.setattr(cq, "detect_terminal", lambda: "tmux")
+
+    launcher = cq.AILauncher(providers=["codex"])
+    tmux = FakeTmux()
+    (spare,) = provider_pool.fill(
+        launcher._pool_key(), str(project), launcher.cq_session_name, False, _build_cmd, tmux, size=1
+    )
+    _mark_ready(spare)
+
+    assert launcher._pool_eligible()
+    adopted = launcher._adopt_pool_spare(tmux, parent_pane="%0", direction="right")
+    assert adopted == (spare.pane_id, spare.start_cmd)
+    assert launcher._ready_file("codex").exists()
+    assert launcher._adopt_pool_spare(tmux, parent_pane="%0", direction="right") is None
+
+    launcher.resume = True
+    assert not launcher._pool_eligible()
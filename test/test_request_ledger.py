@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import request_ledger
+
+
+@pytest.fixture(autouse=True)
+def _home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("CQ_LEDGER", raising=False)
+
+
+def _req(path: Path, rid: str, to: str, ts: float, session: str = "default") -> None:
+    request_ledger.record(Path("/proj"), kind="req", req_id=rid, session=session, from_provider="claude", to_provider=to, size=10, ts=ts, path=path)
+
+
+def _reply(path: Path, rid: str, frm: str, ts: float) -> None:
+    request_ledger.record(Path("/proj"), kind="reply", req_id=rid, session="default", from_provider=frm, to_provider="claude", size=5, ts=ts, path=path)
+
+
+def test_pairs_requests_with_first_reply(tmp_path: Path) -> None:
+    path = tmp_path / "ledger.jsonl"
+    _req(path, "a", "codex", 1000.0)
+    _req(path, "b", "codex", 1010.0)
+    _req(path, "c", "claude", 1020.0, session="feat")
+    _reply(path, "a", "codex", 1004.0)
+    _reply(path, "a", "codex", 1050.0)  # duplicate reply does not change the latency
+    _reply(path, "c", "claude", 1040.0)
+    _reply(path, "zzz", "codex", 1041.0)  # reply to an unknown request is ignored
+
+    summary = request_ledger.summarize(request_ledger.load(path), now=1100.0, bucket_s=60)
+    assert (summary["requests"], summary["replied"]) == (3, 2)
+    assert summary["outstanding"] == [{"req_id": "b", "to": "codex", "session": "default", "age_s": 90.0}]
+    by_provider = {row["key"]: row for row in summary["by_provider"]}
+    assert by_provider["codex"]["latency_s"]["p50"] == 4.0
+    assert by_provider["claude"]["latency_s"]["max"] == 20.0
+    assert {row["key"] for row in summary["by_session"]} == {"default/codex", "feat/claude"}
+    assert [(b["start"], b["requests"], b["replied"]) for b in summary["throughput"]] == [(960, 2, 1), (1020, 1, 1)]
+
+    text = request_ledger.format_report(summary)
+    assert "Outstanding: 1" in text and "p50/p90/p99/max=4.0/4.0/4.0/4.0" in text
+
+
+def test_window_and_durations(tmp_path: Path) -> None:
+    path = tmp_path / "ledger.jsonl"
+    _req(path, "old", "codex", 0.0)
+    _req(path, "new", "codex", 10_000.0)
+    summary = request_ledger.summarize(request_ledger.load(path), now=10_001.0, since_s=3600)
+    assert [r["req_id"] for r in summary["outstanding"]] == ["new"]
+    assert request_ledger.parse_duration("15m") == 900
+    assert request_ledger.parse_duration("2") == 2
+    with pytest.raises(ValueError):
+        request_ledger.parse_duration("0h")
+
+
+def test_disabled_and_trimmed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "ledger.jsonl"
+    monkeypatch.setattr(request_ledger, "MAX_BYTES", 1500)
+    monkeypatch.setattr(request_ledger, "KEEP_RECORDS", 4)
+    for i in range(30):
+        _req(path, f"r{i}", "codex", float(i))
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) <= 12 and json.loads(lines[-1])["req_id"] == "r29"
+
+    monkeypatch.setenv("CQ_LEDGER", "0")
+    other = tmp_path / "off.jsonl"
+    _req(other, "x", "codex", 1.0)
+    assert not other.exists()
+
+
+def test_concurrent_appends_survive_trims(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+
+    path = tmp_path / "ledger.jsonl"
+    # Every append trims (rewrites the file) without dropping anything it should keep.
+    monkeypatch.setattr(request_ledger, "MAX_BYTES", 100)
+    monkeypatch.setattr(request_ledger, "KEEP_RECORDS", 10_000)
+
+    def _writer(n: int) -> None:
+        for i in range(40):
+            _req(path, f"w{n}-{i}", "codex", float(i))
+
+    threads = [threading.Thread(target=_writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(request_ledger.load(path)) == 160
+
+
+def test_default_path_is_per_project(tmp_path: Path) -> None:
+    a = request_ledger.ledger_path(tmp_path / "a")
+    b = request_ledger.ledger_path(tmp_path / "b")
+    assert a != b and a.name == "requests.jsonl"
+    assert a.parent.parent == tmp_path / ".cache" / "cq" / "projects"
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import sandbox_probe
+
+
+@pytest.fixture
+def probes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[bool]:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.delenv("CQ_SANDBOXED", raising=False)
+    calls: list[bool] = []
+
+    def _probe() -> bool:
+        calls.append(True)
+        return False
+
+    monkeypatch.setattr(sandbox_probe, "probe_localhost", _probe)
+    return calls
+
+
+def test_result_is_cached_per_fingerprint(probes: list[bool], tmp_path: Path) -> None:
+    assert sandbox_probe.can_connect_localhost(env={}, now=1000.0) is False
+    assert sandbox_probe.can_connect_localhost(env={}, now=1010.0) is False
+    assert len(probes) == 1
+    assert sandbox_probe.cache_path({}) == tmp_path / ".cache" / "cq" / "sandbox-probe.json"
+
+    # A different sandbox environment does not reuse the entry.
+    assert sandbox_probe.is_sandboxed(env={"CODEX_SANDBOX": "seatbelt"})
+    assert len(probes) == 2
+
+
+def test_entries_expire(probes: list[bool]) -> None:
+    sandbox_probe.can_connect_localhost(env={}, now=1000.0)
+    sandbox_probe.can_connect_localhost(env={}, now=1000.0 + sandbox_probe.CACHE_TTL_S + 1)
+    assert len(probes) == 2
+    sandbox_probe.can_connect_localhost(env={}, ttl=0, now=1000.0 + sandbox_probe.CACHE_TTL_S + 2)
+    assert len(probes) == 3
+
+
+def test_env_override_skips_probe(probes: list[bool]) -> None:
+    assert sandbox_probe.is_sandboxed(env={"CQ_SANDBOXED": "1"}) is True
+    assert sandbox_probe.is_sandboxed(env={"CQ_SANDBOXED": "0"}) is False
+    assert probes == []
+
+
+def test_runtime_dir_prefers_xdg(tmp_path: Path) -> None:
+    assert sandbox_probe.runtime_dir({"XDG_RUNTIME_DIR": str(tmp_path)}) == tmp_path / "cq"
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import session_slots
+
+
+class _Lock:
+    """Stand-in for ProviderLock: `busy` maps session name -> holder pid."""
+
+    opened: list[str] = []
+
+    def __init__(self, name: str, busy: dict[str, int]):
+        self.name = name
+        self.busy = busy
+        _Lock.opened.append(name)
+
+    def try_acquire(self) -> bool:
+        return self.name not in self.busy
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_allocates_lowest_free_slot_in_one_attempt(tmp_path: Path) -> None:
+    busy: dict[str, int] = {}
+    _Lock.opened = []
+    name, lock = session_slots.allocate(tmp_path, "/proj", lambda n: _Lock(n, busy))
+    assert name == "default-2" and lock is not None
+    assert _Lock.opened == ["default-2"]
+
+    # The next launcher skips the recorded slot without touching its lock.
+    _Lock.opened = []
+    name, _ = session_slots.allocate(tmp_path, "/proj", lambda n: _Lock(n, busy))
+    assert name == "default-3"
+    assert _Lock.opened == ["default-3"]
+
+    session_slots.release(tmp_path, "/proj", "default-2")
+    name, _ = session_slots.allocate(tmp_path, "/proj", lambda n: _Lock(n, busy))
+    assert name == "default-2"
+
+
+def test_dead_holders_are_reclaimed_in_bulk(tmp_path: Path) -> None:
+    dead = _dead_pid()
+    path = session_slots.table_path(tmp_path, "/proj")
+    slots = {str(n): {"pid": dead, "session": f"default-{n}", "ts": 0} for n in range(2, 10)}
+    slots["10"] = {"pid": os.getppid(), "session": "default-10", "ts": 0}
+    path.write_text(json.dumps({"version": session_slots.TABLE_VERSION, "slots": slots}), encoding="utf-8")
+
+    _Lock.opened = []
+    name, _ = session_slots.allocate(tmp_path, "/proj", lambda n: _Lock(n, {}))
+    assert name == "default-2"
+    assert _Lock.opened == ["default-2"]
+    table = json.loads(path.read_text(encoding="utf-8"))["slots"]
+    assert sorted(table, key=int) == ["2", "10"]
+    assert table["2"]["pid"] == os.getpid()
+
+
+def test_slots_held_outside_the_table_are_recorded_and_skipped(tmp_path: Path) -> None:
+    holder = os.getppid()
+    busy = {"default-2": holder, "default-3": _dead_pid()}
+    name, _ = session_slots.allocate(
+        tmp_path, "/proj", lambda n: _Lock(n, busy), holder_pid=lambda lock: lock.busy.get(lock.name)
+    )
+    assert name == "default-4"
+    table = json.loads(session_slots.table_path(tmp_path, "/proj").read_text(encoding="utf-8"))["slots"]
+    # The live foreign holder is remembered; the dead one is not.
+    assert table["2"]["pid"] == holder and "3" not in table
+
+    _Lock.opened = []
+    name, _ = session_slots.allocate(tmp_path, "/proj", lambda n: _Lock(n, busy))
+    assert name == "default-5"
+    assert _Lock.opened == ["default-3", "default-5"]
+
+
+def test_exhaustion_returns_none(tmp_path: Path) -> None:
+    busy = {f"default-{n}": 1 for n in range(2, 6)}
+    assert session_slots.allocate(tmp_path, "/proj", lambda n: _Lock(n, busy), last=5) == (None, None)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import cq_trace
+import startup_timings
+
+
+def test_env_enabled() -> None:
+    assert startup_timings.env_enabled({"CQ_TIMINGS": "1"})
+    assert not startup_timings.env_enabled({"CQ_TIMINGS": "0"})
+    assert not startup_timings.env_enabled({})
+
+
+def test_finish_is_noop_without_startup_trace(tmp_path: Path) -> None:
+    cq_trace.disable()
+    history = tmp_path / "timings.jsonl"
+    assert startup_timings.finish("1.0", stream=io.StringIO(), history=history) is None
+
+    # A trace started for something else (e.g. --explain) is left alone.
+    cq_trace.enable("other")
+    try:
+        assert startup_timings.finish("1.0", stream=io.StringIO(), history=history) is None
+        assert cq_trace.active() is not None
+    finally:
+        cq_trace.disable()
+    assert not history.exists()
+
+
+def test_finish_prints_summary_and_appends_history(tmp_path: Path) -> None:
+    history = tmp_path / "timings.jsonl"
+    config = tmp_path / "cq.config"
+    config.write_text("codex", encoding="utf-8")
+
+    startup_timings.start()
+    with cq_trace.stage("start_config"):
+        config.read_text(encoding="utf-8")
+    with cq_trace.stage("panes"):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        with cq_trace.stage("codex_history"):
+            pass
+    with cq_trace.stage("anchor"):
+        out = io.StringIO()
+        record = startup_timings.finish("9.9.9", stream=out, history=history)
+    assert cq_trace.active() is None
+
+    assert record is not None
+    phases = {p["name"]: p for p in record["phases"]}
+    assert phases["start_config"]["files"] == 1
+    assert phases["panes"]["procs"] == 1
+    assert phases["codex_history"]["depth"] == 1
+    # Still-open stages are measured up to the report.
+    assert phases["anchor"]["ms"] >= 0
+
+    text = out.getvalue()
+    assert "Startup timings (v9.9.9)" in text
+    assert "start_config" in text and "procs=1" in text
+
+    # A second call (e.g. from main's finally) does not report again.
+    assert startup_timings.finish("9.9.9", stream=io.StringIO(), history=history) is None
+
+    lines = history.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    saved = json.loads(lines[0])
+    assert saved["version"] == "9.9.9"
+    assert [p["name"] for p in saved["phases"]] == ["start_config", "panes", "codex_history", "anchor"]
+
+
+def test_history_is_trimmed(tmp_path: Path, monkeypatch) -> None:
+    history = tmp_path / "timings.jsonl"
+    monkeypatch.setattr(startup_timings, "HISTORY_MAX_BYTES", 200)
+    monkeypatch.setattr(startup_timings, "HISTORY_KEEP_RECORDS", 2)
+    for _ in range(5):
+        startup_timings.start()
+        startup_timings.finish("1.0", stream=io.StringIO(), history=history)
+    assert len(history.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_concurrent_history_appends_survive_trims(tmp_path: Path, monkeypatch) -> None:
+    import threading
+
+    history = tmp_path / "timings.jsonl"
+    # Every append trims (rewrites the file) without dropping anything it should keep.
+    monkeypatch.setattr(startup_timings, "HISTORY_MAX_BYTES", 50)
+    monkeypatch.setattr(startup_timings, "HISTORY_KEEP_RECORDS", 10_000)
+
+    def _writer(n: int) -> None:
+        for i in range(40):
+            startup_timings._append_history(history, {"writer": n, "i": i})
+
+    threads = [threading.Thread(target=_writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(history.read_text(encoding="utf-8").splitlines()) == 160
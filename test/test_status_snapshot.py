@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+import status_snapshot
+from status_snapshot import StatusState
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+class _Snap:
+    def __init__(self, alive: set[str], titles: list[str]):
+        self.backend = object()
+        self.alive = alive
+        self.titles = titles
+
+    def is_alive(self, pane_id: str) -> bool:
+        return pane_id in self.alive
+
+    def find_pane_by_title_marker(self, marker: str):
+        return next((f"%{i}" for i, t in enumerate(self.titles) if t.startswith(marker)), None)
+
+
+@pytest.fixture
+def home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
+
+
+def _registry(home: Path, session_id: str, providers: dict) -> None:
+    run = home / ".cq" / "run"
+    run.mkdir(parents=True, exist_ok=True)
+    record = {"terminal": "tmux", "updated_at": int(time.time()), "providers": providers}
+    (run / f"cq-session-{session_id}.json").write_text(json.dumps(record), encoding="utf-8")
+
+
+def test_collect_uses_registry_and_pane_titles(home: Path) -> None:
+    _registry(home, "a", {"codex": {"pane_id": "%1"}, "claude": {"pane_id": "%9"}})
+    _registry(home, "b", {"codex": {"pane_id": "%2"}})
+    snap = _Snap(alive={"%1"}, titles=[])
+    state = status_snapshot.collect(snapshots={"tmux": snap}, daemons=frozenset())
+    assert state.providers == {"codex"} and state.sessions == 2
+
+    # A CQ pane without a registry record still counts (same as the title check in the script).
+    snap = _Snap(alive=set(), titles=["zsh", "CQ-Claude"])
+    state = status_snapshot.collect(snapshots={"tmux": snap}, daemons=frozenset({"gask"}))
+    assert state.providers == {"claude"}
+    modern = status_snapshot.render(state, "modern")
+    assert modern.count("●") == 2 and modern.startswith(f"{status_snapshot.C_ORANGE}●")
+
+
+def test_render_matches_shell_markup() -> None:
+    idle = StatusState()
+    assert status_snapshot.render(idle, "daemons") == ""
+    assert status_snapshot.render(StatusState(daemons=frozenset({"cask"})), "daemons") == (
+        f" {status_snapshot.C_GREEN}X{status_snapshot.C_RESET} "
+    )
+    assert status_snapshot.render(idle, "compact").startswith(f"{status_snapshot.C_PINK}CQ")
+    with pytest.raises(ValueError):
+        status_snapshot.render(idle, "pane")
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash")
+def test_status_script_reads_fresh_snapshot(tmp_path: Path) -> None:
+    cache = tmp_path / "cache"
+    state = StatusState(providers=frozenset({"codex"}))
+    status_snapshot.write(state, cache / "status")
+    env = {**os.environ, "CQ_CACHE_DIR": str(cache), "CQ_DIR": str(tmp_path / "none"), "TMPDIR": str(tmp_path)}
+
+    def _status(mode: str) -> str:
+        cp = subprocess.run(["bash", str(REPO_ROOT / "config" / "cq-status.sh"), mode], env=env, capture_output=True, text=True)
+        return cp.stdout.strip()
+
+    assert _status("modern") == status_snapshot.render(state, "modern")
+
+    # A stale snapshot is ignored and the shell fallback runs instead.
+    status_snapshot.write(StatusState(daemons=frozenset({"cask"})), cache / "status", now=time.time() - 3600)
+    assert _status("daemons") == ""
+
+    # Unless the producer exited idle and the registry has not changed since.
+    registry = tmp_path / "home" / ".cq" / "run"
+    registry.mkdir(parents=True)
+    past = time.time() - 60
+    os.utime(registry, (past, past))
+    status_snapshot._mark_idle(cache / "status", True)
+    env["HOME"] = str(tmp_path / "home")
+    assert _status("daemons") == status_snapshot.render(StatusState(daemons=frozenset({"cask"})), "daemons").strip()
+    (registry / "cq-session-new.json").write_text("{}", encoding="utf-8")
+    os.utime(registry, (time.time() + 5, time.time() + 5))
+    assert _status("daemons") == ""
+
+
+def test_producer_is_single_instance_and_exits_when_idle(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    if os.name == "nt":
+        pytest.skip("POSIX-only lock")
+    monkeypatch.setattr(status_snapshot, "collect", lambda: StatusState())
+
+    class _Watcher:
+        waits = 0
+
+        def sync(self, specs) -> None:
+            pass
+
+        def wait(self, timeout) -> bool:
+            _Watcher.waits += 1
+            return False
+
+        def close(self) -> None:
+            pass
+
+    directory = tmp_path / "status"
+    held = status_snapshot._single_instance(directory)
+    assert held is not None
+    assert status_snapshot.run(directory=directory, watcher=_Watcher()) == 0
+    assert not (directory / "modern.txt").exists()
+    os.close(held)
+
+    assert status_snapshot.run(directory=directory, watcher=_Watcher(), idle_exit=0) == 0
+    assert (directory / "modern.txt").read_text(encoding="utf-8").splitlines()[0].isdigit()
+    assert _Watcher.waits == 0
+    assert (directory / status_snapshot.IDLE_MARKER).exists()
+
+    # A restarted producer withdraws the marker until it goes idle again.
+    monkeypatch.setattr(status_snapshot, "collect", lambda: StatusState(providers=frozenset({"codex"})))
+    assert status_snapshot.run(directory=directory, watcher=_Watcher(), max_cycles=1) == 0
+    assert not (directory / status_snapshot.IDLE_MARKER).exists()
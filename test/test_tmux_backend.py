@@ -155,3 +155,23 @@ def test_tmux_kill_pane_prefers_pane_id_over_session(monkeypatch: pytest.MonkeyP
     calls.clear()
     backend.kill_pane("mysession")
     assert calls == [["kill-session", "-t", "mysession"]]
+
+
+def test_pane_snapshot_lists_tmux_panes_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[list[str]] = []
+
+    def fake_tmux_run(self: terminal.TmuxBackend, args: list[str], *, check: bool = False, capture: bool = False,
+                      input_bytes: bytes | None = None, timeout: float | None = None) -> subprocess.CompletedProcess[str]:
+        calls.append(args)
+        assert args == ["list-panes", "-a", "-F", "#{pane_id}\t#{pane_dead}\t#{pane_title}"]
+        return _cp(stdout="%1\t0\tCQ-Claude-abc\n%2\t1\tCQ-Codex-def\n")
+
+    backend = terminal.TmuxBackend()
+    monkeypatch.setattr(backend, "_tmux_run", fake_tmux_run.__get__(backend, terminal.TmuxBackend))
+
+    snapshot = terminal.PaneSnapshot(backend)
+    assert snapshot.is_alive("%1") is True
+    assert snapshot.is_alive("%2") is False
+    assert snapshot.is_alive("%3") is False
+    assert snapshot.find_pane_by_title_marker("CQ-Codex") == "%2"
+    assert len(calls) == 1
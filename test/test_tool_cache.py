@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+import tool_cache
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.delenv("CQ_TOOL_CACHE", raising=False)
+    tool_cache.clear_memory()
+    yield
+    tool_cache.clear_memory()
+
+
+def _make_tool(directory: Path, name: str) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    tool = directory / name
+    tool.write_text("#!/bin/sh\n", encoding="utf-8")
+    tool.chmod(0o755)
+    return tool
+
+
+def test_which_persists_hits_and_detects_shadowing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    tool = _make_tool(second, "mytool")
+    monkeypatch.setenv("PATH", os.pathsep.join([str(first), str(second)]))
+
+    assert tool_cache.which("mytool") == str(tool)
+    assert (tmp_path / "home" / ".cache" / "cq" / "tools.json").exists()
+
+    # A new process (fresh memory) answers from the persisted entry without searching PATH.
+    tool_cache.clear_memory()
+    calls: list[str] = []
+    real_which = shutil.which
+    monkeypatch.setattr(tool_cache.shutil, "which", lambda name: calls.append(name) or real_which(name))
+    assert tool_cache.which("mytool") == str(tool)
+    assert calls == []
+
+    # A binary appearing earlier on PATH changes that directory's mtime and invalidates the entry.
+    tool_cache.clear_memory()
+    shadow = _make_tool(first, "mytool")
+    future = time.time() + 5
+    os.utime(first, (future, future))
+    assert tool_cache.which("mytool") == str(shadow)
+    assert calls == ["mytool"]
+
+
+def test_which_does_not_cache_misses(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    monkeypatch.setenv("PATH", str(bindir))
+    assert tool_cache.which("later") is None
+    tool = _make_tool(bindir, "later")
+    assert tool_cache.which("later") == str(tool)
+
+
+def test_probe_caches_hits_and_misses_for_ttl(tmp_path: Path) -> None:
+    calls: list[int] = []
+
+    def _compute_none():
+        calls.append(1)
+        return None
+
+    assert tool_cache.probe("thing", _compute_none) is None
+    tool_cache.clear_memory()
+    assert tool_cache.probe("thing", _compute_none) is None
+    assert len(calls) == 1
+    assert tool_cache.probe("thing", _compute_none, miss_ttl_s=0) is None
+    assert len(calls) == 2
+
+    target = _make_tool(tmp_path / "found", "wezterm.exe")
+    assert tool_cache.probe("other", lambda: str(target)) == str(target)
+    tool_cache.clear_memory()
+    assert tool_cache.probe("other", lambda: pytest.fail("should be cached")) == str(target)
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_git_info_cached_until_head_moves(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    repo = tmp_path / "install"
+    repo.mkdir()
+    env = {**os.environ, "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@t", "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@t"}
+
+    def git(*args: str) -> None:
+        subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True, env=env)
+
+    git("init", "-q")
+    git("commit", "-q", "--allow-empty", "-m", "one")
+    info = tool_cache.git_info(repo)
+    assert info
+
+    tool_cache.clear_memory()
+    real_run = subprocess.run
+    runs: list[list[str]] = []
+    monkeypatch.setattr(tool_cache.subprocess, "run", lambda cmd, **kw: runs.append(cmd) or real_run(cmd, **kw))
+    assert tool_cache.git_info(repo) == info
+    assert runs == []
+
+    time.sleep(0.01)
+    git("commit", "-q", "--allow-empty", "-m", "two")
+    assert tool_cache.git_info(repo) != info
+    assert sum(1 for cmd in runs if "log" in cmd) == 1